@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""
+上游请求性能基准
+
+在本地启动一个桩服务器模拟上游（GitHub / AI），对比不同请求方式的延迟。
+桩服务器对每个新建连接额外延迟 --connect-delay 毫秒，模拟真实网络中
+TCP + TLS 握手的往返开销。
+
+用法:
+    python benchmark.py                  # 运行全部场景
+    python benchmark.py http_pool -n 500
+    python benchmark.py graphql_batch --repos 200 --rtt 50
+    python benchmark.py ai_batch --projects 30 --ai-latency 400
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from models.schemas import ProjectCreate
+from services.ai import AIService
+from services.ai_cache import AICache
+from services.ai_limits import AI_LIMIT_DEFAULTS, ProviderLimiter
+from services.github import GitHubService
+from services.http import HttpClients, get_http_clients
+from services.rate_limit import GitHubScheduler
+from services.refresh import enhance_projects
+
+
+class StubServer:
+    """本地桩服务器（HTTP/1.1 keep-alive）
+
+    routes: {(method, path): handler(request_body: bytes, request_headers) -> (status, headers, body)}
+    """
+
+    def __init__(self, routes: Dict[tuple, Callable], connect_delay: float = 0.0):
+        self.routes = routes
+        self.connect_delay = connect_delay
+        self.requests = 0
+        self.connections = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                # 头部与正文分两次写出，关闭 Nagle 避免延迟确认带来的 40ms 停顿
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                server.connections += 1
+                if server.connect_delay:
+                    time.sleep(server.connect_delay)
+
+            def _handle(self, method: str):
+                server.requests += 1
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                handler = server.routes.get((method, self.path.split("?")[0]))
+                if handler is None:
+                    status, headers, payload = 404, {}, b'{"message": "Not Found"}'
+                else:
+                    status, headers, payload = handler(body, self.headers)
+                self.send_response(status)
+                for key, value in {"Content-Type": "application/json", **headers}.items():
+                    self.send_header(key, value)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                self._handle("GET")
+
+            def do_POST(self):
+                self._handle("POST")
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._httpd.server_address[1]}"
+
+    def __enter__(self):
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+def json_response(payload) -> Callable:
+    body = json.dumps(payload).encode("utf-8")
+    return lambda _body, _headers: (200, {}, body)
+
+
+def summarize(latencies: list) -> str:
+    ordered = sorted(latencies)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return (f"mean {statistics.mean(ordered):7.2f} ms   p50 {statistics.median(ordered):7.2f} ms   "
+            f"p95 {p95:7.2f} ms")
+
+
+# ==================== 场景 ====================
+
+async def bench_http_pool(args) -> None:
+    """每次请求新建 AsyncClient vs 共享连接池客户端"""
+    routes = {("GET", "/repos/owner/repo"): json_response({"full_name": "owner/repo", "default_branch": "main"})}
+
+    with StubServer(routes, connect_delay=args.connect_delay / 1000) as stub:
+        url = f"{stub.url}/repos/owner/repo"
+
+        async def fresh_client() -> float:
+            start = time.perf_counter()
+            async with httpx.AsyncClient(timeout=30.0, follow_redirects=True) as client:
+                (await client.get(url)).raise_for_status()
+            return (time.perf_counter() - start) * 1000
+
+        clients = HttpClients()
+        shared = clients.get("github")
+
+        async def pooled_client() -> float:
+            start = time.perf_counter()
+            (await shared.get(url)).raise_for_status()
+            return (time.perf_counter() - start) * 1000
+
+        for label, fn in (("每次新建客户端", fresh_client), ("共享连接池", pooled_client)):
+            before = stub.connections
+            sem = asyncio.Semaphore(args.concurrency)
+
+            async def run_one():
+                async with sem:
+                    return await fn()
+
+            latencies = await asyncio.gather(*(run_one() for _ in range(args.requests)))
+            print(f"  {label:<10} {summarize(latencies)}   新建连接 {stub.connections - before}")
+
+        print(f"  连接池统计: {clients.get_stats()['github']}")
+        await clients.aclose()
+
+
+def fake_repository(i: int) -> dict:
+    """桩仓库数据（REST 格式）"""
+    full_name = f"owner{i % 7}/repo-{i}"
+    return {
+        "full_name": full_name,
+        "name": full_name.split("/")[1],
+        "html_url": f"https://github.com/{full_name}",
+        "description": f"Repository number {i}",
+        "language": ("Python", "Go", "TypeScript", None)[i % 4],
+        "stargazers_count": 1000 + i * 37,
+        "forks_count": 100 + i,
+        "open_issues_count": i % 50,
+        "topics": ["llm", "tooling"][: i % 3],
+        "created_at": "2024-01-01T00:00:00Z",
+        "pushed_at": "2026-01-01T00:00:00Z",
+        "default_branch": "main",
+    }
+
+
+def graphql_node(repo: dict) -> dict:
+    """将桩仓库转换为 GraphQL 节点"""
+    return {
+        "nameWithOwner": repo["full_name"],
+        "name": repo["name"],
+        "url": repo["html_url"],
+        "description": repo["description"],
+        "stargazerCount": repo["stargazers_count"],
+        "forkCount": repo["forks_count"],
+        "createdAt": repo["created_at"],
+        "pushedAt": repo["pushed_at"],
+        "primaryLanguage": {"name": repo["language"]} if repo["language"] else None,
+        "defaultBranchRef": {"name": repo["default_branch"]},
+        "repositoryTopics": {"nodes": [{"topic": {"name": t}} for t in repo["topics"]]},
+        "issues": {"totalCount": repo["open_issues_count"]},
+        "pullRequests": {"totalCount": 0},
+    }
+
+
+def graphql_handler(repos: Dict[str, dict], rtt: float) -> Callable:
+    """桩 GraphQL 端点：按别名变量 $oN / $nN 返回仓库"""
+
+    def handle(body, _headers):
+        time.sleep(rtt)
+        variables = json.loads(body).get("variables", {})
+        data, errors = {}, []
+        i = 0
+        while f"o{i}" in variables:
+            full_name = f"{variables[f'o{i}']}/{variables[f'n{i}']}"
+            repo = repos.get(full_name)
+            data[f"r{i}"] = graphql_node(repo) if repo else None
+            if repo is None:
+                errors.append({"type": "NOT_FOUND", "path": [f"r{i}"], "message": f"Could not resolve {full_name}"})
+            i += 1
+        payload = {"data": data, **({"errors": errors} if errors else {})}
+        return 200, {}, json.dumps(payload).encode("utf-8")
+
+    return handle
+
+
+async def bench_graphql_batch(args) -> None:
+    """REST 逐个获取仓库元数据 vs GraphQL 批量查询"""
+    repos = {repo["full_name"]: repo for repo in map(fake_repository, range(args.repos))}
+    rtt = args.rtt / 1000
+
+    def delayed(payload: dict) -> Callable:
+        body = json.dumps(payload).encode("utf-8")
+        return lambda _body, _headers: (time.sleep(rtt), (200, {}, body))[1]
+
+    routes = {("GET", f"/repos/{name}"): delayed(repo) for name, repo in repos.items()}
+    routes[("POST", "/graphql")] = graphql_handler(repos, rtt)
+    names = list(repos) + ["missing/repo"]
+
+    with StubServer(routes, connect_delay=args.connect_delay / 1000) as stub:
+        service = GitHubService(token="benchmark")
+        service.BASE_URL = stub.url
+        service.graphql_url = f"{stub.url}/graphql"
+        # 不限速，只比较请求本身的开销（真实环境中 REST 还受每分钟请求数限制）
+        service.scheduler = GitHubScheduler(["benchmark"], {"burst": 10 ** 6, "corePerMinute": 10 ** 6})
+
+        results = {}
+        for label, use_graphql in (("REST 逐个请求", False), ("GraphQL 批量", True)):
+            service.use_graphql = use_graphql
+            latencies = []
+            before = stub.requests
+            for _ in range(args.rounds):
+                start = time.perf_counter()
+                projects = await service.fetch_projects(names)
+                latencies.append((time.perf_counter() - start) * 1000)
+            results[label] = [p.model_dump() for p in projects]
+            print(f"  {label:<10} {summarize(latencies)}   每轮请求 {(stub.requests - before) // args.rounds}"
+                  f"   项目 {len(projects)}")
+
+        rest, graphql = results.values()
+        print(f"  两种方式解析结果{'一致' if rest == graphql else '不一致'}")
+        await get_http_clients().aclose()
+
+
+def chat_handler(latency: float, per_project: float, drop_every: int, stats: dict) -> Callable:
+    """桩 /chat/completions：按 prompt 中的项目返回增强结果
+
+    每个请求耗时 latency + per_project × 项目数（模拟固定开销与逐项目生成）；
+    批量响应中每 drop_every 个项目缺失一个（每个项目只缺失一次，记录在 stats["seen"]），
+    用于验证只重试失败的项目。
+    """
+    lock = threading.Lock()
+
+    def handle(body, _headers):
+        prompt = json.loads(body)["messages"][-1]["content"]
+        with lock:
+            stats["prompt_tokens"] += AIService.estimate_tokens(prompt)
+        if "Project: " in prompt:
+            names = [prompt.split("Project: ", 1)[1].split("\n", 1)[0]]
+        else:
+            names = [json.loads(line)["full_name"] for line in prompt.splitlines() if line.startswith('{"full_name"')]
+        time.sleep(latency + per_project * len(names))
+
+        items = []
+        for i, name in enumerate(names):
+            if len(names) > 1 and drop_every and i % drop_every == drop_every - 1:
+                with lock:
+                    first = name not in stats["seen"]
+                    stats["seen"].add(name)
+                if first:
+                    continue
+            items.append({"full_name": name, "enhanced_description": f"{name} 的中文介绍",
+                          "usage_steps": ["克隆仓库", "安装依赖"], "category": "通用工具"})
+        content = json.dumps(items[0] if len(names) == 1 else items, ensure_ascii=False)
+        payload = {"choices": [{"message": {"content": f"```json\n{content}\n```"}}]}
+        return 200, {}, json.dumps(payload).encode("utf-8")
+
+    return handle
+
+
+async def bench_ai_batch(args) -> None:
+    """AI 增强：每个项目一个请求 vs 多项目批量请求"""
+    projects = [
+        ProjectCreate(name=repo["name"], full_name=repo["full_name"], url=repo["html_url"],
+                      description=repo["description"], language=repo["language"], stars=repo["stargazers_count"])
+        for repo in map(fake_repository, range(args.projects))
+    ]
+    stats = {"prompt_tokens": 0, "seen": set()}
+    handler = chat_handler(args.ai_latency / 1000, args.ai_per_project / 1000, 4, stats)
+
+    with StubServer({("POST", "/chat/completions"): handler}, connect_delay=args.connect_delay / 1000) as stub, \
+            tempfile.TemporaryDirectory() as tmp:
+        for batch_size in (1, 5, 10):
+            settings = {**AI_LIMIT_DEFAULTS, "batchSize": batch_size}
+            latencies, requests, tokens, retried, enhanced = [], 0, 0, 0, 0
+            for round_no in range(args.rounds):
+                service = AIService(provider="benchmark", model="stub", api_key="benchmark", endpoint=stub.url)
+                # 每轮使用空缓存，只比较模型调用
+                service.cache = AICache(os.path.join(tmp, f"ai-{batch_size}-{round_no}.json"))
+                service.limiter = ProviderLimiter("benchmark", settings["concurrency"], 10 ** 6)
+                stats["seen"].clear()
+                before_requests, before_tokens = stub.requests, stats["prompt_tokens"]
+                start = time.perf_counter()
+                _, enhanced, timings = await enhance_projects(service, projects, settings)
+                latencies.append((time.perf_counter() - start) * 1000)
+                requests += stub.requests - before_requests
+                tokens += stats["prompt_tokens"] - before_tokens
+                retried += sum(1 for t in timings if t["attempts"] > 1)
+            print(f"  batch={batch_size:<3} {summarize(latencies)}   每轮请求 {requests // args.rounds:3d}"
+                  f"   prompt tokens {tokens // args.rounds:6d}   重试项目 {retried // args.rounds}"
+                  f"   增强 {enhanced}/{len(projects)}")
+        await get_http_clients().aclose()
+
+
+SCENARIOS = {
+    "http_pool": bench_http_pool,
+    "graphql_batch": bench_graphql_batch,
+    "ai_batch": bench_ai_batch,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="上游请求性能基准")
+    parser.add_argument("scenario", nargs="?", default="all", choices=["all", *SCENARIOS])
+    parser.add_argument("-n", "--requests", type=int, default=200, help="每种方式的请求数")
+    parser.add_argument("-c", "--concurrency", type=int, default=10, help="并发数")
+    parser.add_argument("--connect-delay", type=float, default=20.0, help="新建连接的模拟握手延迟（毫秒）")
+    parser.add_argument("--repos", type=int, default=100, help="graphql_batch: 获取的仓库数")
+    parser.add_argument("--rounds", type=int, default=5, help="graphql_batch / ai_batch: 每种方式的轮数")
+    parser.add_argument("--rtt", type=float, default=30.0, help="graphql_batch: 每个请求的模拟往返延迟（毫秒）")
+    parser.add_argument("--projects", type=int, default=30, help="ai_batch: 增强的项目数")
+    parser.add_argument("--ai-latency", type=float, default=300.0, help="ai_batch: 每个请求的固定耗时（毫秒）")
+    parser.add_argument("--ai-per-project", type=float, default=40.0, help="ai_batch: 每个项目的生成耗时（毫秒）")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    names = list(SCENARIOS) if args.scenario == "all" else [args.scenario]
+    for name in names:
+        print(f"\n▶ {name}: {SCENARIOS[name].__doc__}")
+        asyncio.run(SCENARIOS[name](args))
+
+
+if __name__ == "__main__":
+    main()
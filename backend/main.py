@@ -13,7 +13,17 @@ from fastapi.staticfiles import StaticFiles
 from contextlib import asynccontextmanager
 import uvicorn
 
-from routers import projects, history, config
+from routers import projects, history, config, admin
+from services.storage import get_storage
+from services.response_cache import get_response_cache
+from services.http import get_http_clients
+from services.readme_cache import get_readme_cache
+from services.readme_warmup import get_readme_warmup
+from services.rate_limit import get_github_scheduler
+from services.singleflight import get_singleflight
+from services.ai_limits import get_ai_limit_stats
+from services.ai_cache import get_ai_cache
+from services.ai_pool import get_ai_provider_stats
 
 # ==================== 日志配置 ====================
 LOG_DIR = os.path.join(os.path.dirname(__file__), "../logs")
@@ -54,8 +64,13 @@ async def lifespan(app: FastAPI):
     if not os.path.exists(data_dir):
         os.makedirs(data_dir, exist_ok=True)
     
+    # 各上游共享的连接池客户端，关闭时统一释放连接
+    http_clients = get_http_clients()
+    http_clients.open()
+
     logger.info("GitHub Trending API Server Started")
     yield
+    await http_clients.aclose()
     logger.info("Server Shutdown")
 
 
@@ -94,9 +109,27 @@ async def health_check():
     return {"status": "healthy", "service": "github-trending-api"}
 
 
+@app.get("/metrics")
+async def metrics():
+    """运行时指标（缓存命中、连接池等）"""
+    return {
+        "storage": get_storage().get_cache_stats(),
+        "responses": get_response_cache().get_stats(),
+        "http": get_http_clients().get_stats(),
+        "readme_cache": get_readme_cache().get_stats(),
+        "readme_warmup": get_readme_warmup().get_progress(),
+        "github": get_github_scheduler().get_stats(),
+        "singleflight": get_singleflight().get_stats(),
+        "ai": get_ai_limit_stats(),
+        "ai_cache": get_ai_cache().get_stats(),
+        "ai_providers": get_ai_provider_stats()
+    }
+
+
 app.include_router(projects.router)
 app.include_router(history.router)
 app.include_router(config.router)
+app.include_router(admin.router)
 
 app.mount("/static", StaticFiles(directory=WEB_DIR), name="static")
 
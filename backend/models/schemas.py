@@ -26,6 +26,12 @@ class ProjectCreate(ProjectBase):
     category: Optional[str] = None
     trend: str = "stable"
     usage_steps: List[str] = []
+    topics: List[str] = []
+    fingerprint: Optional[str] = None  # 内容指纹（描述、topics、语言、pushed_at），刷新时判断是否变化
+    ai_enhanced: bool = False
+    stars_delta_7d: Optional[int] = None  # 由历史快照计算，历史不足时为空
+    stars_delta_30d: Optional[int] = None
+    forks_delta_7d: Optional[int] = None
 
 
 class ProjectResponse(ProjectBase):
@@ -35,6 +41,11 @@ class ProjectResponse(ProjectBase):
     category: Optional[str] = None
     trend: str = "stable"
     usage_steps: List[str] = []
+    topics: List[str] = []
+    ai_enhanced: bool = False
+    stars_delta_7d: Optional[int] = None
+    stars_delta_30d: Optional[int] = None
+    forks_delta_7d: Optional[int] = None
 
     class Config:
         from_attributes = True
@@ -45,6 +56,7 @@ class ProjectsResponse(BaseModel):
     last_updated: Optional[str] = None  # 改为字符串，避免 datetime 解析问题
     projects: List[ProjectResponse]
     total_count: int
+    next_cursor: Optional[str] = None  # 分页时下一页的游标，没有更多数据时为空
 
 
 class HistoryRecord(BaseModel):
@@ -54,11 +66,28 @@ class HistoryRecord(BaseModel):
     date: str
     total_projects: int
     projects: List  # 可以是字符串列表（项目名）或对象列表（完整项目详情）
+    stats: Optional[dict] = None  # 保存时物化的统计（分布、Top-N、分位数）
 
 
 class HistoryResponse(BaseModel):
     """历史记录响应"""
     history: List[HistoryRecord]
+    total_count: Optional[int] = None  # 分页时的总周数
+    next_cursor: Optional[str] = None
+
+
+class HistoryStats(BaseModel):
+    """单周统计（不含项目详情）"""
+    id: str
+    week: str
+    date: str
+    total_projects: int
+    stats: dict
+
+
+class HistoryStatsResponse(BaseModel):
+    """历史统计响应"""
+    history: List[HistoryStats]
 
 
 class RefreshResponse(BaseModel):
@@ -67,6 +96,8 @@ class RefreshResponse(BaseModel):
     message: str
     last_updated: Optional[str] = None
     projects_count: int
+    reused: int = 0  # 内容未变化、沿用上次结果的项目数
+    recomputed: int = 0  # 新增或变化、重新生成的项目数
 
 
 class ErrorResponse(BaseModel):
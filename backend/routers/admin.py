@@ -0,0 +1,73 @@
+"""
+管理 API 路由
+"""
+
+import asyncio
+from typing import Optional
+from fastapi import APIRouter
+from services.ai_cache import get_ai_cache
+from services.readme_cache import get_readme_cache
+from services.readme_warmup import get_readme_warmup
+
+router = APIRouter(prefix="/api/admin", tags=["admin"])
+
+
+@router.get("/readme-cache")
+async def get_readme_cache_status():
+    """
+    查看 README 缓存统计与条目（最近访问在前）
+    """
+    cache = get_readme_cache()
+    return {
+        "stats": cache.get_stats(),
+        "entries": cache.list_entries()
+    }
+
+
+@router.delete("/readme-cache")
+async def purge_readme_cache(project: Optional[str] = None):
+    """
+    清除 README 缓存（指定 project=owner/repo 时只清除该项目）
+    """
+    removed = get_readme_cache().purge(project)
+    return {"message": f"已清除 {removed} 条 README 缓存", "removed": removed}
+
+
+@router.get("/readme-warmup")
+async def get_readme_warmup_status():
+    """
+    查看刷新后 README 预热的进度
+    """
+    return get_readme_warmup().get_progress()
+
+
+@router.delete("/readme-warmup")
+async def cancel_readme_warmup():
+    """
+    取消正在进行的 README 预热
+    """
+    cancelled = get_readme_warmup().cancel()
+    return {
+        "message": "已取消 README 预热" if cancelled else "没有正在进行的 README 预热",
+        "cancelled": cancelled,
+        "progress": get_readme_warmup().get_progress()
+    }
+
+
+@router.get("/ai-cache")
+async def get_ai_cache_status():
+    """
+    查看 AI 增强缓存统计
+    """
+    return {"stats": get_ai_cache().get_stats()}
+
+
+@router.delete("/ai-cache")
+async def purge_ai_cache(project: Optional[str] = None):
+    """
+    清除 AI 增强缓存（指定 project=owner/repo 时只清除该项目）
+    """
+    cache = get_ai_cache()
+    removed = cache.purge(project)
+    await asyncio.wrap_future(cache.flush_later())
+    return {"message": f"已清除 {removed} 条 AI 增强缓存", "removed": removed}
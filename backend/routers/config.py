@@ -2,11 +2,14 @@
 配置管理 API 路由
 """
 
+import asyncio
 import os
 import json
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import Optional
+from services.rate_limit import get_github_scheduler
+from services.writer import atomic_write_json, get_writer
 
 router = APIRouter(prefix="/api/config", tags=["config"])
 
@@ -56,9 +59,19 @@ def load_config() -> dict:
 
 
 def save_config(new_config: dict) -> None:
-    """保存配置（深度合并，保留所有字段）"""
-    os.makedirs(os.path.dirname(CONFIG_FILE), exist_ok=True)
-    
+    """保存配置（深度合并，保留所有字段）
+
+    读取-合并-写入整体在单写线程中执行，并发保存不会互相覆盖。
+    """
+    get_writer().run(lambda: _merge_and_save_config(new_config))
+
+
+async def save_config_async(new_config: dict) -> None:
+    """save_config 的异步版本（等待写线程时不阻塞事件循环）"""
+    await asyncio.wrap_future(get_writer().submit(lambda: _merge_and_save_config(new_config)))
+
+
+def _merge_and_save_config(new_config: dict) -> None:
     # 加载现有配置
     current_config = load_config()
     
@@ -74,8 +87,7 @@ def save_config(new_config: dict) -> None:
     
     merged_config = deep_merge(current_config, new_config)
     
-    with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
-        json.dump(merged_config, f, ensure_ascii=False, indent=2)
+    atomic_write_json(CONFIG_FILE, merged_config)
 
 
 @router.get("/ai", response_model=AIConfigResponse)
@@ -112,7 +124,8 @@ async def test_ai_config(config: AIConfig):
         # 测试调用
         test_prompt = "你好，请回复 '测试成功'"
         
-        response = await ai_service._call_ai(test_prompt)
+        # 直接请求该 provider，不经过熔断和备用 provider
+        response = await ai_service._post_completion(test_prompt)
         
         if response:
             return {
@@ -159,7 +172,7 @@ async def save_ai_config(config: AIConfig):
         model = config.model if config.model else ai_service.model
         
         # 深度合并保存（保留 project 等其他配置）
-        save_config({
+        await save_config_async({
             "ai": {
                 "provider": config.provider,
                 "model": model,
@@ -188,7 +201,7 @@ async def delete_ai_config():
     config = load_config()
     if "ai" in config:
         del config["ai"]
-        save_config(config)
+        await save_config_async(config)
     
     return {"success": True, "message": "配置已删除"}
 
@@ -217,13 +230,15 @@ async def save_github_config(config: GitHubConfig):
             if "github" not in current_config:
                 current_config["github"] = {}
             current_config["github"]["token"] = config.token
-            save_config(current_config)
+            await save_config_async(current_config)
         else:
             # 删除 token
             if "github" in current_config:
                 del current_config["github"]
-                save_config(current_config)
+                await save_config_async(current_config)
         
+        get_github_scheduler().reload_tokens()
+
         return {
             "success": True,
             "message": "GitHub 配置已保存",
@@ -240,6 +255,7 @@ async def delete_github_config():
     config = load_config()
     if "github" in config:
         del config["github"]
-        save_config(config)
+        await save_config_async(config)
+        get_github_scheduler().reload_tokens()
     
     return {"success": True, "message": "GitHub 配置已删除"}
@@ -2,28 +2,142 @@
 历史记录 API 路由
 """
 
-from fastapi import APIRouter, HTTPException
-from models.schemas import HistoryResponse, HistoryRecord
-from services.storage import StorageService
+import csv
+import io
+from typing import Iterator, Optional
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from models.schemas import HistoryResponse, HistoryRecord, HistoryStats, HistoryStatsResponse
+from services.storage import get_storage
+from services.response_cache import get_response_cache
+from services.pagination import decode_cursor, next_cursor
 
 router = APIRouter(prefix="/api/history", tags=["history"])
 
 # 初始化服务
-storage = StorageService()
+storage = get_storage()
+response_cache = get_response_cache()
+
+
+def _build_history_page(offset: int, limit: Optional[int], summary: bool) -> HistoryResponse:
+    records, total = storage.query_history(offset=offset, limit=limit)
+    if summary:
+        records = [r.model_copy(update={"projects": []}) for r in records]
+    return HistoryResponse(
+        history=records,
+        total_count=total,
+        next_cursor=next_cursor(offset, len(records), total) if limit is not None else None
+    )
 
 
 @router.get("/", response_model=HistoryResponse)
-async def get_history():
+async def get_history(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=100, description="每页周数，不传则返回全部"),
+    cursor: Optional[str] = Query(None, description="上一页返回的 next_cursor"),
+    summary: bool = Query(False, description="只返回每周摘要与统计，不含项目详情"),
+):
     """
-    获取所有历史记录
+    获取历史记录（最新在前，按周分页；按快照版本缓存序列化结果，支持 ETag / 304 与 gzip）
     """
     try:
-        history = storage.load_history()
-        return HistoryResponse(history=history)
+        offset = decode_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        if limit is None and offset == 0 and not summary:
+            return response_cache.respond(
+                request, "history", storage.get_history_version(),
+                lambda: HistoryResponse(history=storage.load_history())
+            )
+        return response_cache.respond(
+            request, ("history", offset, limit, summary), storage.get_history_version(),
+            lambda: _build_history_page(offset, limit, summary), variant=True
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _build_history_stats() -> HistoryStatsResponse:
+    return HistoryStatsResponse(history=[
+        HistoryStats(
+            id=h.id,
+            week=h.week,
+            date=h.date,
+            total_projects=h.total_projects,
+            stats=h.stats or {}
+        )
+        for h in storage.load_history()
+    ])
+
+
+@router.get("/stats", response_model=HistoryStatsResponse)
+async def get_history_stats(request: Request):
+    """
+    获取每周的物化统计（不含项目详情）
+    """
+    try:
+        return response_cache.respond(
+            request, "history_stats", storage.get_history_version(), _build_history_stats
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+EXPORT_CSV_COLUMNS = (
+    "week_id", "week", "date", "rank", "name", "full_name", "language",
+    "category", "stars", "forks", "issues", "trend", "url",
+)
+
+
+def _export_ndjson() -> Iterator[str]:
+    """每行一条历史记录"""
+    for record in storage.iter_history():
+        yield record.model_dump_json() + "\n"
+
+
+def _export_csv() -> Iterator[str]:
+    """每行一个 项目-周"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush() -> str:
+        data = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return data
+
+    writer.writerow(EXPORT_CSV_COLUMNS)
+    yield flush()
+    for record in storage.iter_history():
+        for rank, item in enumerate(record.projects, start=1):
+            # 旧版记录中的项目可能只是项目名字符串
+            project = item if isinstance(item, dict) else {"name": str(item)}
+            writer.writerow([record.id, record.week, record.date, rank] + [
+                project.get(col, "") for col in EXPORT_CSV_COLUMNS[4:]
+            ])
+        yield flush()
+
+
+@router.get("/export")
+async def export_history(format: str = Query("ndjson", description="ndjson 或 csv")):
+    """
+    流式导出全部历史记录（逐周从存储读取并输出，不在内存中保留完整历史）
+    """
+    if format == "ndjson":
+        return StreamingResponse(
+            _export_ndjson(), media_type="application/x-ndjson",
+            headers={"Content-Disposition": 'attachment; filename="history.ndjson"'}
+        )
+    if format == "csv":
+        return StreamingResponse(
+            _export_csv(), media_type="text/csv; charset=utf-8",
+            headers={"Content-Disposition": 'attachment; filename="history.csv"'}
+        )
+    raise HTTPException(status_code=400, detail="format 只能是 ndjson 或 csv")
+
+
 @router.get("/{record_id}", response_model=HistoryRecord)
 async def get_history_record(record_id: str):
     """
@@ -47,13 +161,9 @@ async def delete_history_record(record_id: str):
     删除历史记录
     """
     try:
-        history = storage.load_history()
-        new_history = [h for h in history if h.id != record_id]
-
-        if len(new_history) == len(history):
+        if not await storage.delete_history_record_async(record_id):
             raise HTTPException(status_code=404, detail=f"Record {record_id} not found")
 
-        storage.save_history(new_history)
         return {"message": f"Record {record_id} deleted"}
     except HTTPException:
         raise
@@ -2,43 +2,109 @@
 项目相关 API 路由
 """
 
+import asyncio
+import json
 import logging
-from fastapi import APIRouter, HTTPException
-from typing import List, Optional
+import secrets
+import time
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from typing import Dict, List, Optional, Tuple
 from models.schemas import ProjectsResponse, ProjectResponse, RefreshResponse, ErrorResponse
+from routers.config import AIConfig, load_config as load_saved_config
 from services.github import GitHubService
-from services.storage import StorageService
+from services.storage import get_storage, SORT_KEYS
+from services.pagination import decode_cursor, next_cursor
+from services.refresh import refresh_projects as run_refresh
+from services.response_cache import get_response_cache
+from services.singleflight import get_singleflight
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/projects", tags=["projects"])
 
 # 初始化服务
-storage = StorageService()
+storage = get_storage()
+response_cache = get_response_cache()
 github_service = GitHubService()
+# 合并相同的进行中请求（README 获取、刷新）
+singleflight = get_singleflight()
+# 所有刷新（普通 / AI / SSE）共用一个 key：同一时间只有一次刷新读取和写入快照、历史，
+# 后到的请求加入进行中的刷新
+REFRESH_KEY = ("refresh",)
 
-# 存储异步任务结果
-_async_readme_results: dict = {}
+# SSE 刷新的一次性 token（EventSource 只能发 GET，API Key 不放进 URL）: token -> (过期时间, AI 参数)
+STREAM_TOKEN_TTL = 60
+_stream_tokens: Dict[str, Tuple[float, dict]] = {}
+
+
+def _build_projects_response() -> ProjectsResponse:
+    data = storage.load_projects()
+    projects = []
+
+    for item in data.get("projects", []):
+        projects.append(ProjectResponse(**item))
+
+    logger.info(f"序列化 {len(projects)} 个项目")
+    return ProjectsResponse(
+        last_updated=data.get("last_updated", ""),
+        projects=projects,
+        total_count=len(projects)
+    )
+
+
+def _build_projects_page(offset: int, limit: Optional[int], **query) -> ProjectsResponse:
+    page, total = storage.query_projects(offset=offset, limit=limit, **query)
+    return ProjectsResponse(
+        last_updated=storage.load_projects().get("last_updated", ""),
+        projects=[ProjectResponse(**p.model_dump()) for p in page],
+        total_count=total,
+        next_cursor=next_cursor(offset, len(page), total) if limit is not None else None
+    )
 
 
 @router.get("/", response_model=ProjectsResponse)
-async def get_projects():
+async def get_projects(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=500, description="每页数量，不传则返回全部"),
+    cursor: Optional[str] = Query(None, description="上一页返回的 next_cursor"),
+    language: Optional[str] = None,
+    category: Optional[str] = None,
+    trend: Optional[str] = None,
+    min_stars: Optional[int] = Query(None, ge=0),
+    sort: str = "rank",
+    order: str = "asc",
+):
     """
-    获取所有项目
+    获取项目列表（按快照版本缓存序列化结果，支持 ETag / 304 与 gzip）
+
+    支持服务端筛选（language / category / trend 不区分大小写，min_stars）、
+    排序（sort=rank|stars|forks|issues|name，order=asc|desc）与游标分页。
     """
+    if sort not in SORT_KEYS:
+        raise HTTPException(status_code=400, detail=f"sort 只能是 {', '.join(SORT_KEYS)}")
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="order 只能是 asc 或 desc")
     try:
-        logger.info("获取项目列表")
-        data = storage.load_projects()
-        projects = []
-
-        for item in data.get("projects", []):
-            projects.append(ProjectResponse(**item))
+        offset = decode_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-        logger.info(f"返回 {len(projects)} 个项目")
-        return ProjectsResponse(
-            last_updated=data.get("last_updated", ""),
-            projects=projects,
-            total_count=len(projects)
+    try:
+        logger.info("获取项目列表")
+        query = {
+            "language": language, "category": category, "trend": trend,
+            "min_stars": min_stars, "sort": sort, "order": order,
+        }
+        if limit is None and offset == 0 and not any((language, category, trend)) \
+                and min_stars is None and sort == "rank" and order == "asc":
+            return response_cache.respond(
+                request, "projects", storage.get_projects_version(), _build_projects_response
+            )
+        key = ("projects", offset, limit, *query.values())
+        return response_cache.respond(
+            request, key, storage.get_projects_version(),
+            lambda: _build_projects_page(offset, limit, **query), variant=True
         )
     except Exception as e:
         logger.error(f"获取项目列表失败: {e}")
@@ -49,162 +115,182 @@ async def get_projects():
 async def refresh_projects():
     """
     刷新项目数据（从 GitHub 获取最新趋势）
+
+    已有刷新（包括 AI 刷新）在进行时不会再次抓取，等待并返回同一次刷新的结果。
     """
     try:
         logger.info("刷新项目数据...")
-        projects = await github_service.fetch_trending_projects(days=7, per_page=10)
-        logger.info(f"获取到 {len(projects)} 个项目")
-
-        saved_data = storage.save_projects(projects)
-
-        # 添加历史记录
-        from models.schemas import HistoryRecord
-        from datetime import datetime
-
-        week_num = datetime.now().isocalendar()[1]
-        year = datetime.now().year
-        
-        projects_detail = []
-        for p in projects:
-            projects_detail.append({
-                "name": p.name,
-                "full_name": p.full_name,
-                "url": p.url,
-                "description": p.description,
-                "language": p.language,
-                "stars": p.stars,
-                "forks": p.forks,
-                "issues": p.issues,
-                "fork_url": p.fork_url,
-                "issues_url": p.issues_url,
-                "category": p.category,
-                "trend": p.trend,
-                "usage_steps": p.usage_steps
-            })
-        
-        record = HistoryRecord(
-            id=f"{year}-W{week_num}",
-            week=f"{year}年{week_num}月第{week_num}周",
-            date=datetime.now().strftime("%Y-%m-%d"),
-            total_projects=len(projects),
-            projects=projects_detail
-        )
-        storage.add_history_record(record)
+        result = await singleflight.do(REFRESH_KEY, lambda: run_refresh(github_service, storage))
+        projects = result["projects"]
 
         logger.info("项目数据刷新完成")
         return RefreshResponse(
             success=True,
             message=f"成功获取 {len(projects)} 个项目",
-            last_updated=saved_data.get("last_updated", ""),
-            projects_count=len(projects)
+            last_updated=result["saved"].get("last_updated", ""),
+            projects_count=len(projects),
+            reused=result["reused"],
+            recomputed=result["recomputed"]
         )
     except Exception as e:
         logger.error(f"刷新项目数据失败: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _build_ai_service(provider: str, api_key: str, endpoint: str, model: str = ""):
+    if not (api_key and provider):
+        return None
+    try:
+        from services.ai import AIService, load_fallback_services
+        return AIService(
+            provider=provider, model=model, api_key=api_key, endpoint=endpoint,
+            fallbacks=load_fallback_services(provider)
+        )
+    except Exception as ai_error:
+        logger.error(f"AI 增强失败: {ai_error}")
+        return None
+
+
+def _saved_ai_params() -> dict:
+    """config.json 中保存的 AI 配置"""
+    saved = load_saved_config().get("ai", {}) or {}
+    return {
+        "provider": saved.get("provider") or "qwen",
+        "model": saved.get("model", ""),
+        "api_key": saved.get("api_key", ""),
+        "endpoint": saved.get("endpoint", ""),
+    }
+
+
+def _issue_stream_token(params: dict) -> str:
+    now = time.monotonic()
+    for token, (expires_at, _) in list(_stream_tokens.items()):
+        if expires_at <= now:
+            del _stream_tokens[token]
+    token = secrets.token_urlsafe(24)
+    _stream_tokens[token] = (now + STREAM_TOKEN_TTL, params)
+    return token
+
+
+def _take_stream_token(token: str) -> Optional[dict]:
+    """取出 token 对应的 AI 参数（只能使用一次），不存在或已过期时返回 None"""
+    entry = _stream_tokens.pop(token, None)
+    if entry is None or entry[0] <= time.monotonic():
+        return None
+    return entry[1]
+
+
+def _refresh_ai_summary(result: dict) -> dict:
+    projects = result["projects"]
+    return {
+        "success": True,
+        "message": f"AI 增强刷新成功，获取 {len(projects)} 个项目",
+        "last_updated": result["saved"].get("last_updated", ""),
+        "projects_count": len(projects),
+        "ai_enhanced": result["ai_used"],
+        "reused": result["reused"],
+        "recomputed": result["recomputed"],
+        "ai_enhanced_count": result["ai_enhanced"],
+        "ai_timings": result["ai_timings"]
+    }
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
 @router.post("/refresh-ai")
 async def refresh_projects_ai(provider: str = "qwen", api_key: str = "", endpoint: str = ""):
     """
     使用 AI 增强刷新项目数据
+
+    已有刷新在进行时等待并返回同一次刷新的结果（进行中的是普通刷新时 ai_enhanced 为 false）。
     """
     try:
         logger.info(f"AI 增强刷新项目数据... provider={provider}")
-        
-        github_svc = GitHubService()
-        projects = await github_svc.fetch_trending_projects(days=7, per_page=10)
-        logger.info(f"获取到 {len(projects)} 个项目")
-        
-        if api_key and provider:
-            try:
-                from services.ai import AIService
-                ai_service = AIService(provider=provider, api_key=api_key, endpoint=endpoint)
-                
-                enhanced_projects = []
-                for p in projects:
-                    enhanced = await ai_service.enhance_project(p)
-                    enhanced_projects.append(enhanced)
-                    logger.info(f"AI 增强项目: {p.full_name}")
-                
-                projects = enhanced_projects
-                logger.info("AI 增强完成")
-            except Exception as ai_error:
-                logger.error(f"AI 增强失败: {ai_error}")
-
-        saved_data = storage.save_projects(projects)
-
-        from models.schemas import HistoryRecord
-        from datetime import datetime
-
-        week_num = datetime.now().isocalendar()[1]
-        year = datetime.now().year
-        
-        projects_detail = []
-        for p in projects:
-            projects_detail.append({
-                "name": p.name,
-                "full_name": p.full_name,
-                "url": p.url,
-                "description": p.description,
-                "language": p.language,
-                "stars": p.stars,
-                "forks": p.forks,
-                "issues": p.issues,
-                "fork_url": p.fork_url,
-                "issues_url": p.issues_url,
-                "category": p.category,
-                "trend": p.trend,
-                "usage_steps": p.usage_steps
-            })
-        
-        record = HistoryRecord(
-            id=f"{year}-W{week_num}",
-            week=f"{year}年{week_num}月第{week_num}周",
-            date=datetime.now().strftime("%Y-%m-%d"),
-            total_projects=len(projects),
-            projects=projects_detail
-        )
-        storage.add_history_record(record)
-
-        return {
-            "success": True,
-            "message": f"AI 增强刷新成功，获取 {len(projects)} 个项目",
-            "last_updated": saved_data.get("last_updated", ""),
-            "projects_count": len(projects),
-            "ai_enhanced": bool(api_key)
-        }
+        ai_service = _build_ai_service(provider, api_key, endpoint)
+        result = await singleflight.do(REFRESH_KEY, lambda: run_refresh(GitHubService(), storage, ai_service))
+        return _refresh_ai_summary(result)
     except Exception as e:
         logger.error(f"AI 刷新失败: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/refresh-ai/stream")
+async def create_refresh_ai_stream(config: AIConfig):
+    """
+    签发 SSE 刷新的一次性 token（请求体同 /api/config/ai/save，api_key 为空时使用已保存的配置）
+
+    token 在 STREAM_TOKEN_TTL 秒内有效，只能使用一次。
+    """
+    params = config.model_dump() if config.api_key else _saved_ai_params()
+    return {"token": _issue_stream_token(params), "expires_in": STREAM_TOKEN_TTL}
+
+
+@router.get("/refresh-ai/stream")
+async def refresh_projects_ai_stream(token: str = ""):
+    """
+    使用 AI 增强刷新项目数据（Server-Sent Events）
+
+    不接受 URL 中的 API Key：带 token 时使用 POST /refresh-ai/stream 签发 token 时提交的配置，
+    否则使用已保存的 AI 配置。
+    每个项目增强完成或命中缓存时推送 project 事件，刷新完成时推送 done 事件（内容同 /refresh-ai），
+    失败时推送 error 事件。已有刷新在进行时合并到该刷新，只推送 done 事件。
+    """
+    params = _take_stream_token(token) if token else _saved_ai_params()
+    if params is None:
+        raise HTTPException(status_code=401, detail="token 无效或已过期")
+    provider = params["provider"]
+    logger.info(f"AI 增强刷新项目数据（SSE）... provider={provider}")
+    ai_service = _build_ai_service(provider, params["api_key"], params["endpoint"], params.get("model", ""))
+    events: asyncio.Queue = asyncio.Queue()
+
+    def on_enhanced(project, status: str) -> None:
+        events.put_nowait({
+            "full_name": project.full_name,
+            "status": status,
+            "description": project.description,
+            "category": project.category,
+            "usage_steps": project.usage_steps,
+        })
+
+    async def stream():
+        refresh = asyncio.ensure_future(singleflight.do(
+            REFRESH_KEY, lambda: run_refresh(GitHubService(), storage, ai_service, on_enhanced)
+        ))
+        try:
+            yield _sse("start", {"provider": provider, "ai_enhanced": ai_service is not None})
+            while True:
+                getter = asyncio.ensure_future(events.get())
+                await asyncio.wait({refresh, getter}, return_when=asyncio.FIRST_COMPLETED)
+                if not getter.done():
+                    getter.cancel()
+                    break
+                yield _sse("project", getter.result())
+            while not events.empty():
+                yield _sse("project", events.get_nowait())
+            try:
+                yield _sse("done", _refresh_ai_summary(refresh.result()))
+            except Exception as e:
+                logger.error(f"AI 刷新失败: {e}")
+                yield _sse("error", {"detail": str(e)})
+        finally:
+            # 客户端断开时刷新本身继续执行（single-flight 中共享）
+            refresh.cancel()
+
+    return StreamingResponse(
+        stream(), media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.get("/stats/summary")
-async def get_stats():
-    """获取统计信息"""
+async def get_stats(request: Request):
+    """获取统计信息（保存快照时已物化，直接返回）"""
     try:
-        data = storage.load_projects()
-        projects = data.get("projects", [])
-
-        languages = {}
-        categories = {}
-        total_stars = 0
-        total_forks = 0
-
-        for p in projects:
-            lang = p.get("language", "Unknown")
-            category = p.get("category", "Other")
-            languages[lang] = languages.get(lang, 0) + 1
-            categories[category] = categories.get(category, 0) + 1
-            total_stars += p.get("stars", 0)
-            total_forks += p.get("forks", 0)
-
-        return {
-            "total_projects": len(projects),
-            "total_stars": total_stars,
-            "total_forks": total_forks,
-            "language_distribution": languages,
-            "category_distribution": categories
-        }
+        return response_cache.respond(
+            request, "projects_stats", storage.get_projects_version(), storage.get_stats
+        )
     except Exception as e:
         logger.error(f"获取统计信息失败: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -222,15 +308,8 @@ async def get_project_readme(project_name: str):
         
         logger.info(f"获取 README: {project_name}")
         
-        # 从本地数据中查找项目
-        projects = storage.get_projects()
-        project = None
-        
-        for p in projects:
-            # 支持 name 和 full_name 两种格式
-            if p.name == project_name or p.full_name == project_name:
-                project = p
-                break
+        # 从本地数据中查找项目（支持 name 和 full_name 两种格式）
+        project = storage.find_project(project_name)
         
         if not project:
             logger.warning(f"项目不存在: {project_name}")
@@ -279,23 +358,15 @@ async def get_project_readme(project_name: str):
 async def get_project_readme_async(project_name: str):
     """
     异步获取项目 README（后台加载，前端轮询）
-    返回任务 ID，前端可以轮询获取结果
+    返回任务 ID，前端可以轮询获取结果；同一项目正在获取时返回同一个任务 ID
     """
-    import asyncio
-    import uuid
     from urllib.parse import unquote
     
     try:
         project_name = unquote(project_name)
         
         # 查找项目
-        projects = storage.get_projects()
-        project = None
-        
-        for p in projects:
-            if p.name == project_name or p.full_name == project_name:
-                project = p
-                break
+        project = storage.find_project(project_name)
         
         if not project:
             return {
@@ -305,39 +376,43 @@ async def get_project_readme_async(project_name: str):
             }
         
         full_name = project.full_name
-        task_id = str(uuid.uuid4())[:8]
-        
-        logger.info(f"[{task_id}] 启动异步获取 README: {full_name}")
-        
-        # 在后台任务中获取 README
+
+        # 缓存未过期时直接返回内容，无需轮询
+        cached = github_service.readme_cache.peek(full_name)
+        if cached is not None:
+            content = cached["content"]
+            return {
+                "task_id": None,
+                "status": "success" if content else "empty",
+                "readme": content,
+                "has_readme": content is not None,
+                "cached": True
+            }
+
+        # 在后台任务中获取 README（结果按任务 ID 保留一段时间，供多个客户端轮询）
         async def fetch_readme_background():
             try:
                 readme_content = await github_service.fetch_readme(full_name)
                 result = {
-                    "task_id": task_id,
                     "status": "success" if readme_content else "empty",
                     "readme": readme_content,
                     "has_readme": readme_content is not None
                 }
-                # 存储结果
-                _async_readme_results[task_id] = result
-                logger.info(f"[{task_id}] README 获取完成，状态: {result['status']}")
+                logger.info(f"README 获取完成: {full_name}，状态: {result['status']}")
                 return result
             except Exception as e:
-                logger.error(f"[{task_id}] 异步获取 README 失败: {e}")
-                result = {
-                    "task_id": task_id,
+                logger.error(f"异步获取 README 失败 {full_name}: {e}")
+                return {
                     "status": "error",
                     "message": str(e),
                     "readme": None,
                     "has_readme": False
                 }
-                _async_readme_results[task_id] = result
-                return result
-        
-        # 启动后台任务
-        asyncio.create_task(fetch_readme_background())
-        
+
+        # fetch_readme 内部已按 ("readme", ...) 合并，这里用不同的 key，避免后台任务等待自己
+        task_id = singleflight.start(("readme-async", full_name.casefold()), fetch_readme_background)
+        logger.info(f"[{task_id}] 异步获取 README: {full_name}")
+
         return {
             "task_id": task_id,
             "status": "pending",
@@ -359,20 +434,20 @@ async def get_readme_result(task_id: str):
     获取异步 README 获取结果
     """
     try:
-        # 从内存中获取结果（如果有）
-        result = _async_readme_results.get(task_id)
-        
-        if result:
-            # 清理已完成的任务（保留错误状态稍久一点）
-            if result.get("status") in ["success", "empty"]:
-                del _async_readme_results[task_id]
-            return result
-        
-        # 检查是否还在处理中
+        # 结果在过期前可重复读取（同一任务可能有多个客户端在轮询）
+        state, result = singleflight.result(task_id)
+        if state == "done":
+            return {"task_id": task_id, **result}
+        if state == "pending":
+            return {
+                "task_id": task_id,
+                "status": "pending",
+                "message": "正在获取..."
+            }
         return {
             "task_id": task_id,
-            "status": "pending",
-            "message": "正在获取..."
+            "status": "error",
+            "message": "任务不存在或已过期"
         }
         
     except Exception as e:
@@ -392,11 +467,10 @@ async def get_project(project_name: str):
     try:
         logger.info(f"获取项目详情: {project_name}")
         
-        projects = storage.get_projects()
-        for p in projects:
-            if p.name == project_name or p.full_name == project_name:
-                logger.info(f"找到项目: {p.full_name}")
-                return p
+        project = storage.find_project(project_name)
+        if project:
+            logger.info(f"找到项目: {project.full_name}")
+            return project
         
         logger.warning(f"项目不存在: {project_name}")
         raise HTTPException(status_code=404, detail=f"Project {project_name} not found")
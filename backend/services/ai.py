@@ -1,22 +1,86 @@
 """
 AI 服务 - 使用大模型增强项目数据
+
+增强结果按 (项目, 内容, provider, model, prompt 版本) 缓存（见 services/ai_cache），
+命中时不调用模型。模型请求经过 provider 池（见 services/ai_pool）：ai.pool 中配置的备用 provider
+用于对冲慢请求和故障切换，每个 provider 有熔断器和耗时直方图。
+stream_batch() 以 stream: true 请求模型，响应中每个项目的 JSON 对象闭合后立即产出。
 """
 
-import httpx
+import asyncio
 import json
 import logging
-from typing import Optional
+import time
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
 from models.schemas import ProjectCreate
+from services.ai_cache import cache_key, content_hash, get_ai_cache
+from services.ai_limits import get_provider_limiter
+from services.ai_pool import ProviderPool, get_provider_health, load_hedge_settings
+from services.config_loader import load_app_config
+from services.http import get_http_client
 
 logger = logging.getLogger(__name__)
 
 
+class JSONStreamExtractor:
+    """从流式文本中增量提取 JSON 对象
+
+    逐段 feed() 文本，每个顶层对象（或顶层数组中的每个对象元素）的括号闭合时立即解析并返回；
+    忽略 JSON 前后的说明文字和代码块标记，字符串中的括号和转义字符不影响匹配。
+    """
+
+    def __init__(self):
+        self._buf: List[str] = []
+        self._depth = 0  # 当前对象内的括号深度，0 表示不在对象中
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, text: str) -> List[Any]:
+        """追加一段文本，返回其中新闭合的对象"""
+        items = []
+        for ch in text:
+            if self._depth == 0:
+                if ch == "{":
+                    self._depth = 1
+                    self._buf = [ch]
+                continue
+            self._buf.append(ch)
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        items.append(json.loads("".join(self._buf)))
+                    except ValueError:
+                        pass
+                    self._buf = []
+        return items
+
+
 class AIService:
     """AI 增强服务"""
 
-    def __init__(self, provider: str = "qwen", model: str = "", api_key: str = "", endpoint: str = ""):
+    # 修改 prompt 或解析逻辑时递增，使旧的缓存结果失效
+    PROMPT_VERSION = 1
+    # 单个项目请求的输出上限；批量请求按项目数放大
+    MAX_TOKENS = 2000
+    BATCH_OUTPUT_TOKENS = 600
+
+    def __init__(self, provider: str = "qwen", model: str = "", api_key: str = "", endpoint: str = "",
+                 fallbacks: Optional[List["AIService"]] = None):
         self.provider = provider
         self.api_key = api_key
+        self.cache = get_ai_cache()
         
         # 配置不同 provider 的默认端点和模型
         provider_configs = {
@@ -50,21 +114,236 @@ class AIService:
             self.endpoint = endpoint or ""
             self.model = model or "default"
 
-    async def enhance_project(self, project: ProjectCreate) -> ProjectCreate:
-        """使用 AI 增强项目数据"""
+        # 熔断器和耗时直方图按 name、并发 / 速率限制按 provider 在进程内共享
+        self.name = f"{self.provider}/{self.model}"
+        self.limiter = get_provider_limiter(self.provider)
+        # 本服务优先，fallbacks 按顺序作为对冲和故障切换的目标
+        self.pool = ProviderPool([self] + list(fallbacks or []), load_hedge_settings())
+
+    def _cache_key(self, project: ProjectCreate, member: Optional["AIService"] = None) -> str:
+        """缓存键（member 为生成结果的 provider，默认本服务）"""
+        member = member or self
+        digest = content_hash(project.description, project.language, project.topics)
+        return cache_key(project.full_name, digest, member.provider, member.model, self.PROMPT_VERSION)
+
+    def _cache_keys(self, project: ProjectCreate) -> List[str]:
+        """按 provider 池顺序的缓存键（本服务优先）"""
+        return [self._cache_key(project, member) for member in self.pool.members]
+
+    def _cache_put(self, project: ProjectCreate, member: "AIService", data: dict) -> None:
+        self.cache.put(self._cache_key(project, member), project.full_name, member.provider, member.model, data)
+
+    def from_cache(self, project: ProjectCreate) -> Optional[ProjectCreate]:
+        """缓存中有相同内容、由池中某个模型生成的增强结果时返回增强后的项目（本服务的结果优先）"""
+        cached = self.cache.get(*self._cache_keys(project))
+        if cached is None:
+            return None
+        return self._apply(cached, project)
+
+    async def enhance_project(self, project: ProjectCreate, check_cache: bool = True) -> ProjectCreate:
+        """使用 AI 增强项目数据（优先使用缓存；调用方已查过缓存时 check_cache=False）"""
+        cached = self.cache.get(*self._cache_keys(project)) if check_cache else None
+        if cached is not None:
+            logger.info(f"AI 增强缓存命中: {project.full_name}")
+            return self._apply(cached, project)
+
         try:
             prompt = self._build_prompt(project)
-            response = await self._call_ai(prompt)
+            result = await self._call_ai(prompt, parse=self._extract_json)
             
-            if response:
-                enhanced = self._parse_response(response, project)
-                return enhanced
+            if result:
+                member, data = result
+                self._cache_put(project, member, data)
+                return self._apply(data, project)
             
         except Exception as e:
             logger.error(f"AI 增强失败 for {project.full_name}: {e}")
         
         return project
 
+    async def stream_batch(self, projects: List[ProjectCreate]) -> AsyncIterator[Tuple[int, ProjectCreate]]:
+        """流式增强一批项目（不查缓存，结果写入缓存），每个项目的增强字段完整后立即产出 (下标, 项目)
+
+        直接以 stream: true 请求本 provider；熔断中或流在产出结果前失败时，改用 provider 池的
+        普通请求（对冲、故障切换）增强尚未产出的项目。响应中缺失或不合法的项目不产出。
+        """
+        health = get_provider_health(self.name)
+        produced = set()
+        if health.breaker.allow():
+            started = None
+            try:
+                async with self.limiter.slot():
+                    health.stats["requests"] += 1
+                    started = time.monotonic()
+                    async for i, data in self._stream_items(projects):
+                        if i in produced:
+                            continue
+                        produced.add(i)
+                        self._cache_put(projects[i], self, data)
+                        yield i, self._apply(data, projects[i])
+            except (asyncio.CancelledError, GeneratorExit):
+                health.stats["cancelled"] += 1
+                health.breaker.release()
+                raise
+            except Exception as e:
+                logger.error(f"AI 流式请求失败 ({self.name}): {e}")
+                health.record(False, time.monotonic() - started if started is not None else 0.0)
+            else:
+                # 流正常结束即视为请求成功；没有产出有效项目只计为无效响应，不计入熔断器
+                health.record(True, time.monotonic() - started)
+                if produced:
+                    return
+                health.stats["invalid"] += 1
+        remaining = [i for i in range(len(projects)) if i not in produced]
+        if not remaining:
+            return
+        enhanced = await self.enhance_batch([projects[i] for i in remaining])
+        for i, project in zip(remaining, enhanced or []):
+            if project is not None:
+                yield i, project
+
+    async def _stream_items(self, projects: List[ProjectCreate]) -> AsyncIterator[Tuple[int, dict]]:
+        """流式请求，产出 (下标, 通过校验的增强字段)"""
+        extractor = JSONStreamExtractor()
+        if len(projects) == 1:
+            stream = self._stream_completion(self._build_prompt(projects[0]))
+        else:
+            stream = self._stream_completion(
+                self._build_batch_prompt(projects), max_tokens=self.BATCH_OUTPUT_TOKENS * len(projects)
+            )
+        index = {p.full_name.casefold(): i for i, p in enumerate(projects)}
+        async for delta in stream:
+            for item in extractor.feed(delta):
+                if len(projects) == 1:
+                    data = self._validate(item) if isinstance(item, dict) else None
+                    if data is not None:
+                        yield 0, data
+                    continue
+                for entry in self._batch_entries(item):
+                    i = index.get(entry["full_name"].casefold())
+                    data = self._validate(entry)
+                    if i is not None and data is not None:
+                        yield i, data
+
+    @staticmethod
+    def estimate_tokens(text: str) -> int:
+        """粗略估算 token 数（ASCII 约 4 字符 1 个 token，其余字符按 1 个计）"""
+        ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+        return (ascii_chars + 3) // 4 + (len(text) - ascii_chars)
+
+    def plan_batches(self, projects: List[ProjectCreate], batch_size: int, token_budget: int) -> List[List[int]]:
+        """按顺序把项目（下标）装入批次：每批不超过 batch_size 个、prompt 不超过 token_budget（每批至少 1 个）"""
+        base = self.estimate_tokens(self._build_batch_prompt([]))
+        batches: List[List[int]] = []
+        current: List[int] = []
+        used = base
+        for i, project in enumerate(projects):
+            cost = self.estimate_tokens(self._batch_item(project))
+            if current and (len(current) >= batch_size or used + cost > token_budget):
+                batches.append(current)
+                current, used = [], base
+            current.append(i)
+            used += cost
+        if current:
+            batches.append(current)
+        return batches
+
+    async def enhance_batch(self, projects: List[ProjectCreate]) -> Optional[List[Optional[ProjectCreate]]]:
+        """一次请求增强多个项目（不查缓存，结果写入缓存）
+
+        返回与 projects 对应的列表，响应中缺失或不合法的项目为 None；请求本身失败时返回 None。
+        只有一个项目时使用单项目 prompt。
+        """
+        if len(projects) == 1:
+            enhanced = await self.enhance_project(projects[0], check_cache=False)
+            return [enhanced if enhanced.ai_enhanced else None]
+
+        result = await self._call_ai(
+            self._build_batch_prompt(projects), max_tokens=self.BATCH_OUTPUT_TOKENS * len(projects),
+            parse=lambda r: self._parse_batch_response(r, projects) or None
+        )
+        if not result:
+            return None
+        member, parsed = result
+        results = []
+        for project in projects:
+            data = parsed.get(project.full_name.casefold())
+            if data is None:
+                logger.warning(f"批量 AI 响应中缺少或不合法: {project.full_name}")
+                results.append(None)
+                continue
+            self._cache_put(project, member, data)
+            results.append(self._apply(data, project))
+        return results
+
+    @staticmethod
+    def _batch_item(project: ProjectCreate) -> str:
+        return json.dumps({
+            "full_name": project.full_name,
+            "description": project.description or '暂无描述',
+            "language": project.language,
+            "stars": project.stars
+        }, ensure_ascii=False)
+
+    def _build_batch_prompt(self, projects: List[ProjectCreate]) -> str:
+        """构建多项目 prompt（要求返回按 full_name 对应的 JSON 数组）"""
+        return '''Please analyze these GitHub projects and generate enhanced descriptions in Chinese.
+
+Projects (one JSON object per line):
+{items}
+
+Return a JSON array with exactly one object per project, using the same full_name:
+[{{"full_name": "owner/repo", "enhanced_description": "...", "usage_steps": ["step1", "step2"], "category": "..."}}]
+'''.format(items="\n".join(self._batch_item(p) for p in projects))
+
+    def _parse_batch_response(self, response: str, projects: List[ProjectCreate]) -> Dict[str, dict]:
+        """解析批量响应，返回 full_name（小写）-> 通过校验的增强字段"""
+        wanted = {p.full_name.casefold() for p in projects}
+        entries = [entry for item in JSONStreamExtractor().feed(response) for entry in self._batch_entries(item)]
+        if not entries:
+            logger.error("解析批量 AI 响应失败: 未找到项目 JSON 对象")
+            return {}
+
+        parsed = {}
+        for entry in entries:
+            key = entry["full_name"].casefold()
+            data = self._validate(entry)
+            if key in wanted and key not in parsed and data is not None:
+                parsed[key] = data
+        return parsed
+
+    @staticmethod
+    def _batch_entries(item: Any) -> List[dict]:
+        """批量响应中的一个 JSON 对象 -> 带 full_name 的项目条目
+
+        兼容以 full_name 为键的对象和包了一层的数组（如 {"projects": [...]}）。
+        """
+        if not isinstance(item, dict):
+            return []
+        if isinstance(item.get("full_name"), str):
+            return [item]
+        entries = []
+        for name, value in item.items():
+            if isinstance(value, dict):
+                entries.append({**value, "full_name": name})
+            elif isinstance(value, list):
+                entries.extend(v for v in value if isinstance(v, dict) and isinstance(v.get("full_name"), str))
+        return entries
+
+    @staticmethod
+    def _validate(item: dict) -> Optional[dict]:
+        """校验单个项目的增强字段，不合法时返回 None"""
+        description = item.get("enhanced_description")
+        steps = item.get("usage_steps", [])
+        category = item.get("category")
+        if not isinstance(description, str) or not description.strip():
+            return None
+        if not isinstance(steps, list) or not all(isinstance(step, str) for step in steps):
+            return None
+        if category is not None and not isinstance(category, str):
+            return None
+        return {"enhanced_description": description, "usage_steps": steps, "category": category}
+
     def _build_prompt(self, project: ProjectCreate) -> str:
         """构建 AI prompt"""
         return '''Please analyze this GitHub project and generate enhanced description in Chinese:
@@ -83,68 +362,102 @@ Return JSON format:
             stars=project.stars
         )
 
-    async def _call_ai(self, prompt: str) -> Optional[str]:
-        """调用 AI API"""
+    async def _call_ai(self, prompt: str, max_tokens: Optional[int] = None,
+                       parse: Optional[Callable[[str], Any]] = None) -> Optional[Tuple["AIService", Any]]:
+        """通过 provider 池调用 AI API，返回 (响应的 provider, 第一个有效响应的 parse 结果)"""
+        return await self.pool.call(prompt, max_tokens, parse)
+
+    async def _post_completion(self, prompt: str, max_tokens: Optional[int] = None) -> Optional[str]:
+        """直接调用本 provider 的 AI API"""
         try:
-            async with httpx.AsyncClient(timeout=60.0) as client:
-                headers = {
-                    "Content-Type": "application/json; charset=utf-8",
-                    "Authorization": f"Bearer {self.api_key}"
-                }
-                
-                # 使用纯 ASCII 或确保 UTF-8
-                data = {
-                    "model": self.model,
-                    "messages": [
-                        {"role": "system", "content": "You are a helpful assistant. Reply in Chinese."},
-                        {"role": "user", "content": prompt}
-                    ],
-                    "temperature": 0.7,
-                    "max_tokens": 2000
-                }
-                
-                url = f"{self.endpoint}/chat/completions"
-                response = await client.post(url, headers=headers, json=data)
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    content = result["choices"][0]["message"]["content"]
-                    # 确保返回的是 UTF-8 字符串
-                    if isinstance(content, bytes):
-                        content = content.decode('utf-8')
-                    return content
-                else:
-                    logger.error(f"AI API 错误: {response.status_code} - {response.text[:200]}")
-                    return None
-                    
+            client = get_http_client("ai")
+            url, headers, data = self._request(prompt, max_tokens)
+            response = await client.post(url, headers=headers, json=data)
+
+            if response.status_code == 200:
+                result = response.json()
+                content = result["choices"][0]["message"]["content"]
+                # 确保返回的是 UTF-8 字符串
+                if isinstance(content, bytes):
+                    content = content.decode('utf-8')
+                return content
+            else:
+                logger.error(f"AI API 错误: {response.status_code} - {response.text[:200]}")
+                return None
+
         except Exception as e:
             logger.error(f"AI 调用异常: {e}")
             return None
 
-    def _parse_response(self, response: str, original: ProjectCreate) -> ProjectCreate:
-        """解析 AI 响应"""
-        try:
-            import re
-            json_match = re.search(r'\{[\s\S]*\}', response)
-            if json_match:
-                data = json.loads(json_match.group())
-                
-                return ProjectCreate(
-                    name=original.name,
-                    full_name=original.full_name,
-                    url=original.url,
-                    fork_url=original.fork_url,
-                    issues_url=original.issues_url,
-                    description=data.get("enhanced_description", original.description),
-                    language=original.language,
-                    stars=original.stars,
-                    forks=original.forks,
-                    issues=original.issues,
-                    category=data.get("category", original.category),
-                    trend=original.trend,
-                    usage_steps=data.get("usage_steps", original.usage_steps)
-                )
-        except Exception as e:
-            logger.error(f"解析 AI 响应失败: {e}")
-        
-        return original
+    async def _stream_completion(self, prompt: str, max_tokens: Optional[int] = None) -> AsyncIterator[str]:
+        """以 stream: true 调用本 provider 的 AI API，逐段产出内容（请求失败时抛出异常）"""
+        client = get_http_client("ai")
+        url, headers, data = self._request(prompt, max_tokens)
+        data["stream"] = True
+        async with client.stream("POST", url, headers=headers, json=data) as response:
+            if response.status_code != 200:
+                body = (await response.aread()).decode("utf-8", "replace")
+                raise RuntimeError(f"AI API 错误: {response.status_code} - {body[:200]}")
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                payload = line[5:].strip()
+                if payload == "[DONE]":
+                    break
+                choices = json.loads(payload).get("choices") or []
+                delta = (choices[0].get("delta") or {}).get("content") if choices else None
+                if delta:
+                    yield delta
+
+    def _request(self, prompt: str, max_tokens: Optional[int]) -> Tuple[str, dict, dict]:
+        """构建 /chat/completions 请求 (url, headers, body)"""
+        headers = {
+            "Content-Type": "application/json; charset=utf-8",
+            "Authorization": f"Bearer {self.api_key}"
+        }
+
+        # 使用纯 ASCII 或确保 UTF-8
+        data = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": "You are a helpful assistant. Reply in Chinese."},
+                {"role": "user", "content": prompt}
+            ],
+            "temperature": 0.7,
+            "max_tokens": max_tokens or self.MAX_TOKENS
+        }
+        return f"{self.endpoint}/chat/completions", headers, data
+
+    def _extract_json(self, response: str) -> Optional[dict]:
+        """从 AI 响应中提取增强字段（第一个通过校验的 JSON 对象），没有时返回 None"""
+        for item in JSONStreamExtractor().feed(response):
+            data = self._validate(item) if isinstance(item, dict) else None
+            if data is not None:
+                return data
+        logger.error("解析 AI 响应失败: 未找到有效的增强字段")
+        return None
+
+    @staticmethod
+    def _apply(data: dict, original: ProjectCreate) -> ProjectCreate:
+        """把增强字段写入项目（缺失的字段保留原值）"""
+        return original.model_copy(update={
+            "description": data.get("enhanced_description") or original.description,
+            "category": data.get("category") or original.category,
+            "usage_steps": data.get("usage_steps") or original.usage_steps,
+            "ai_enhanced": True
+        })
+
+
+def load_fallback_services(primary_provider: str) -> List[AIService]:
+    """按 ai.pool 配置顺序创建备用 provider（跳过与主 provider 相同或没有 API Key 的条目）"""
+    entries = (load_app_config().get("ai", {}) or {}).get("pool", []) or []
+    services = []
+    for entry in entries:
+        provider = entry.get("provider", "")
+        api_key = entry.get("apiKey") or entry.get("api_key", "")
+        if not provider or provider == primary_provider or not api_key:
+            continue
+        services.append(AIService(
+            provider=provider, model=entry.get("model", ""), api_key=api_key, endpoint=entry.get("endpoint", "")
+        ))
+    return services
@@ -0,0 +1,177 @@
+"""
+AI 增强结果缓存
+
+按 (full_name, 内容哈希, provider, model, prompt 版本) 持久化缓存解析后的增强结果
+（enhanced_description、usage_steps、category）：
+- 同一项目内容（描述、语言、topics）未变化且使用同一模型和 prompt 时直接复用，不再调用模型
+- 更换 provider / model 或修改 prompt（提升 PROMPT_VERSION）后自然失效
+- 按条目数做 LRU 淘汰
+- put() / purge() 只修改内存并标记为脏，由 flush_later() 交给共享写线程整体写回
+  （每次刷新结束时一次，连续的写回请求合并执行），不在事件循环中同步写文件
+
+配置（config.json 中的 "aiCache"，均可选）:
+    {
+      "aiCache": {
+        "path": "./data/ai_cache.json",
+        "maxEntries": 2000
+      }
+    }
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import List, Optional
+
+from services.config_loader import load_app_config
+from services.writer import atomic_write_json, get_writer
+
+logger = logging.getLogger(__name__)
+
+
+def content_hash(description: Optional[str], language: Optional[str], topics: List[str]) -> str:
+    """项目内容（描述、语言、topics）的哈希"""
+    payload = json.dumps(
+        [description or "", language or "", sorted(t.casefold() for t in topics or [])],
+        ensure_ascii=False, separators=(",", ":")
+    )
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def cache_key(full_name: str, digest: str, provider: str, model: str, prompt_version: int) -> str:
+    payload = json.dumps([full_name.casefold(), digest, provider, model, prompt_version], separators=(",", ":"))
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class AICache:
+    """AI 增强结果缓存（全部常驻内存，flush() 时整体写回 JSON 文件）"""
+
+    FIELDS = ("enhanced_description", "usage_steps", "category")
+
+    def __init__(self, path: str = "./data/ai_cache.json", max_entries: int = 2000):
+        self.path = path
+        self.max_entries = max(1, int(max_entries))
+        self._lock = threading.RLock()
+        # key -> 条目，按最近访问排序（最旧在前）
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "flushes": 0}
+        self._dirty = False
+        self._load()
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                entries = json.load(f).get("entries", [])
+        except Exception as e:
+            logger.warning(f"AI 缓存文件损坏，已忽略: {e}")
+            return
+        for entry in sorted(entries, key=lambda e: e.get("accessed_at", 0)):
+            if entry.get("key"):
+                self._entries[entry["key"]] = entry
+        self._evict()
+
+    def flush(self) -> bool:
+        """有未写回的修改时整体写回文件，返回是否写入（在写线程中执行）"""
+        with self._lock:
+            if not self._dirty:
+                return False
+            entries = [dict(entry) for entry in self._entries.values()]
+            self._dirty = False
+        try:
+            atomic_write_json(self.path, {"entries": entries}, indent=None)
+        except BaseException:
+            with self._lock:
+                self._dirty = True
+            raise
+        with self._lock:
+            self._stats["flushes"] += 1
+        return True
+
+    def flush_later(self) -> Future:
+        """交给共享写线程写回（与队列中尚未执行的写回合并），async 调用方用 asyncio.wrap_future 等待"""
+        return get_writer().submit(self.flush, key=("ai_cache", self.path))
+
+    def _evict(self) -> None:
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def get(self, *keys: str) -> Optional[dict]:
+        """返回第一个命中的键缓存的增强结果（FIELDS），全部未命中返回 None（计一次查询）"""
+        with self._lock:
+            key = next((k for k in keys if k in self._entries), None)
+            if key is None:
+                self._stats["misses"] += 1
+                return None
+            entry = self._entries[key]
+            self._stats["hits"] += 1
+            entry["accessed_at"] = time.time()
+            self._entries.move_to_end(key)
+            return {field: entry.get(field) for field in self.FIELDS}
+
+    def put(self, key: str, full_name: str, provider: str, model: str, result: dict) -> None:
+        """写入增强结果"""
+        now = time.time()
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = {
+                "key": key,
+                "full_name": full_name,
+                "provider": provider,
+                "model": model,
+                **{field: result.get(field) for field in self.FIELDS},
+                "created_at": now,
+                "accessed_at": now,
+            }
+            self._stats["stores"] += 1
+            self._evict()
+            self._dirty = True
+
+    def purge(self, full_name: Optional[str] = None) -> int:
+        """清除指定项目（为空时清除全部）的缓存，返回清除条目数"""
+        with self._lock:
+            keys = [
+                key for key, entry in self._entries.items()
+                if full_name is None or entry.get("full_name", "").casefold() == full_name.casefold()
+            ]
+            for key in keys:
+                del self._entries[key]
+            if keys:
+                self._dirty = True
+            return len(keys)
+
+    def get_stats(self) -> dict:
+        """缓存统计"""
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "entries": len(self._entries),
+                "dirty": self._dirty,
+                "max_entries": self.max_entries,
+                "hit_rate": round(self._stats["hits"] / lookups, 3) if lookups else 0.0,
+            }
+
+
+_ai_cache: Optional[AICache] = None
+_ai_cache_lock = threading.Lock()
+
+
+def get_ai_cache() -> AICache:
+    """获取进程内共享的 AI 增强结果缓存"""
+    global _ai_cache
+    with _ai_cache_lock:
+        if _ai_cache is None:
+            config = load_app_config().get("aiCache", {}) or {}
+            _ai_cache = AICache(
+                path=config.get("path", "./data/ai_cache.json"),
+                max_entries=config.get("maxEntries", 2000),
+            )
+        return _ai_cache
@@ -0,0 +1,132 @@
+"""
+AI 请求并发与速率限制
+
+AI 增强按项目并发执行，受两层限制：
+- 每次刷新的并发数（ai.concurrency）
+- 每个 provider 在进程内共享的并发数和每分钟请求数（ai.providers.<provider>），
+  多个刷新同时使用同一 provider 时合计不超过限制
+每个项目有单独的超时（ai.projectTimeoutSeconds，批量请求按项目数放大），整个增强阶段有
+总期限（ai.deadlineSeconds），到期时未完成的项目保留未增强的数据。
+
+ai.batchSize > 1 时多个项目合并为一个请求，每批 prompt 不超过 ai.batchTokenBudget（估算）
+个 token，响应中解析失败的项目最多重试 ai.batchRetries 轮。
+ai.stream 为 true 时以流式请求模型，每个项目的增强结果解析完成即可使用（超时时保留已完成的项目）。
+
+配置（config.json 中的 "ai"，均可选）:
+    {
+      "ai": {
+        "concurrency": 4,
+        "projectTimeoutSeconds": 45,
+        "deadlineSeconds": 240,
+        "batchSize": 1,
+        "batchTokenBudget": 3000,
+        "batchRetries": 1,
+        "stream": false,
+        "providers": {
+          "qwen": {"concurrency": 4, "requestsPerMinute": 60}
+        }
+      }
+    }
+"""
+
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+
+from services.config_loader import load_app_config
+from services.rate_limit import TokenBucket
+
+AI_LIMIT_DEFAULTS = {
+    "concurrency": 4,
+    "projectTimeoutSeconds": 45,
+    "deadlineSeconds": 240,
+    "batchSize": 1,
+    "batchTokenBudget": 3000,
+    "batchRetries": 1,
+    "stream": False,
+}
+
+PROVIDER_LIMIT_DEFAULTS = {
+    "concurrency": 4,
+    "requestsPerMinute": 60,
+}
+
+
+def load_ai_settings() -> dict:
+    """读取 AI 增强的并发与期限配置"""
+    ai = load_app_config().get("ai", {}) or {}
+    settings = {key: ai.get(key, default) for key, default in AI_LIMIT_DEFAULTS.items()}
+    settings["concurrency"] = max(1, int(settings["concurrency"]))
+    settings["batchSize"] = max(1, int(settings["batchSize"]))
+    return settings
+
+
+class ProviderLimiter:
+    """单个 provider 的并发与每分钟请求数限制"""
+
+    def __init__(self, provider: str, concurrency: int = 4, requests_per_minute: float = 60):
+        self.provider = provider
+        self.concurrency = max(1, int(concurrency))
+        self.requests_per_minute = requests_per_minute
+        self._bucket = TokenBucket(requests_per_minute / 60, max(1, min(self.concurrency, requests_per_minute)))
+        # 信号量绑定事件循环，循环变化时（如测试中多次创建客户端）重新创建
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop = None
+        self._stats = {"requests": 0, "in_flight": 0, "waits": 0, "wait_time_s": 0.0}
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._loop = loop
+        return self._semaphore
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """占用一个并发名额并按速率限制等待"""
+        started = time.monotonic()
+        async with self._get_semaphore():
+            await self._bucket.acquire()
+            waited = time.monotonic() - started
+            if waited > 0.001:
+                self._stats["waits"] += 1
+                self._stats["wait_time_s"] += waited
+            self._stats["requests"] += 1
+            self._stats["in_flight"] += 1
+            try:
+                yield
+            finally:
+                self._stats["in_flight"] -= 1
+
+    def get_stats(self) -> dict:
+        return {
+            **self._stats,
+            "wait_time_s": round(self._stats["wait_time_s"], 2),
+            "concurrency": self.concurrency,
+            "requests_per_minute": self.requests_per_minute,
+        }
+
+
+_limiters: Dict[str, ProviderLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_provider_limiter(provider: str) -> ProviderLimiter:
+    """获取 provider 在进程内共享的限制器"""
+    with _limiters_lock:
+        limiter = _limiters.get(provider)
+        if limiter is None:
+            providers = (load_app_config().get("ai", {}) or {}).get("providers", {}) or {}
+            settings = {**PROVIDER_LIMIT_DEFAULTS, **(providers.get(provider, {}) or {})}
+            limiter = _limiters[provider] = ProviderLimiter(
+                provider, settings["concurrency"], settings["requestsPerMinute"]
+            )
+        return limiter
+
+
+def get_ai_limit_stats() -> dict:
+    """各 provider 的请求、排队统计"""
+    with _limiters_lock:
+        return {provider: limiter.get_stats() for provider, limiter in _limiters.items()}
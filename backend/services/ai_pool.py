@@ -0,0 +1,327 @@
+"""
+AI provider 池（对冲请求 + 熔断）
+
+按配置顺序排列多个 provider，每次模型调用：
+- 先请求第一个可用的 provider；超过对冲延迟（该 provider 近期成功请求耗时的 p95，
+  限制在 [minDelaySeconds, maxDelaySeconds] 内）仍未返回时，向下一个 provider 发出相同请求，
+  第一个有效的响应胜出，其余请求取消
+- 请求失败或响应无效时立即切换到下一个 provider
+- 每个 provider 有熔断器：最近 window 次请求中错误率或慢请求率超过阈值时熔断（open），
+  错误只包括请求失败（错误状态码、超时、连接错误），模型返回的内容无法解析不计入，
+  openSeconds 后进入半开（half_open）只放行一个探测请求，成功则恢复，失败则继续熔断
+- 每个请求（含对冲和切换）占用所发往 provider 的并发 / 每分钟请求数名额（见 services/ai_limits）
+- 每个 provider 记录请求耗时直方图，见 /metrics 的 ai_providers
+
+配置（config.json 中的 "ai"，均可选）:
+    {
+      "ai": {
+        "pool": [
+          {"provider": "siliconflow", "apiKey": "sk-xxx", "model": "", "endpoint": ""}
+        ],
+        "hedge": {
+          "enabled": true,
+          "quantile": 0.95,
+          "minDelaySeconds": 1,
+          "maxDelaySeconds": 20,
+          "defaultDelaySeconds": 8,    # 样本不足 minSamples 时使用
+          "minSamples": 5
+        },
+        "breaker": {
+          "window": 20,
+          "minCalls": 5,
+          "errorRate": 0.5,
+          "slowCallSeconds": 30,
+          "slowCallRate": 0.5,
+          "openSeconds": 30
+        }
+      }
+    }
+"""
+
+import asyncio
+import bisect
+import logging
+import math
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from services.config_loader import load_app_config
+
+logger = logging.getLogger(__name__)
+
+HEDGE_DEFAULTS = {
+    "enabled": True,
+    "quantile": 0.95,
+    "minDelaySeconds": 1.0,
+    "maxDelaySeconds": 20.0,
+    "defaultDelaySeconds": 8.0,
+    "minSamples": 5,
+}
+
+BREAKER_DEFAULTS = {
+    "window": 20,
+    "minCalls": 5,
+    "errorRate": 0.5,
+    "slowCallSeconds": 30.0,
+    "slowCallRate": 0.5,
+    "openSeconds": 30.0,
+}
+
+# 直方图桶上界（毫秒），最后一个桶为 +Inf
+LATENCY_BUCKETS_MS = (100, 250, 500, 1000, 2500, 5000, 10000, 20000, 30000, 60000)
+
+# 用于计算分位数的近期成功请求数
+RECENT_SAMPLES = 200
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class LatencyHistogram:
+    """请求耗时直方图（固定桶）+ 近期成功请求耗时（计算分位数）"""
+
+    def __init__(self, buckets_ms=LATENCY_BUCKETS_MS):
+        self.buckets_ms = tuple(buckets_ms)
+        self.counts = [0] * (len(self.buckets_ms) + 1)
+        self.total = 0
+        self.sum_ms = 0.0
+        self._recent = deque(maxlen=RECENT_SAMPLES)
+
+    def observe(self, seconds: float, ok: bool = True) -> None:
+        ms = seconds * 1000
+        self.counts[bisect.bisect_left(self.buckets_ms, ms)] += 1
+        self.total += 1
+        self.sum_ms += ms
+        if ok:
+            self._recent.append(seconds)
+
+    @property
+    def samples(self) -> int:
+        return len(self._recent)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """近期成功请求耗时的分位数（秒），没有样本时为 None"""
+        if not self._recent:
+            return None
+        ordered = sorted(self._recent)
+        return ordered[max(0, math.ceil(len(ordered) * q) - 1)]
+
+    def to_dict(self) -> dict:
+        labels = [f"le_{b}ms" for b in self.buckets_ms] + ["le_inf"]
+        p50, p95 = self.quantile(0.5), self.quantile(0.95)
+        return {
+            "count": self.total,
+            "mean_ms": round(self.sum_ms / self.total, 1) if self.total else None,
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+
+class CircuitBreaker:
+    """按最近请求的错误率 / 慢请求率熔断，定时半开探测"""
+
+    def __init__(self, settings: Optional[dict] = None):
+        self.settings = {**BREAKER_DEFAULTS, **(settings or {})}
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.trips = 0
+        self._outcomes = deque(maxlen=int(self.settings["window"]))
+        self._probing = False
+
+    def allow(self) -> bool:
+        """是否放行一个请求（半开时只放行一个探测请求）"""
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at < self.settings["openSeconds"]:
+                return False
+            self.state = HALF_OPEN
+            self._probing = False
+        if self.state == HALF_OPEN:
+            if self._probing:
+                return False
+            self._probing = True
+        return True
+
+    def release(self) -> None:
+        """放行的请求被取消（没有结果），归还半开探测名额"""
+        if self.state == HALF_OPEN:
+            self._probing = False
+
+    def record(self, ok: bool, seconds: float) -> None:
+        slow = seconds >= self.settings["slowCallSeconds"]
+        if self.state == HALF_OPEN:
+            if ok and not slow:
+                self.state = CLOSED
+                self._outcomes.clear()
+            else:
+                self._trip()
+            return
+        self._outcomes.append((ok, slow))
+        calls = len(self._outcomes)
+        if calls < self.settings["minCalls"]:
+            return
+        errors = sum(1 for o, _ in self._outcomes if not o)
+        slow_calls = sum(1 for _, s in self._outcomes if s)
+        if errors / calls >= self.settings["errorRate"] or slow_calls / calls >= self.settings["slowCallRate"]:
+            self._trip()
+
+    def _trip(self) -> None:
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.trips += 1
+        self._probing = False
+        self._outcomes.clear()
+
+    def to_dict(self) -> dict:
+        return {"state": self.state, "trips": self.trips}
+
+
+class ProviderHealth:
+    """单个 provider 的耗时直方图、熔断器和请求统计（进程内共享）"""
+
+    def __init__(self, name: str, breaker_settings: Optional[dict] = None):
+        self.name = name
+        self.histogram = LatencyHistogram()
+        self.breaker = CircuitBreaker(breaker_settings)
+        self.stats = {"requests": 0, "errors": 0, "invalid": 0, "cancelled": 0, "wins": 0, "hedges": 0,
+                      "rejected": 0}
+
+    def record(self, ok: bool, seconds: float) -> None:
+        """记录一次完成的请求（被取消的请求调用 breaker.release()）"""
+        self.histogram.observe(seconds, ok)
+        self.breaker.record(ok, seconds)
+        if not ok:
+            self.stats["errors"] += 1
+
+    def to_dict(self) -> dict:
+        return {**self.stats, **self.breaker.to_dict(), "latency": self.histogram.to_dict()}
+
+
+_health: Dict[str, ProviderHealth] = {}
+_health_lock = threading.Lock()
+
+
+def get_provider_health(name: str) -> ProviderHealth:
+    """获取 provider 在进程内共享的健康状态"""
+    with _health_lock:
+        health = _health.get(name)
+        if health is None:
+            breaker = (load_app_config().get("ai", {}) or {}).get("breaker", {}) or {}
+            health = _health[name] = ProviderHealth(name, breaker)
+        return health
+
+
+def get_ai_provider_stats() -> dict:
+    """各 provider 的熔断状态、请求统计和耗时直方图"""
+    with _health_lock:
+        return {name: health.to_dict() for name, health in _health.items()}
+
+
+def load_hedge_settings() -> dict:
+    hedge = (load_app_config().get("ai", {}) or {}).get("hedge", {}) or {}
+    return {**HEDGE_DEFAULTS, **hedge}
+
+
+class ProviderPool:
+    """按顺序排列的 provider，带对冲请求和熔断
+
+    members 需提供 name、limiter（ProviderLimiter）属性和
+    async _post_completion(prompt, max_tokens) -> Optional[str]（请求失败时返回 None）。
+    """
+
+    def __init__(self, members: List, hedge_settings: Optional[dict] = None):
+        self.members = list(members)
+        self.hedge = {**HEDGE_DEFAULTS, **(hedge_settings or {})}
+
+    def hedge_delay(self, health: ProviderHealth) -> float:
+        """对冲延迟：近期成功请求耗时的分位数，样本不足时使用默认值"""
+        if health.histogram.samples < self.hedge["minSamples"]:
+            delay = self.hedge["defaultDelaySeconds"]
+        else:
+            delay = health.histogram.quantile(self.hedge["quantile"])
+        return min(max(delay, self.hedge["minDelaySeconds"]), self.hedge["maxDelaySeconds"])
+
+    async def _attempt(self, member, health: ProviderHealth, prompt: str, max_tokens: Optional[int],
+                       parse: Optional[Callable[[str], Any]]) -> Optional[Any]:
+        started = None
+        try:
+            async with member.limiter.slot():
+                health.stats["requests"] += 1
+                started = time.monotonic()
+                response = await member._post_completion(prompt, max_tokens)
+        except asyncio.CancelledError:
+            health.stats["cancelled"] += 1
+            health.breaker.release()
+            raise
+        except Exception as e:
+            logger.error(f"AI 调用异常 ({health.name}): {e}")
+            response = None
+        # 只有请求失败计入熔断器；响应无效（解析结果为 None）只切换到下一个 provider
+        health.record(response is not None, time.monotonic() - started if started is not None else 0.0)
+        if response is None:
+            return None
+        result = parse(response) if parse is not None else response
+        if result is None:
+            health.stats["invalid"] += 1
+        return result
+
+    async def call(self, prompt: str, max_tokens: Optional[int] = None,
+                   parse: Optional[Callable[[str], Any]] = None) -> Optional[Tuple[Any, Any]]:
+        """发送请求，返回 (响应的 member, 第一个有效响应的解析结果)；所有 provider 都失败或熔断时返回 None
+
+        parse 把响应文本解析为结果，无效时返回 None（每个响应只解析一次）；为 None 时返回响应文本。
+        """
+        remaining = iter(self.members)
+        pending: Dict[asyncio.Task, Tuple[Any, ProviderHealth]] = {}
+        loop = asyncio.get_running_loop()
+
+        def launch(hedged: bool) -> Optional[ProviderHealth]:
+            for member in remaining:
+                health = get_provider_health(member.name)
+                if not health.breaker.allow():
+                    health.stats["rejected"] += 1
+                    continue
+                if hedged:
+                    health.stats["hedges"] += 1
+                    logger.info(f"AI 请求对冲到 {health.name}")
+                task = asyncio.create_task(self._attempt(member, health, prompt, max_tokens, parse))
+                pending[task] = (member, health)
+                return health
+            return None
+
+        def next_hedge(health: Optional[ProviderHealth]) -> Optional[float]:
+            if health is None or not self.hedge["enabled"]:
+                return None
+            return loop.time() + self.hedge_delay(health)
+
+        first = launch(hedged=False)
+        if first is None:
+            logger.warning("所有 AI provider 均已熔断")
+            return None
+        hedge_at = next_hedge(first)
+
+        try:
+            while pending:
+                timeout = None if hedge_at is None else max(0.0, hedge_at - loop.time())
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # 对冲延迟已到，向下一个 provider 发出相同请求
+                    hedge_at = next_hedge(launch(hedged=True))
+                    continue
+                for task in done:
+                    member, health = pending.pop(task)
+                    response = task.result()
+                    if response is not None:
+                        health.stats["wins"] += 1
+                        return member, response
+                    # 失败立即切换到下一个 provider
+                    launched = launch(hedged=False)
+                    if launched is not None:
+                        hedge_at = next_hedge(launched)
+            return None
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
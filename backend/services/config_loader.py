@@ -0,0 +1,30 @@
+"""
+配置文件加载
+"""
+
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# 项目根目录
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def load_app_config() -> dict:
+    """加载应用配置
+
+    优先读取 config.local.json（不提交到 git），不存在时回退到 config.json。
+    """
+    try:
+        config_file = os.path.join(PROJECT_ROOT, "config.local.json")
+        if not os.path.exists(config_file):
+            config_file = os.path.join(PROJECT_ROOT, "config.json")
+
+        if os.path.exists(config_file):
+            with open(config_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+    except Exception as e:
+        logger.error(f"加载配置失败: {e}")
+    return {}
@@ -0,0 +1,175 @@
+"""
+热门项目抓取计划
+
+根据配置生成一组 GitHub 搜索查询（全局热门 + 时间窗口 + 各语言），由
+GitHubService 并发执行并逐页合并去重，得到更大、更新的候选池。
+
+各查询都按 star 数降序返回。最终的 maxResults 个名额按查询优先级轮流分配：每个查询依次取出
+自己结果中排名最高、尚未入选的项目，因此时间窗口和各语言查询中新近的项目不会被全局热门查询
+的老牌高 star 项目挤掉。入选项目一定在其所属查询的前 maxResults 条内，每个查询只翻到
+maxResults 所需的页数。
+
+未配置 token 时搜索额度只有每分钟 10 次，按优先级只保留 anonymousRequests 个请求以内的查询，
+避免一次刷新等待额度重置。
+
+配置（config.json，均可选）:
+    {
+      "settings": {
+        "languages": ["Python", "Go"],    # 每种语言单独生成时间窗口查询
+        "numberOfProjects": 10            # fetch.maxResults 的默认值
+      },
+      "fetch": {
+        "days": 7,                         # 时间窗口天数（created:> / pushed:>）
+        "windows": ["created", "pushed"],  # 使用的时间窗口限定符
+        "minStars": 1000,                  # 全局热门查询的最低 star 数
+        "windowMinStars": 100,             # 时间窗口查询的最低 star 数
+        "perPage": 50,                     # 每页结果数（最大 100）
+        "maxPages": 2,                     # 每个查询最多翻页数
+        "concurrency": 4,                  # 同时进行的搜索请求数
+        "maxResults": 30,                  # 最终返回的项目数（默认 settings.numberOfProjects，未配置时 30）
+        "anonymousRequests": 10            # 未配置 token 时每次刷新最多发出的搜索请求数
+      }
+    }
+"""
+
+import math
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from services.config_loader import load_app_config
+
+FETCH_DEFAULTS = {
+    "days": 7,
+    "windows": ["created", "pushed"],
+    "minStars": 1000,
+    "windowMinStars": 100,
+    "perPage": 50,
+    "maxPages": 2,
+    "concurrency": 4,
+    "maxResults": 30,
+    "anonymousRequests": 10,
+}
+
+# 搜索 API 最多返回前 1000 条结果
+SEARCH_RESULT_LIMIT = 1000
+WINDOW_QUALIFIERS = ("created", "pushed")
+
+
+def load_fetch_settings() -> dict:
+    """读取抓取配置（缺省项使用 FETCH_DEFAULTS）"""
+    config = load_app_config()
+    app_settings = config.get("settings", {}) or {}
+    fetch = config.get("fetch", {}) or {}
+    settings = {**FETCH_DEFAULTS, **fetch}
+    if "maxResults" not in fetch and app_settings.get("numberOfProjects"):
+        settings["maxResults"] = app_settings["numberOfProjects"]
+    settings["languages"] = list(app_settings.get("languages", []) or [])
+    settings["perPage"] = max(1, min(int(settings["perPage"]), 100))
+    settings["maxPages"] = max(1, min(int(settings["maxPages"]), SEARCH_RESULT_LIMIT // settings["perPage"]))
+    settings["maxResults"] = max(1, int(settings["maxResults"]))
+    settings["anonymousRequests"] = max(1, int(settings["anonymousRequests"]))
+    settings["concurrency"] = max(1, int(settings["concurrency"]))
+    settings["windows"] = [w for w in settings["windows"] if w in WINDOW_QUALIFIERS]
+    return settings
+
+
+def pages_needed(settings: dict) -> int:
+    """每个查询需要翻的页数：取得前 maxResults 条即可，不超过 maxPages"""
+    return max(1, min(settings["maxPages"], math.ceil(settings["maxResults"] / settings["perPage"])))
+
+
+def plan_queries(settings: dict, days: int, now: Optional[datetime] = None,
+                 max_requests: Optional[int] = None) -> List[dict]:
+    """生成搜索查询，按优先级排列（全局热门在前）
+
+    max_requests 不为空时，按每个查询翻 maxPages 页计算，只保留请求数不超过它的前几个查询（至少一个）。
+    """
+    since = ((now or datetime.now()) - timedelta(days=days)).strftime("%Y-%m-%d")
+    window_terms = [
+        (qualifier, f"{qualifier}:>{since} stars:>{settings['windowMinStars']}")
+        for qualifier in settings["windows"]
+    ]
+
+    queries = [{"label": "top", "q": f"stars:>{settings['minStars']}"}]
+    for qualifier, terms in window_terms:
+        queries.append({"label": qualifier, "q": terms})
+    for language in settings["languages"]:
+        for qualifier, terms in window_terms:
+            queries.append({"label": f"{language}/{qualifier}", "q": f'language:"{language}" {terms}'})
+    if max_requests is not None:
+        queries = queries[:max(1, max_requests // settings["maxPages"])]
+    return queries
+
+
+class CandidatePool:
+    """候选项目池：按 full_name 去重，逐页合并搜索结果
+
+    同一项目出现在多个查询中时保留 star 数最新（最大）的数据，
+    并按查询记录命中的项目，用于按查询分配名额和排查候选来源。
+    """
+
+    def __init__(self):
+        self._repos: Dict[str, dict] = {}
+        self._sources: Dict[str, List[str]] = {}
+        self._hits: Dict[str, List[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._repos)
+
+    def add(self, items: Iterable[dict], source: str) -> int:
+        """合并一页结果，返回新增项目数"""
+        added = 0
+        hits = self._hits.setdefault(source, [])
+        for repo in items:
+            full_name = repo.get("full_name")
+            if not full_name:
+                continue
+            key = full_name.casefold()
+            current = self._repos.get(key)
+            if current is None:
+                added += 1
+                self._sources[key] = [source]
+            else:
+                self._sources[key].append(source)
+            hits.append(key)
+            if current is None or repo.get("stargazers_count", 0) >= current.get("stargazers_count", 0):
+                self._repos[key] = repo
+        return added
+
+    def sources(self, full_name: str) -> List[str]:
+        return list(self._sources.get(full_name.casefold(), []))
+
+    @staticmethod
+    def _stars_of(repo: dict) -> int:
+        return repo.get("stargazers_count", 0)
+
+    def _stars(self, key: str) -> int:
+        return self._stars_of(self._repos[key])
+
+    def ranked(self, limit: Optional[int] = None, order: Optional[List[str]] = None) -> List[dict]:
+        """选出最多 limit 个项目，按 star 数降序返回原始仓库数据
+
+        limit 不为空时按查询轮流分配名额：order（查询标签，按优先级排列，默认按首次合并的顺序）
+        中的每个查询依次取出自己命中的项目中 star 数最高且尚未入选的一个，直到名额用完。
+        """
+        if limit is None or limit >= len(self._repos):
+            selected = list(self._repos)
+        else:
+            labels = [label for label in (order or []) if label in self._hits]
+            labels += [label for label in self._hits if label not in labels]
+            queues = [
+                iter(sorted(dict.fromkeys(self._hits[label]), key=self._stars, reverse=True))
+                for label in labels
+            ]
+            chosen: Dict[str, None] = {}
+            while queues and len(chosen) < limit:
+                for queue in list(queues):
+                    key = next((k for k in queue if k not in chosen), None)
+                    if key is None:
+                        queues.remove(queue)
+                        continue
+                    chosen[key] = None
+                    if len(chosen) >= limit:
+                        break
+            selected = list(chosen)
+        return sorted((self._repos[key] for key in selected), key=self._stars_of, reverse=True)
@@ -3,18 +3,53 @@ GitHub 数据获取服务
 """
 
 import logging
-import os
 import httpx
 import json
 import asyncio
+import hashlib
 import unicodedata
 from datetime import datetime, timedelta
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 from models.schemas import ProjectCreate
+from services.config_loader import load_app_config
+from services.fetch_planner import CandidatePool, load_fetch_settings, pages_needed, plan_queries
+from services.rate_limit import GitHubScheduler, RateLimitExceeded, get_github_scheduler
+from services.readme_cache import get_readme_cache
+from services.singleflight import get_singleflight
 
 logger = logging.getLogger(__name__)
 
 
+# GraphQL 批量查询的仓库字段（映射为 REST 格式后交给 _parse_repository）
+GRAPHQL_REPOSITORY_FIELDS = """
+    nameWithOwner
+    name
+    url
+    description
+    stargazerCount
+    forkCount
+    createdAt
+    pushedAt
+    primaryLanguage { name }
+    defaultBranchRef { name }
+    repositoryTopics(first: 20) { nodes { topic { name } } }
+    issues(states: OPEN) { totalCount }
+    pullRequests(states: OPEN) { totalCount }
+"""
+GRAPHQL_README_FIELD = 'readme: object(expression: "HEAD:README.md") { ... on Blob { text } }'
+
+
+def repository_fingerprint(repo: dict) -> str:
+    """仓库内容指纹：描述、topics、语言、pushed_at 不变时派生字段无需重新计算"""
+    content = [
+        repo.get("description") or "",
+        sorted(repo.get("topics") or []),
+        repo.get("language") or "",
+        repo.get("pushed_at") or "",
+    ]
+    return hashlib.sha1(json.dumps(content, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
 def safe_str(s: str) -> str:
     """安全字符串处理"""
     if s is None:
@@ -27,93 +62,279 @@ class GitHubService:
     """GitHub Trending 数据获取服务"""
 
     BASE_URL = "https://api.github.com"
+    GRAPHQL_URL = "https://api.github.com/graphql"
+    # 每个 GraphQL 查询包含的仓库数
+    GRAPHQL_BATCH_SIZE = 100
+    # /readme 找不到时尝试的文件名
+    README_FILENAMES = ("README.md", "readme.md", "README.rst", "README.txt", "README", "readme")
     HEADERS = {
         "Accept": "application/vnd.github.v3+json",
         "User-Agent": "GitHub-Trending-Dashboard/1.0"
     }
 
     def __init__(self, token: Optional[str] = None):
+        self.readme_cache = get_readme_cache()
+        # 认证、限速和重试由调度器统一处理；指定 token 时使用独立的调度器
         if token is None:
-            token = self._load_token_from_config()
-        
-        self.token = token
-        if token:
-            self.headers = {**self.HEADERS, "Authorization": f"token {token}"}
-            logger.info("使用 GitHub Token 认证")
+            self.scheduler = get_github_scheduler()
         else:
-            self.headers = self.HEADERS
-            logger.warning("未配置 GitHub Token，使用公共请求限制")
+            self.scheduler = GitHubScheduler([token], get_github_scheduler().settings)
+        self.headers = self.HEADERS
 
-    def _load_token_from_config(self) -> Optional[str]:
-        try:
-            # 优先从 config.local.json 加载（不提交到 git）
-            local_config = os.path.join(
-                os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 
-                "config.local.json"
-            )
-            
-            config_file = local_config
-            if not os.path.exists(config_file):
-                # 回退到 config.json
-                config_file = os.path.join(
-                    os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 
-                    "config.json"
-                )
-            
-            if os.path.exists(config_file):
-                with open(config_file, 'r', encoding='utf-8') as f:
-                    config = json.load(f)
-                    return config.get("github", {}).get("token")
-        except Exception as e:
-            logger.error(f"加载 GitHub Token 失败: {e}")
-        return None
+        github_config = load_app_config().get("github", {}) or {}
+        # GraphQL 需要认证，未配置 token 时始终使用 REST
+        self.use_graphql = bool(github_config.get("graphql", False)) and self.scheduler.authenticated
+        self.graphql_url = github_config.get("graphqlUrl") or self.GRAPHQL_URL
+        self.graphql_batch_size = max(1, int(github_config.get("graphqlBatchSize", self.GRAPHQL_BATCH_SIZE)))
 
-    async def fetch_trending_projects(self, days: int = 7, per_page: int = 10) -> List[ProjectCreate]:
-        """获取热门项目"""
-        all_projects = []
-        
-        logger.info("获取 GitHub Trending 项目")
+        if self.scheduler.authenticated:
+            logger.info(f"使用 GitHub Token 认证（{len(self.scheduler.tokens)} 个）")
+        else:
+            logger.warning("未配置 GitHub Token，使用公共请求限制")
 
-        queries = [
-            "sort:stars stars:>1000",
-        ]
+    async def fetch_trending_projects(self, days: Optional[int] = None,
+                                      per_page: Optional[int] = None) -> List[ProjectCreate]:
+        """获取热门项目
 
-        async with httpx.AsyncClient(timeout=30.0, follow_redirects=True) as client:
-            for i, query in enumerate(queries):
+        按配置生成多个搜索查询（见 services/fetch_planner），在信号量限制下并发执行，
+        每个查询按页获取并即时合并去重；days / per_page 为空时使用配置。
+        """
+        projects = []
+        for repo in await self.fetch_trending_repositories(days, per_page):
+            project = self._parse_repository(repo)
+            if project:
+                projects.append(project)
+        return projects
+
+    async def fetch_trending_repositories(self, days: Optional[int] = None,
+                                          per_page: Optional[int] = None) -> List[dict]:
+        """获取热门仓库的原始数据（各查询轮流分配 fetch.maxResults 个名额，按 star 数降序）"""
+        settings = load_fetch_settings()
+        if days is not None:
+            settings["days"] = days
+        if per_page is not None:
+            settings["perPage"] = max(1, min(per_page, 100))
+        settings["maxPages"] = pages_needed(settings)
+        # 未认证时搜索额度很少，只执行优先级最高的几个查询
+        max_requests = None if self.scheduler.authenticated else settings["anonymousRequests"]
+        queries = plan_queries(settings, settings["days"], max_requests=max_requests)
+
+        logger.info(
+            f"获取 GitHub Trending 项目: {len(queries)} 个查询, "
+            f"每页 {settings['perPage']}, 最多 {settings['maxPages']} 页, 并发 {settings['concurrency']}"
+        )
+
+        pool = CandidatePool()
+        semaphore = asyncio.Semaphore(settings["concurrency"])
+        rate_limited = asyncio.Event()
+        await asyncio.gather(*(
+            self._run_search_query(query, settings, pool, semaphore, rate_limited)
+            for query in queries
+        ))
+
+        repos = pool.ranked(settings["maxResults"], [query["label"] for query in queries])
+        logger.info(f"候选池 {len(pool)} 个项目，返回 {len(repos)} 个")
+        return repos
+
+    async def _run_search_query(self, query: dict, settings: dict, pool: CandidatePool,
+                                semaphore: asyncio.Semaphore, rate_limited: asyncio.Event) -> None:
+        """执行单个搜索查询并逐页合并到候选池（额度耗尽后停止所有查询）"""
+        for page in range(1, settings["maxPages"] + 1):
+            async with semaphore:
+                if rate_limited.is_set():
+                    return
                 try:
-                    params = {"q": query, "per_page": 50, "sort": "stars"}
-                    response = await client.get(
-                        f"{self.BASE_URL}/search/repositories",
-                        params=params,
+                    response = await self.scheduler.request(
+                        "GET", f"{self.BASE_URL}/search/repositories",
+                        params={"q": query["q"], "sort": "stars", "order": "desc",
+                                "per_page": settings["perPage"], "page": page},
                         headers=self.headers
                     )
-
-                    if response.status_code == 200:
-                        data = response.json()
-                        items = data.get("items", [])[:30]
-                        for item in items:
-                            project = self._parse_repository(item)
-                            if project:
-                                all_projects.append(project)
-                        logger.info(f"查询成功，获取 {len(items)} 个项目")
-                    elif response.status_code == 403:
-                        logger.warning("GitHub API rate limit hit")
-                        break
-                    else:
-                        logger.warning(f"查询失败 ({query}): {response.status_code}")
-                    
-                    if i < len(queries) - 1:
-                        await asyncio.sleep(1.0)
-                        
+                except RateLimitExceeded as e:
+                    logger.warning(f"{e}，停止剩余查询，结果不完整")
+                    rate_limited.set()
+                    return
                 except Exception as e:
-                    logger.error(f"获取项目失败: {e}")
-                    continue
+                    logger.error(f"查询失败 ({query['label']} 第 {page} 页): {e}")
+                    return
+
+            if response.status_code in (403, 429):
+                logger.warning(f"GitHub API rate limit hit ({query['label']})，停止剩余查询，结果不完整")
+                rate_limited.set()
+                return
+            if response.status_code != 200:
+                logger.warning(f"查询失败 ({query['q']}): {response.status_code}")
+                return
+
+            items = response.json().get("items", [])
+            added = pool.add(items, query["label"])
+            logger.info(f"查询 {query['label']} 第 {page} 页: {len(items)} 个结果, 新增 {added} 个")
+            if len(items) < settings["perPage"]:
+                return
+
+    async def fetch_repositories(self, full_names: List[str],
+                                 include_readme: bool = False) -> Dict[str, dict]:
+        """批量获取仓库元数据
+
+        返回 {full_name: REST 格式的仓库字典}，获取失败或不存在的仓库不包含在内；
+        include_readme 为 True 时字典中带 "readme"（README 文本，没有时为 None）。
+        启用 GraphQL（github.graphql）时每个查询获取 graphqlBatchSize 个仓库，
+        否则每个仓库一次 REST 请求。
+        """
+        names = list(dict.fromkeys(n.strip("/") for n in full_names if n and "/" in n))
+        if not self.use_graphql:
+            return await self._fetch_repositories_rest(names, include_readme)
+
+        batches = [names[i:i + self.graphql_batch_size] for i in range(0, len(names), self.graphql_batch_size)]
+        results = await asyncio.gather(*(
+            self._fetch_repositories_graphql(batch, include_readme) for batch in batches
+        ))
+        repos = {}
+        for batch, result in zip(batches, results):
+            if result is None:
+                # GraphQL 请求失败时该批回退到 REST
+                result = await self._fetch_repositories_rest(batch, include_readme)
+            repos.update(result)
+        return repos
+
+    async def fetch_projects(self, full_names: List[str]) -> List[ProjectCreate]:
+        """批量获取项目（按输入顺序，跳过获取失败的仓库）"""
+        repos = await self.fetch_repositories(full_names)
+        projects = []
+        for full_name in full_names:
+            repo = repos.get(full_name.strip("/"))
+            project = self._parse_repository(repo) if repo else None
+            if project:
+                projects.append(project)
+        return projects
+
+    async def prefetch_readmes(self, full_names: List[str]) -> int:
+        """启用 GraphQL 时批量获取 README（HEAD:README.md）写入缓存，返回获取到的数量
+
+        每个查询获取 graphqlBatchSize 个仓库；未启用 GraphQL、请求失败或没有 README.md 的仓库
+        不写入缓存，由调用方再逐个 fetch_readme。
+        """
+        if not self.use_graphql:
+            return 0
+        names = list(dict.fromkeys(n.strip("/") for n in full_names if n and "/" in n))
+        batches = [names[i:i + self.graphql_batch_size] for i in range(0, len(names), self.graphql_batch_size)]
+        results = await asyncio.gather(*(
+            self._fetch_repositories_graphql(batch, include_readme=True) for batch in batches
+        ))
+        return sum(
+            1 for result in results if result
+            for repo in result.values() if repo.get("readme") is not None
+        )
+
+    async def _fetch_repositories_rest(self, full_names: List[str],
+                                       include_readme: bool) -> Dict[str, dict]:
+        """REST：每个仓库一次 /repos/{owner}/{repo} 请求（由调度器限速）"""
+
+        async def fetch_one(full_name: str) -> Optional[dict]:
+            try:
+                response = await self.scheduler.request(
+                    "GET", f"{self.BASE_URL}/repos/{full_name}", headers=self.headers
+                )
+            except Exception as e:
+                logger.warning(f"获取仓库失败 ({full_name}): {e}")
+                return None
+            if response.status_code != 200:
+                logger.warning(f"获取仓库失败 ({full_name}): {response.status_code}")
+                return None
+            repo = response.json()
+            if include_readme:
+                repo["readme"] = await self.fetch_readme(full_name)
+            return repo
+
+        results = await asyncio.gather(*(fetch_one(name) for name in full_names))
+        return {name: repo for name, repo in zip(full_names, results) if repo}
+
+    async def _fetch_repositories_graphql(self, full_names: List[str],
+                                          include_readme: bool) -> Optional[Dict[str, dict]]:
+        """GraphQL：一个查询中用别名获取多个仓库，请求失败时返回 None"""
+        fields = GRAPHQL_REPOSITORY_FIELDS + (GRAPHQL_README_FIELD if include_readme else "")
+        variables = {}
+        params = []
+        selections = []
+        for i, full_name in enumerate(full_names):
+            owner, name = full_name.split("/", 1)
+            variables[f"o{i}"], variables[f"n{i}"] = owner, name
+            params.append(f"$o{i}: String!, $n{i}: String!")
+            selections.append(f"r{i}: repository(owner: $o{i}, name: $n{i}) {{ {fields} }}")
+        query = f"query({', '.join(params)}) {{ {' '.join(selections)} }}"
 
-        unique_projects = self._deduplicate(all_projects)
-        sorted_projects = sorted(unique_projects, key=lambda x: x.stars, reverse=True)
-        
-        logger.info(f"共获取 {len(sorted_projects)} 个项目")
-        return sorted_projects[:30]
+        try:
+            response = await self.scheduler.request(
+                "POST", self.graphql_url, headers=self.headers,
+                json={"query": query, "variables": variables}
+            )
+        except Exception as e:
+            logger.warning(f"GraphQL 请求失败: {e}")
+            return None
+        if response.status_code != 200:
+            logger.warning(f"GraphQL 请求失败: {response.status_code}")
+            return None
+
+        payload = response.json()
+        data = payload.get("data")
+        if data is None:
+            logger.warning(f"GraphQL 查询出错: {payload.get('errors')}")
+            return None
+        # 不存在的仓库返回 null 并附带 NOT_FOUND 错误，其余结果仍然有效
+        for error in payload.get("errors") or []:
+            if error.get("type") != "NOT_FOUND":
+                logger.warning(f"GraphQL 错误: {error.get('message')}")
+
+        repos = {}
+        for i, full_name in enumerate(full_names):
+            node = data.get(f"r{i}")
+            if not node:
+                continue
+            repo = self._graphql_to_rest(node)
+            if include_readme:
+                readme = (node.get("readme") or {}).get("text")
+                repo["readme"] = readme
+                if readme is not None:
+                    self.readme_cache.put(full_name, readme)
+            repos[full_name] = repo
+        logger.info(f"GraphQL 获取 {len(repos)}/{len(full_names)} 个仓库")
+        return repos
+
+    @staticmethod
+    def _graphql_to_rest(node: dict) -> dict:
+        """将 GraphQL 仓库节点转换为 REST 格式（open_issues_count 与 REST 一样包含 PR）"""
+        return {
+            "full_name": node.get("nameWithOwner"),
+            "name": node.get("name"),
+            "html_url": node.get("url"),
+            "description": node.get("description"),
+            "language": (node.get("primaryLanguage") or {}).get("name"),
+            "stargazers_count": node.get("stargazerCount", 0),
+            "forks_count": node.get("forkCount", 0),
+            "open_issues_count": (node.get("issues") or {}).get("totalCount", 0)
+            + (node.get("pullRequests") or {}).get("totalCount", 0),
+            "topics": [
+                n["topic"]["name"] for n in (node.get("repositoryTopics") or {}).get("nodes", [])
+                if n and n.get("topic")
+            ],
+            "created_at": node.get("createdAt"),
+            "pushed_at": node.get("pushedAt"),
+            "default_branch": (node.get("defaultBranchRef") or {}).get("name"),
+        }
+
+    def parse_repository(self, repo: dict, previous: Optional[ProjectCreate] = None) -> Optional[ProjectCreate]:
+        """由仓库数据生成项目
+
+        previous 的内容指纹与仓库一致时沿用其派生字段（描述、分类、使用步骤、AI 增强内容），
+        只更新 stars / forks / issues；否则完整重新生成。趋势由 services/trends 根据历史计算。
+        """
+        if previous is not None and previous.fingerprint == repository_fingerprint(repo):
+            return previous.model_copy(update={
+                "stars": repo.get("stargazers_count", 0),
+                "forks": repo.get("forks_count", 0),
+                "issues": repo.get("open_issues_count", 0),
+            })
+        return self._parse_repository(repo)
 
     def _parse_repository(self, repo: dict) -> Optional[ProjectCreate]:
         try:
@@ -135,8 +356,9 @@ class GitHubService:
                 forks=repo.get("forks_count", 0),
                 issues=repo.get("open_issues_count", 0),
                 category=self._categorize(repo),
-                trend=self._calculate_trend(repo),
-                usage_steps=self._generate_usage_steps(name, repo)
+                usage_steps=self._generate_usage_steps(name, repo),
+                topics=list(repo.get("topics") or []),
+                fingerprint=repository_fingerprint(repo)
             )
         except Exception as e:
             logger.error(f"解析仓库失败: {e}")
@@ -179,17 +401,6 @@ class GitHubService:
 
         return "通用工具"
 
-    def _calculate_trend(self, repo: dict) -> str:
-        stars = repo.get("stargazers_count", 0)
-        recent_stars = repo.get("stargazers_since_last_analytic", 0)
-
-        if recent_stars > 1000:
-            return "rising"
-        elif recent_stars < 100:
-            return "falling"
-        else:
-            return "stable"
-
     def _generate_usage_steps(self, full_name: str, repo: dict) -> List[str]:
         steps = [
             f"克隆项目: git clone https://github.com/{full_name}",
@@ -227,18 +438,11 @@ class GitHubService:
 
         return steps
 
-    def _deduplicate(self, projects: List[ProjectCreate]) -> List[ProjectCreate]:
-        seen = set()
-        unique = []
-        for p in projects:
-            if p.full_name not in seen:
-                seen.add(p.full_name)
-                unique.append(p)
-        return unique
-
     async def fetch_readme(self, full_name: str) -> Optional[str]:
         """
-        获取项目 README 内容 - 尝试多种方法
+        获取项目 README 内容 - 优先使用磁盘缓存，过期后条件请求重新验证，再尝试多种方法
+
+        同一仓库正在获取时（页面请求、异步任务、预热）等待同一次获取的结果。
         """
         logger.info(f"获取 README: {full_name}")
         
@@ -259,95 +463,105 @@ class GitHubService:
             logger.error(f"无效的仓库名称: {full_name}")
             return None
         
-        # 尝试方法1: 使用 GitHub API 获取 README
-        readme_content = await self._fetch_readme_api(owner, repo)
-        if readme_content:
-            return readme_content
-        
-        # 尝试方法2: 直接获取默认分支的内容
-        readme_content = await self._fetch_readme_content(owner, repo)
-        if readme_content:
+        return await get_singleflight().do(
+            ("readme", f"{owner}/{repo}".casefold()), lambda: self._fetch_readme(owner, repo)
+        )
+
+    async def _fetch_readme(self, owner: str, repo: str) -> Optional[str]:
+        cache_key = f"{owner}/{repo}"
+        cached = self.readme_cache.lookup(cache_key)
+        if cached and self.readme_cache.is_fresh(cached):
+            logger.info(f"README 缓存命中: {cache_key}{'（无 README）' if cached.get('missing') else ''}")
+            return cached["content"]
+
+        # 方法1: /readme 一次请求直接返回默认分支上的 README 原文；已有缓存时
+        # 携带校验信息，未变化时 GitHub 返回 304（不计入速率限制）
+        response = await self._fetch_readme_api(owner, repo, cached)
+        if response is not None and response.status_code == 304 and cached and not cached.get("missing"):
+            self.readme_cache.touch(cache_key)
+            logger.info(f"README 未变化 (304): {cache_key}")
+            return cached["content"]
+
+        not_found = response is not None and response.status_code == 404
+        if not_found:
+            # 方法2: 并发探测常见文件名，第一个成功的胜出，其余请求取消
+            response, not_found = await self._probe_readme_files(owner, repo)
+
+        if response is not None and response.status_code == 200:
+            readme_content = response.content.decode('utf-8', errors='ignore')
+            self.readme_cache.put(
+                cache_key, readme_content,
+                etag=response.headers.get("ETag"),
+                last_modified=response.headers.get("Last-Modified")
+            )
             return readme_content
-        
-        logger.warning(f"无法获取 README: {full_name}")
+
+        if not_found:
+            # 确认没有 README（或仓库不存在），负缓存一段时间，避免每次打开页面都请求
+            self.readme_cache.put_missing(cache_key)
+            logger.info(f"项目无 README: {cache_key}")
+            return None
+
+        if cached and cached["content"] is not None:
+            # 上游不可用时退回过期的缓存内容
+            logger.warning(f"README 获取失败，使用过期缓存: {cache_key}")
+            return cached["content"]
+
+        logger.warning(f"无法获取 README: {cache_key}")
         return None
 
-    async def _fetch_readme_api(self, owner: str, repo: str) -> Optional[str]:
-        """方法1: 使用 GitHub READMEs API"""
+    async def _fetch_readme_api(self, owner: str, repo: str, cached: Optional[dict] = None) -> Optional[httpx.Response]:
+        """方法1: 使用 GitHub READMEs API（请求失败时返回 None）"""
+        headers = {**self.headers, "Accept": "application/vnd.github.raw"}
+        if cached and not cached.get("missing"):
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+
         try:
-            async with httpx.AsyncClient(timeout=30.0, follow_redirects=True) as client:
-                # 先获取仓库信息，找到默认分支
-                repo_url = f"{self.BASE_URL}/repos/{owner}/{repo}"
-                repo_response = await client.get(repo_url, headers=self.headers)
-                
-                if repo_response.status_code == 200:
-                    repo_info = repo_response.json()
-                    default_branch = repo_info.get("default_branch", "main")
-                    
-                    # 使用 readme API
-                    readme_url = f"{self.BASE_URL}/repos/{owner}/{repo}/readme"
-                    readme_headers = {
-                        **self.headers,
-                        "Accept": "application/vnd.github.raw"
-                    }
-                    
-                    readme_response = await client.get(
-                        readme_url,
-                        headers=readme_headers
-                    )
-                    
-                    if readme_response.status_code == 200:
-                        content = readme_response.content.decode('utf-8', errors='ignore')
-                        logger.info(f"README API 获取成功: {owner}/{repo}")
-                        return content
-                    else:
-                        logger.debug(f"README API 返回: {readme_response.status_code}")
-                        
+            response = await self.scheduler.request(
+                "GET", f"{self.BASE_URL}/repos/{owner}/{repo}/readme", headers=headers
+            )
         except Exception as e:
             logger.debug(f"README API 方法失败: {e}")
-        
-        return None
+            return None
+
+        if response.status_code == 200:
+            logger.info(f"README API 获取成功: {owner}/{repo}")
+        elif response.status_code not in (304, 404):
+            logger.debug(f"README API 返回: {response.status_code}")
+        return response
+
+    async def _probe_readme_files(self, owner: str, repo: str) -> Tuple[Optional[httpx.Response], bool]:
+        """方法2: 并发获取常见 README 文件名（默认分支）
+
+        返回 (成功的响应, 是否全部 404)；第一个成功的请求返回后取消其余请求。
+        """
+        headers = {**self.headers, "Accept": "application/vnd.github.raw"}
 
-    async def _fetch_readme_content(self, owner: str, repo: str) -> Optional[str]:
-        """方法2: 直接获取 README.md 文件内容"""
+        async def probe(readme_name: str) -> httpx.Response:
+            return await self.scheduler.request(
+                "GET", f"{self.BASE_URL}/repos/{owner}/{repo}/contents/{readme_name}", headers=headers
+            )
+
+        tasks = [asyncio.create_task(probe(name)) for name in self.README_FILENAMES]
+        all_not_found = True
         try:
-            async with httpx.AsyncClient(timeout=30.0, follow_redirects=True) as client:
-                # 获取仓库信息
-                repo_url = f"{self.BASE_URL}/repos/{owner}/{repo}"
-                repo_response = await client.get(repo_url, headers=self.headers)
-                
-                if repo_response.status_code != 200:
-                    return None
-                
-                repo_info = repo_response.json()
-                default_branch = repo_info.get("default_branch", "main")
-                
-                # 尝试多个 README 文件名
-                readme_names = ["README.md", "readme.md", "README.rst", "README.txt", "README", "readme"]
-                
-                for readme_name in readme_names:
-                    try:
-                        content_url = f"{self.BASE_URL}/repos/{owner}/{repo}/contents/{readme_name}"
-                        content_headers = {
-                            **self.headers,
-                            "Accept": "application/vnd.github.raw"
-                        }
-                        
-                        content_response = await client.get(
-                            content_url,
-                            params={"ref": default_branch},
-                            headers=content_headers
-                        )
-                        
-                        if content_response.status_code == 200:
-                            content = content_response.content.decode('utf-8', errors='ignore')
-                            logger.info(f"通过内容 API 获取 README 成功: {readme_name}")
-                            return content
-                            
-                    except Exception:
-                        continue
-                        
-        except Exception as e:
-            logger.debug(f"内容 API 方法失败: {e}")
-        
-        return None
+            for next_done in asyncio.as_completed(tasks):
+                try:
+                    response = await next_done
+                except Exception as e:
+                    logger.debug(f"内容 API 方法失败: {e}")
+                    all_not_found = False
+                    continue
+                if response.status_code == 200:
+                    logger.info(f"通过内容 API 获取 README 成功: {response.url.path.rsplit('/', 1)[-1]}")
+                    return response, False
+                if response.status_code != 404:
+                    all_not_found = False
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        return None, all_not_found
@@ -0,0 +1,211 @@
+"""
+历史记录去重编码
+
+同一个项目的描述、使用步骤等元数据每周都几乎不变，历史记录中只保存每周
+变化的数值，元数据统一放在共享的项目字典中：
+
+- 字典条目: {"id": 12, "full_name": "owner/repo", "version": 2, "meta": {...}}
+  元数据变化时为同一项目追加新版本，内容相同的元数据只保存一次
+- 每周一行: [字典 id, stars, forks, issues, trend]，行的顺序即排名；
+  旧版记录中的纯字符串项目原样保存
+- fork_url / issues_url 能由 url 推导时不保存，读取时重建
+- 物化统计中的 Top-N 项目摘要保存为该周行的下标，读取时由项目重新生成
+
+解码结果与原始项目字典内容一致，对外的历史记录格式不变。
+"""
+
+import hashlib
+import json
+from typing import Iterable, List, Optional, Tuple, Union
+
+from services.stats import project_brief
+
+# 每周变化的字段（按行保存）
+ROW_FIELDS = ("stars", "forks", "issues", "trend")
+
+# 可由 url 推导的字段及后缀
+DERIVED_URLS = (("fork_url", "/fork"), ("issues_url", "/issues"))
+
+# 解码时的字段顺序（与刷新时写入的项目字典一致），其余字段排在后面
+FIELD_ORDER = (
+    "name", "full_name", "url", "description", "language", "stars", "forks",
+    "issues", "fork_url", "issues_url", "category", "trend", "usage_steps",
+)
+
+# 元数据中的保留键
+_DERIVED_KEY = "_derived"
+_ROW_KEYS = "_row_keys"
+
+Row = Union[list, str]
+
+
+def split_project(item: dict) -> Tuple[dict, list]:
+    """拆分为 (元数据, 行数值)"""
+    url = item.get("url") or ""
+    meta = {}
+    derived = []
+    for key, value in item.items():
+        if key in ROW_FIELDS:
+            continue
+        suffix = dict(DERIVED_URLS).get(key)
+        if suffix is not None and url and value == url + suffix:
+            derived.append(key)
+            continue
+        meta[key] = value
+    if derived:
+        meta[_DERIVED_KEY] = derived
+    row_keys = [key for key in ROW_FIELDS if key in item]
+    if len(row_keys) != len(ROW_FIELDS):
+        meta[_ROW_KEYS] = row_keys
+    return meta, [item.get(key) for key in ROW_FIELDS]
+
+
+def _canonical(value) -> str:
+    return json.dumps(value, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+
+
+def meta_digest(meta: dict) -> str:
+    """元数据内容摘要（用于去重）"""
+    return hashlib.sha1(_canonical(meta).encode("utf-8")).hexdigest()
+
+
+def _map_top_lists(stats: dict, fn) -> dict:
+    """对统计中的各个 Top-N 列表逐项应用 fn"""
+    result = dict(stats)
+    if isinstance(stats.get("top_projects"), list):
+        result["top_projects"] = [fn(item) for item in stats["top_projects"]]
+    for key in ("top_by_language", "top_by_category"):
+        if isinstance(stats.get(key), dict):
+            result[key] = {group: [fn(item) for item in items] for group, items in stats[key].items()}
+    return result
+
+
+def encode_stats(stats: Optional[dict], projects: list) -> Optional[dict]:
+    """将 Top-N 摘要替换为项目下标（与项目生成的摘要不一致时原样保留）"""
+    if not stats:
+        return stats
+    positions = {}
+    for pos, item in enumerate(projects):
+        if isinstance(item, dict):
+            positions.setdefault(_canonical(project_brief(item)), pos)
+
+    def to_ref(brief):
+        pos = positions.get(_canonical(brief)) if isinstance(brief, dict) else None
+        return brief if pos is None else pos
+
+    return _map_top_lists(stats, to_ref)
+
+
+def decode_stats(stats: Optional[dict], projects: list) -> Optional[dict]:
+    """还原 Top-N 摘要"""
+    if not stats:
+        return stats
+    return _map_top_lists(
+        stats, lambda item: project_brief(projects[item]) if isinstance(item, int) else item
+    )
+
+
+class ProjectDictionary:
+    """共享的项目元数据字典
+
+    只由写线程编码新条目；编码时产生的新条目先放在 pending 中，
+    由存储层持久化成功后再 commit 到内存，避免内存与磁盘不一致。
+    """
+
+    def __init__(self, entries: Iterable[dict] = ()):
+        self._by_id = {}
+        self._by_digest = {}
+        self._versions = {}
+        self._next_id = 1
+        for entry in entries:
+            self._add(entry)
+
+    def _add(self, entry: dict) -> None:
+        entry_id = entry["id"]
+        self._by_id[entry_id] = entry
+        self._by_digest[meta_digest(entry["meta"])] = entry_id
+        full_name = entry.get("full_name")
+        self._versions[full_name] = max(self._versions.get(full_name, 0), entry.get("version", 1))
+        self._next_id = max(self._next_id, entry_id + 1)
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def __contains__(self, entry_id: int) -> bool:
+        return entry_id in self._by_id
+
+    def entries(self, ids: Optional[Iterable[int]] = None) -> List[dict]:
+        """字典条目（按 id 排序），ids 为空时返回全部"""
+        selected = self._by_id.keys() if ids is None else set(ids) & self._by_id.keys()
+        return [self._by_id[i] for i in sorted(selected)]
+
+    def retain(self, ids: Iterable[int]) -> None:
+        """只保留 ids 可供编码复用（对应磁盘上裁剪后的字典）
+
+        其余条目仍可解码（读取旧日志时使用），但不再复用，
+        同样的元数据再次出现时会分配并持久化新条目。
+        """
+        keep = set(ids)
+        self._by_digest = {d: i for d, i in self._by_digest.items() if i in keep}
+
+    def intern(self, meta: dict, pending: dict) -> int:
+        """获取元数据对应的条目 id，不存在时在 pending 中分配新条目"""
+        digest = meta_digest(meta)
+        entry_id = self._by_digest.get(digest)
+        if entry_id is not None:
+            return entry_id
+        entry = pending.get(digest)
+        if entry is None:
+            full_name = meta.get("full_name") or meta.get("name")
+            version = self._versions.get(full_name, 0) + 1 + sum(
+                1 for e in pending.values() if e["full_name"] == full_name
+            )
+            entry = {
+                "id": self._next_id + len(pending),
+                "full_name": full_name,
+                "version": version,
+                "meta": meta,
+            }
+            pending[digest] = entry
+        return entry["id"]
+
+    def commit(self, pending: dict) -> None:
+        """新条目持久化成功后加入字典"""
+        for entry in pending.values():
+            self._add(entry)
+        pending.clear()
+
+    def encode_projects(self, projects: Iterable, pending: dict) -> List[Row]:
+        """将一周的项目列表编码为行"""
+        rows = []
+        for item in projects:
+            if not isinstance(item, dict):
+                rows.append(str(item))
+                continue
+            meta, values = split_project(item)
+            rows.append([self.intern(meta, pending)] + values)
+        return rows
+
+    def decode_row(self, row: Row) -> Union[dict, str]:
+        """将一行还原为项目字典，未知 id 抛出 KeyError"""
+        if isinstance(row, str):
+            return row
+        entry_id, *values = row
+        meta = self._by_id[entry_id]["meta"]
+        row_keys = meta.get(_ROW_KEYS, ROW_FIELDS)
+        item = {key: value for key, value in zip(ROW_FIELDS, values) if key in row_keys}
+        url = meta.get("url") or ""
+        for key, suffix in DERIVED_URLS:
+            if key in meta.get(_DERIVED_KEY, ()):
+                item[key] = url + suffix
+        for key, value in meta.items():
+            if key not in (_DERIVED_KEY, _ROW_KEYS):
+                item[key] = value
+
+        ordered = {key: item.pop(key) for key in FIELD_ORDER if key in item}
+        ordered.update(item)
+        return ordered
+
+    def decode_projects(self, rows: Iterable[Row]) -> list:
+        """将一周的行还原为项目列表"""
+        return [self.decode_row(row) for row in rows]
@@ -0,0 +1,212 @@
+"""
+共享 HTTP 客户端
+
+每个上游（GitHub、AI 服务）使用一个长期存在的连接池客户端，在应用
+lifespan 中创建、关闭时统一释放，请求之间复用 TCP/TLS 连接。
+
+配置（config.json 中的 "http"，均可选）:
+    {
+      "http": {
+        "maxConnections": 20,          # 每个客户端的最大连接数
+        "maxKeepaliveConnections": 10, # 保持空闲的最大连接数
+        "keepaliveExpiry": 30,         # 空闲连接保留秒数
+        "http2": false                 # 需要安装 h2
+      }
+    }
+
+与 httpx 默认行为一致，HTTP_PROXY / HTTPS_PROXY / ALL_PROXY / NO_PROXY 环境变量中的代理
+按 URL 挂载为各自的连接池。
+"""
+
+import importlib.util
+import logging
+import threading
+import time
+from typing import Dict, List, Optional
+
+import httpx
+from httpx._utils import get_environment_proxies
+
+from services.config_loader import load_app_config
+
+logger = logging.getLogger(__name__)
+
+# h2 为可选依赖，未安装时不能启用 HTTP/2
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# 各上游的默认超时（秒）
+UPSTREAM_TIMEOUTS = {
+    "github": 30.0,
+    "ai": 60.0,
+}
+DEFAULT_TIMEOUT = 30.0
+
+
+class MeteredTransport(httpx.AsyncBaseTransport):
+    """统计连接池使用情况的传输层
+
+    通过 httpcore 的 trace 扩展统计新建连接数，由此得到连接复用次数；
+    请求到达时在途请求数已达连接上限则计为一次排队等待。
+    """
+
+    def __init__(self, transport: httpx.AsyncHTTPTransport, max_connections: Optional[int]):
+        self._transport = transport
+        self._max_connections = max_connections
+        self._in_flight = 0
+        self._stats = {
+            "requests": 0,
+            "errors": 0,
+            "connections_opened": 0,
+            "pool_waits": 0,
+            "total_time_ms": 0.0,
+        }
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self._stats["requests"] += 1
+        if self._max_connections is not None and self._in_flight >= self._max_connections:
+            self._stats["pool_waits"] += 1
+
+        upstream_trace = request.extensions.get("trace")
+
+        async def trace(event_name: str, info: dict) -> None:
+            if event_name == "connection.connect_tcp.complete":
+                self._stats["connections_opened"] += 1
+            if upstream_trace is not None:
+                await upstream_trace(event_name, info)
+
+        request.extensions["trace"] = trace
+        self._in_flight += 1
+        start = time.perf_counter()
+        try:
+            return await self._transport.handle_async_request(request)
+        except Exception:
+            self._stats["errors"] += 1
+            raise
+        finally:
+            self._in_flight -= 1
+            self._stats["total_time_ms"] += (time.perf_counter() - start) * 1000
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+    def get_stats(self) -> dict:
+        """连接池统计"""
+        pool = getattr(self._transport, "_pool", None)
+        connections = list(getattr(pool, "connections", []) or [])
+        requests = self._stats["requests"]
+        return {
+            **self._stats,
+            "total_time_ms": round(self._stats["total_time_ms"], 1),
+            "in_flight": self._in_flight,
+            "open_connections": len(connections),
+            "idle_connections": sum(1 for c in connections if c.is_idle()),
+            "reused": max(0, requests - self._stats["connections_opened"]),
+        }
+
+
+class HttpClients:
+    """按上游名称管理共享的 AsyncClient"""
+
+    def __init__(self):
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._transports: Dict[str, List[MeteredTransport]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _load_settings() -> dict:
+        settings = load_app_config().get("http", {}) or {}
+        http2 = bool(settings.get("http2", False))
+        if http2 and not HTTP2_AVAILABLE:
+            logger.warning("已启用 http2 但未安装 h2，回退到 HTTP/1.1")
+            http2 = False
+        return {
+            "limits": httpx.Limits(
+                max_connections=settings.get("maxConnections", 20),
+                max_keepalive_connections=settings.get("maxKeepaliveConnections", 10),
+                keepalive_expiry=settings.get("keepaliveExpiry", 30),
+            ),
+            "http2": http2,
+        }
+
+    def _create(self, name: str) -> httpx.AsyncClient:
+        settings = self._load_settings()
+        limits = settings["limits"]
+
+        def metered(proxy: Optional[str] = None) -> MeteredTransport:
+            transport = httpx.AsyncHTTPTransport(
+                limits=limits, http2=settings["http2"], proxy=httpx.Proxy(proxy) if proxy else None
+            )
+            metered_transport = MeteredTransport(transport, limits.max_connections)
+            self._transports.setdefault(name, []).append(metered_transport)
+            return metered_transport
+
+        # 传入自定义 transport 时 httpx 不再读取代理环境变量，这里按相同规则挂载
+        self._transports[name] = []
+        transport = metered()
+        mounts = {
+            pattern: metered(proxy) if proxy else None
+            for pattern, proxy in get_environment_proxies().items()
+        }
+        logger.info(
+            f"创建 HTTP 客户端 {name}: max_connections={limits.max_connections}, "
+            f"keepalive={limits.max_keepalive_connections}, http2={settings['http2']}, "
+            f"proxies={sum(1 for proxy in mounts.values() if proxy is not None)}"
+        )
+        return httpx.AsyncClient(
+            transport=transport,
+            mounts=mounts,
+            timeout=UPSTREAM_TIMEOUTS.get(name, DEFAULT_TIMEOUT),
+            follow_redirects=True,
+        )
+
+    def get(self, name: str) -> httpx.AsyncClient:
+        """获取上游对应的共享客户端（不存在或已关闭时创建）"""
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            with self._lock:
+                client = self._clients.get(name)
+                if client is None or client.is_closed:
+                    client = self._create(name)
+                    self._clients[name] = client
+        return client
+
+    def open(self, *names: str) -> None:
+        """预先创建客户端（应用启动时调用）"""
+        for name in names or UPSTREAM_TIMEOUTS:
+            self.get(name)
+
+    async def aclose(self) -> None:
+        """关闭全部客户端，释放连接"""
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+        for client in clients:
+            await client.aclose()
+
+    def get_stats(self) -> dict:
+        """各上游连接池统计（直连和代理连接池合计）"""
+        stats = {}
+        for name, transports in self._transports.items():
+            merged: dict = {}
+            for transport in transports:
+                for key, value in transport.get_stats().items():
+                    merged[key] = merged.get(key, 0) + value
+            merged["total_time_ms"] = round(merged.get("total_time_ms", 0.0), 1)
+            stats[name] = merged
+        return stats
+
+
+_http_clients: Optional[HttpClients] = None
+
+
+def get_http_clients() -> HttpClients:
+    """获取进程内共享的客户端集合"""
+    global _http_clients
+    if _http_clients is None:
+        _http_clients = HttpClients()
+    return _http_clients
+
+
+def get_http_client(name: str) -> httpx.AsyncClient:
+    """获取指定上游的共享客户端"""
+    return get_http_clients().get(name)
@@ -0,0 +1,35 @@
+"""
+分页游标
+
+游标是对偏移量的 URL 安全 base64 编码，对客户端不透明；
+数据快照更新后旧游标仍可使用（按新快照的同一位置继续）。
+"""
+
+import base64
+from typing import Optional
+
+
+def encode_cursor(offset: int) -> str:
+    """将偏移量编码为游标"""
+    return base64.urlsafe_b64encode(f"o:{offset}".encode("ascii")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> int:
+    """解析游标，空游标表示从头开始；格式错误抛出 ValueError"""
+    if not cursor:
+        return 0
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("ascii")
+        prefix, _, value = raw.partition(":")
+        offset = int(value)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"无效的游标: {cursor}") from e
+    if prefix != "o" or offset < 0:
+        raise ValueError(f"无效的游标: {cursor}")
+    return offset
+
+
+def next_cursor(offset: int, page_size: int, total: int) -> Optional[str]:
+    """下一页游标，没有更多数据时返回 None"""
+    end = offset + page_size
+    return encode_cursor(end) if end < total else None
@@ -0,0 +1,333 @@
+"""
+GitHub 请求调度（速率限制感知）
+
+所有 GitHub 请求都经过 GitHubScheduler：
+- 按响应头（X-RateLimit-Remaining / Reset、Retry-After）分别跟踪每个 token 在
+  search、core、graphql 下的剩余额度，额度耗尽时切换 token 或等待重置
+- 令牌桶按配置速率发出请求，避免突发请求触发次级速率限制（每小时额度
+  由响应头跟踪，不靠令牌桶限制）
+- 在配置的多个 token（github.tokens）之间轮换，优先使用剩余额度最多的
+- 次级速率限制、429 和 5xx 使用带抖动的指数退避重试
+
+配置（config.json 中的 "github"，均可选）:
+    {
+      "github": {
+        "token": "ghp_xxx",
+        "tokens": ["ghp_aaa", "ghp_bbb"],
+        "rateLimit": {
+          "searchPerMinute": 30,   # 每个 token 的搜索请求速率（未认证时 10）
+          "corePerMinute": 900,    # 每个 token 的其余请求速率（GitHub 次级限制）
+          "burst": 10,             # 令牌桶容量
+          "maxRetries": 4,
+          "backoffBase": 1.0,      # 退避基数（秒），每次翻倍
+          "backoffMax": 30.0,
+          "maxWaitSeconds": 90     # 额度耗尽时最多等待重置的秒数，超过则抛出 RateLimitExceeded
+        }
+      }
+    }
+"""
+
+import asyncio
+import logging
+import random
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from services.config_loader import load_app_config
+from services.http import get_http_client
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_DEFAULTS = {
+    "searchPerMinute": 30,
+    "corePerMinute": 900,
+    "burst": 10,
+    "maxRetries": 4,
+    "backoffBase": 1.0,
+    "backoffMax": 30.0,
+    "maxWaitSeconds": 90,
+}
+
+# 未认证请求的搜索速率（GitHub 按 IP 计算）
+ANONYMOUS_RATES = {"searchPerMinute": 10}
+
+RESOURCES = ("core", "search", "graphql")
+
+
+class RateLimitExceeded(Exception):
+    """所有 token 的额度都已耗尽，且重置时间超过最大等待时间"""
+
+    def __init__(self, resource: str, reset_in: float):
+        super().__init__(f"GitHub {resource} 额度已耗尽，{reset_in:.0f} 秒后重置")
+        self.resource = resource
+        self.reset_in = reset_in
+
+
+def resource_for(url: str) -> str:
+    """根据请求路径判断所属的速率限制类别"""
+    path = httpx.URL(url).path
+    if path.startswith("/search/"):
+        return "search"
+    if path.startswith("/graphql"):
+        return "graphql"
+    return "core"
+
+
+class TokenBucket:
+    """令牌桶（单事件循环内使用，预约式，不需要锁）"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+
+    def _reserve(self) -> float:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        self._tokens -= 1
+        return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    async def acquire(self) -> float:
+        """获取一个令牌，返回等待秒数"""
+        delay = self._reserve()
+        if delay > 0:
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                self._tokens += 1
+                raise
+        return delay
+
+
+class RateBudget:
+    """单个 token 在某一类别下的剩余额度"""
+
+    def __init__(self):
+        self.limit: Optional[int] = None
+        self.remaining: Optional[int] = None
+        self.reset_at = 0.0
+        self.blocked_until = 0.0
+
+    def update(self, headers: httpx.Headers) -> None:
+        try:
+            if "X-RateLimit-Remaining" in headers:
+                self.remaining = int(headers["X-RateLimit-Remaining"])
+            if "X-RateLimit-Limit" in headers:
+                self.limit = int(headers["X-RateLimit-Limit"])
+            if "X-RateLimit-Reset" in headers:
+                self.reset_at = float(headers["X-RateLimit-Reset"])
+        except ValueError:
+            pass
+
+    def spend(self) -> None:
+        """发出请求前预扣额度，避免并发请求同时使用已耗尽的 token"""
+        if self.remaining is not None and self.remaining > 0:
+            self.remaining -= 1
+
+    def block(self, seconds: float) -> None:
+        self.blocked_until = max(self.blocked_until, time.time() + seconds)
+
+    def ready_at(self, now: float) -> float:
+        """可以再次使用的时间（epoch 秒）"""
+        ready = max(now, self.blocked_until)
+        if self.remaining == 0 and self.reset_at > now:
+            ready = max(ready, self.reset_at)
+        return ready
+
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    try:
+        return float(response.headers["Retry-After"])
+    except (KeyError, ValueError):
+        return None
+
+
+def _is_rate_limited(response: httpx.Response) -> bool:
+    if response.status_code == 429:
+        return True
+    if response.status_code != 403:
+        return False
+    if response.headers.get("X-RateLimit-Remaining") == "0" or "Retry-After" in response.headers:
+        return True
+    return "rate limit" in response.text.lower()
+
+
+class GitHubScheduler:
+    """GitHub 请求调度器"""
+
+    def __init__(self, tokens: Optional[List[str]] = None, settings: Optional[dict] = None):
+        self.settings = {**RATE_LIMIT_DEFAULTS, **(settings or {})}
+        self._stats = {
+            "requests": 0,
+            "retries": 0,
+            "rate_limited": 0,
+            "server_errors": 0,
+            "budget_waits": 0,
+            "wait_time_s": 0.0,
+        }
+        self.set_tokens(tokens or [])
+
+    def set_tokens(self, tokens: List[str]) -> None:
+        """设置可轮换的 token（为空时使用未认证请求），并按 token 数重建令牌桶"""
+        self.tokens: List[Optional[str]] = list(dict.fromkeys(t for t in tokens if t)) or [None]
+        self._budgets: Dict[Tuple[int, str], RateBudget] = {}
+        self._picks = [0] * len(self.tokens)
+        authenticated = self.tokens[0] is not None
+        rates = self.settings if authenticated else {**self.settings, **ANONYMOUS_RATES}
+        per_second = {
+            "search": rates["searchPerMinute"] / 60,
+            "core": rates["corePerMinute"] / 60,
+            "graphql": rates["corePerMinute"] / 60,
+        }
+        self._buckets = {
+            resource: TokenBucket(rate * len(self.tokens), self.settings["burst"])
+            for resource, rate in per_second.items()
+        }
+
+    def reload_tokens(self) -> None:
+        """从配置重新读取 token（保存 GitHub 配置后调用）"""
+        self.set_tokens(load_tokens())
+
+    @property
+    def authenticated(self) -> bool:
+        return self.tokens[0] is not None
+
+    def _budget(self, index: int, resource: str) -> RateBudget:
+        key = (index, resource)
+        budget = self._budgets.get(key)
+        if budget is None:
+            budget = self._budgets[key] = RateBudget()
+        return budget
+
+    def _pick_token(self, resource: str) -> Tuple[int, float]:
+        """选择最早可用、剩余额度最多的 token（相同时轮换），返回 (下标, 可用时间)"""
+        now = time.time()
+
+        def rank(index: int):
+            budget = self._budget(index, resource)
+            remaining = budget.remaining if budget.remaining is not None else float("inf")
+            return budget.ready_at(now), -remaining, self._picks[index]
+
+        index = min(range(len(self.tokens)), key=rank)
+        self._picks[index] += 1
+        return index, self._budget(index, resource).ready_at(now)
+
+    def _backoff(self, attempt: int) -> float:
+        cap = min(self.settings["backoffMax"], self.settings["backoffBase"] * (2 ** attempt))
+        return cap / 2 + random.uniform(0, cap / 2)
+
+    async def _sleep(self, seconds: float) -> None:
+        self._stats["wait_time_s"] += seconds
+        await asyncio.sleep(seconds)
+
+    async def request(self, method: str, url: str, headers: Optional[dict] = None,
+                      **kwargs) -> httpx.Response:
+        """发送 GitHub 请求（自动选择 token、限速、重试）
+
+        重试耗尽时返回最后一次响应；额度耗尽且等待时间过长时抛出 RateLimitExceeded。
+        """
+        resource = resource_for(url)
+        client = get_http_client("github")
+        attempt = 0
+        while True:
+            index, ready_at = self._pick_token(resource)
+            wait = ready_at - time.time()
+            if wait > 0:
+                if wait > self.settings["maxWaitSeconds"]:
+                    raise RateLimitExceeded(resource, wait)
+                self._stats["budget_waits"] += 1
+                logger.info(f"GitHub {resource} 额度耗尽，等待 {wait:.1f} 秒")
+                await self._sleep(wait)
+
+            self._stats["wait_time_s"] += await self._buckets[resource].acquire()
+            budget = self._budget(index, resource)
+            budget.spend()
+
+            request_headers = dict(headers or {})
+            token = self.tokens[index]
+            if token:
+                request_headers["Authorization"] = f"token {token}"
+
+            self._stats["requests"] += 1
+            try:
+                response = await client.request(method, url, headers=request_headers, **kwargs)
+            except httpx.TransportError as e:
+                if attempt >= self.settings["maxRetries"]:
+                    raise
+                delay = self._backoff(attempt)
+                logger.warning(f"GitHub 请求失败，{delay:.1f} 秒后重试: {e}")
+            else:
+                budget.update(response.headers)
+                if _is_rate_limited(response):
+                    self._stats["rate_limited"] += 1
+                    if attempt >= self.settings["maxRetries"]:
+                        return response
+                    retry_after = _retry_after(response)
+                    if retry_after is not None or budget.remaining != 0:
+                        # 次级速率限制：该 token 暂停一段时间
+                        budget.block(retry_after if retry_after is not None else self._backoff(attempt))
+                    # 主额度耗尽时已记录重置时间；下一轮切换 token 或等待
+                    delay = 0.0
+                    logger.warning(f"GitHub {resource} 触发速率限制 (token {index + 1}/{len(self.tokens)})")
+                elif response.status_code >= 500:
+                    self._stats["server_errors"] += 1
+                    if attempt >= self.settings["maxRetries"]:
+                        return response
+                    delay = self._backoff(attempt)
+                    logger.warning(f"GitHub 返回 {response.status_code}，{delay:.1f} 秒后重试")
+                else:
+                    return response
+
+            attempt += 1
+            self._stats["retries"] += 1
+            if delay > 0:
+                await self._sleep(delay)
+
+    def get_budget(self, resource: str) -> dict:
+        """某一类别在所有 token 上的剩余额度"""
+        now = time.time()
+        budgets = [self._budgets[(i, resource)] for i in range(len(self.tokens)) if (i, resource) in self._budgets]
+        known = [b for b in budgets if b.remaining is not None]
+        return {
+            "remaining": sum(b.remaining for b in known) if known else None,
+            "limit": sum(b.limit or 0 for b in known) if known else None,
+            "reset_in": round(max((b.reset_at - now for b in known), default=0.0), 1) if known else None,
+            "exhausted_tokens": sum(1 for b in budgets if b.ready_at(now) > now),
+        }
+
+    def get_stats(self) -> dict:
+        """调度统计与各类别剩余额度"""
+        return {
+            **self._stats,
+            "wait_time_s": round(self._stats["wait_time_s"], 2),
+            "tokens": len(self.tokens) if self.authenticated else 0,
+            "budgets": {resource: self.get_budget(resource) for resource in RESOURCES},
+        }
+
+
+def load_tokens() -> List[str]:
+    """读取配置中的 token（github.tokens 与 github.token 合并）"""
+    github = load_app_config().get("github", {}) or {}
+    tokens = list(github.get("tokens", []) or [])
+    if github.get("token"):
+        tokens.insert(0, github["token"])
+    return tokens
+
+
+_scheduler: Optional[GitHubScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_github_scheduler() -> GitHubScheduler:
+    """获取进程内共享的 GitHub 调度器"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            github = load_app_config().get("github", {}) or {}
+            _scheduler = GitHubScheduler(load_tokens(), github.get("rateLimit", {}) or {})
+        return _scheduler
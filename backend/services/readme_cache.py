@@ -0,0 +1,268 @@
+"""
+README 磁盘缓存
+
+按 owner/repo 缓存 README 正文及其 ETag / Last-Modified：
+- TTL 内直接返回缓存内容，不访问 GitHub
+- 过期后由调用方携带 If-None-Match / If-Modified-Since 重新验证，
+  GitHub 返回 304 时不计入速率限制，只需刷新缓存时间
+- 确认没有 README（404）的项目做负缓存，使用较短的 TTL
+- 按条目数和总字节数做 LRU 淘汰
+
+配置（config.json 中的 "readmeCache"，均可选）:
+    {
+      "readmeCache": {
+        "dir": "./data/readme_cache",
+        "maxEntries": 500,
+        "maxBytes": 52428800,
+        "ttlSeconds": 21600,
+        "negativeTtlSeconds": 3600
+      }
+    }
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from services.config_loader import load_app_config
+from services.writer import atomic_write_json, atomic_write_text
+
+logger = logging.getLogger(__name__)
+
+
+class ReadmeCache:
+    """README 磁盘缓存（索引常驻内存，正文按需读取）"""
+
+    def __init__(
+        self,
+        cache_dir: str = "./data/readme_cache",
+        max_entries: int = 500,
+        max_bytes: int = 50 * 1024 * 1024,
+        ttl: float = 6 * 3600,
+        negative_ttl: float = 3600,
+    ):
+        self.cache_dir = cache_dir
+        self.index_file = os.path.join(cache_dir, "index.json")
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._lock = threading.RLock()
+        # key -> 元数据，按最近访问排序（最旧在前）
+        self._index: "OrderedDict[str, dict]" = OrderedDict()
+        self._total_bytes = 0
+        self._stats = {
+            "hits": 0, "negative_hits": 0, "stale_hits": 0, "misses": 0,
+            "revalidated": 0, "evictions": 0,
+        }
+        self._load_index()
+
+    @staticmethod
+    def _key(full_name: str) -> str:
+        return full_name.strip("/").casefold()
+
+    def _body_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".md")
+
+    def _load_index(self) -> None:
+        if not os.path.exists(self.index_file):
+            return
+        try:
+            with open(self.index_file, "r", encoding="utf-8") as f:
+                entries = json.load(f).get("entries", [])
+        except Exception as e:
+            logger.warning(f"README 缓存索引损坏，已忽略: {e}")
+            return
+        for entry in sorted(entries, key=lambda e: e.get("accessed_at", 0)):
+            key = self._key(entry["full_name"])
+            if entry.get("missing") or os.path.exists(self._body_path(key)):
+                self._index[key] = entry
+                self._total_bytes += entry.get("size", 0)
+
+    def _save_index(self) -> None:
+        atomic_write_json(self.index_file, {"entries": list(self._index.values())}, indent=None)
+
+    def _remove(self, key: str) -> None:
+        entry = self._index.pop(key, None)
+        if entry is None:
+            return
+        self._total_bytes -= entry.get("size", 0)
+        if entry.get("missing"):
+            return
+        try:
+            os.unlink(self._body_path(key))
+        except OSError:
+            pass
+
+    def _evict(self) -> None:
+        while self._index and (len(self._index) > self.max_entries or self._total_bytes > self.max_bytes):
+            key = next(iter(self._index))
+            self._remove(key)
+            self._stats["evictions"] += 1
+
+    def is_fresh(self, entry: dict) -> bool:
+        """缓存是否仍在 TTL 内（负缓存使用 negative_ttl）"""
+        ttl = self.negative_ttl if entry.get("missing") else self.ttl
+        return time.time() - entry.get("fetched_at", 0) < ttl
+
+    def _hit_kind(self, entry: dict) -> str:
+        if not self.is_fresh(entry):
+            return "stale_hits"
+        return "negative_hits" if entry.get("missing") else "hits"
+
+    def _read(self, key: str, entry: dict) -> Optional[dict]:
+        """读取正文并更新访问顺序，正文丢失时移除条目（负缓存的 content 为 None）"""
+        content = None
+        if not entry.get("missing"):
+            try:
+                with open(self._body_path(key), "r", encoding="utf-8") as f:
+                    content = f.read()
+            except OSError:
+                self._remove(key)
+                return None
+        entry["accessed_at"] = time.time()
+        self._index.move_to_end(key)
+        return {**entry, "content": content}
+
+    def lookup(self, full_name: str) -> Optional[dict]:
+        """查找缓存，返回元数据（含 content，可能已过期），未缓存返回 None"""
+        key = self._key(full_name)
+        with self._lock:
+            entry = self._index.get(key)
+            cached = self._read(key, entry) if entry is not None else None
+            if cached is None:
+                self._stats["misses"] += 1
+            else:
+                self._stats[self._hit_kind(entry)] += 1
+            return cached
+
+    def peek(self, full_name: str) -> Optional[dict]:
+        """只在缓存未过期时返回缓存（未命中不计入统计，之后应走 lookup 流程）"""
+        key = self._key(full_name)
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None or not self.is_fresh(entry):
+                return None
+            cached = self._read(key, entry)
+            if cached is None:
+                return None
+            self._stats[self._hit_kind(entry)] += 1
+            return cached
+
+    def fresh_state(self, full_name: str) -> Optional[str]:
+        """未过期缓存的状态："present" / "missing"（负缓存），没有时为 None；不读取正文、不计入统计"""
+        with self._lock:
+            entry = self._index.get(self._key(full_name))
+            if entry is None or not self.is_fresh(entry):
+                return None
+            return "missing" if entry.get("missing") else "present"
+
+    def put(self, full_name: str, content: str, etag: Optional[str] = None,
+            last_modified: Optional[str] = None) -> None:
+        """写入（或覆盖）缓存"""
+        key = self._key(full_name)
+        now = time.time()
+        size = len(content.encode("utf-8"))
+        with self._lock:
+            self._remove(key)
+            atomic_write_text(self._body_path(key), content)
+            self._index[key] = {
+                "full_name": full_name,
+                "size": size,
+                "etag": etag,
+                "last_modified": last_modified,
+                "fetched_at": now,
+                "accessed_at": now,
+            }
+            self._total_bytes += size
+            self._evict()
+            self._save_index()
+
+    def put_missing(self, full_name: str) -> None:
+        """记录项目没有 README（负缓存）"""
+        key = self._key(full_name)
+        now = time.time()
+        with self._lock:
+            self._remove(key)
+            self._index[key] = {
+                "full_name": full_name,
+                "missing": True,
+                "size": 0,
+                "fetched_at": now,
+                "accessed_at": now,
+            }
+            self._evict()
+            self._save_index()
+
+    def touch(self, full_name: str) -> None:
+        """重新验证通过（304），刷新缓存时间"""
+        key = self._key(full_name)
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None:
+                return
+            entry["fetched_at"] = time.time()
+            self._stats["revalidated"] += 1
+            self._save_index()
+
+    def purge(self, full_name: Optional[str] = None) -> int:
+        """清除指定项目（为空时清除全部）的缓存，返回清除条目数"""
+        with self._lock:
+            keys = list(self._index) if full_name is None else [self._key(full_name)]
+            removed = 0
+            for key in keys:
+                if key in self._index:
+                    self._remove(key)
+                    removed += 1
+            self._save_index()
+            return removed
+
+    def list_entries(self) -> list:
+        """缓存条目（最近访问在前，不含正文）"""
+        with self._lock:
+            return [
+                {**entry, "fresh": self.is_fresh(entry)}
+                for entry in reversed(self._index.values())
+            ]
+
+    def get_stats(self) -> dict:
+        """缓存统计"""
+        with self._lock:
+            lookups = sum(self._stats[k] for k in ("hits", "negative_hits", "stale_hits", "misses"))
+            return {
+                **self._stats,
+                "entries": len(self._index),
+                "bytes": self._total_bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl,
+                "negative_ttl_seconds": self.negative_ttl,
+                "hit_rate": round(
+                    (self._stats["hits"] + self._stats["negative_hits"]) / lookups, 3
+                ) if lookups else 0.0,
+            }
+
+
+_readme_cache: Optional[ReadmeCache] = None
+_readme_cache_lock = threading.Lock()
+
+
+def get_readme_cache() -> ReadmeCache:
+    """获取进程内共享的 README 缓存"""
+    global _readme_cache
+    with _readme_cache_lock:
+        if _readme_cache is None:
+            config = load_app_config().get("readmeCache", {}) or {}
+            _readme_cache = ReadmeCache(
+                cache_dir=config.get("dir", "./data/readme_cache"),
+                max_entries=config.get("maxEntries", 500),
+                max_bytes=config.get("maxBytes", 50 * 1024 * 1024),
+                ttl=config.get("ttlSeconds", 6 * 3600),
+                negative_ttl=config.get("negativeTtlSeconds", 3600),
+            )
+        return _readme_cache
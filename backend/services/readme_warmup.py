@@ -0,0 +1,198 @@
+"""
+README 预热
+
+每次刷新保存快照后，在后台为快照中的项目预先获取并缓存 README，
+打开项目详情页时直接命中本地缓存：
+- 新上榜的项目优先，其余按排名顺序；缓存未过期的项目跳过
+- 启用 GraphQL（github.graphql）时先批量获取各仓库的 README.md，其余项目再逐个获取
+- 并发数受配置限制
+- 每次请求前检查 GitHub core 剩余额度，低于保留值时停止，把额度留给页面访问
+- 新的刷新开始时取消正在进行的预热
+
+配置（config.json 中的 "readmeWarmup"，均可选）:
+    {
+      "readmeWarmup": {
+        "enabled": true,
+        "concurrency": 3,        # 同时获取的 README 数
+        "minRemaining": 100      # core 剩余额度低于该值（最多为总额度的 20%）时停止
+      }
+    }
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from typing import Iterable, List, Optional
+
+from services.config_loader import load_app_config
+
+logger = logging.getLogger(__name__)
+
+WARMUP_DEFAULTS = {
+    "enabled": True,
+    "concurrency": 3,
+    "minRemaining": 100,
+}
+
+# 保留额度最多占总额度的比例（未认证时总额度只有 60）
+RESERVE_RATIO = 0.2
+
+
+def order_names(full_names: Iterable[str], new_names: Iterable[str]) -> List[str]:
+    """新上榜的项目在前，其余保持原顺序（按 full_name 去重，不区分大小写）"""
+    new_keys = {name.casefold() for name in new_names}
+    seen = set()
+    fresh, rest = [], []
+    for name in full_names:
+        key = name.casefold()
+        if key in seen:
+            continue
+        seen.add(key)
+        (fresh if key in new_keys else rest).append(name)
+    return fresh + rest
+
+
+class ReadmeWarmup:
+    """后台 README 预热任务（同一时间只运行一个）"""
+
+    def __init__(self, settings: Optional[dict] = None):
+        self.settings = {**WARMUP_DEFAULTS, **(settings or {})}
+        self._task: Optional[asyncio.Task] = None
+        self._progress = self._new_progress("idle", 0, 0)
+
+    @staticmethod
+    def _new_progress(status: str, total: int, new: int) -> dict:
+        return {
+            "status": status,
+            "total": total,
+            "new": new,
+            "completed": 0,
+            "fetched": 0,
+            "prefetched": 0,
+            "missing": 0,
+            "skipped": 0,
+            "failed": 0,
+            "started_at": time.time() if status == "running" else None,
+            "finished_at": None,
+        }
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self, github_service, full_names: List[str], new_names: Iterable[str] = ()) -> bool:
+        """取消正在进行的预热并开始新的预热（需在事件循环中调用），未启用时返回 False"""
+        self.cancel()
+        if not self.settings["enabled"] or not full_names:
+            return False
+        new_keys = {name.casefold() for name in new_names}
+        names = order_names(full_names, new_keys)
+        self._progress = self._new_progress(
+            "running", len(names), sum(1 for n in names if n.casefold() in new_keys)
+        )
+        self._task = asyncio.create_task(self._run(github_service, names, self._progress))
+        logger.info(f"开始预热 README: {len(names)} 个项目（新上榜 {self._progress['new']} 个）")
+        return True
+
+    def cancel(self) -> bool:
+        """取消正在进行的预热，返回是否有任务被取消"""
+        if not self.running:
+            return False
+        self._task.cancel()
+        self._finish(self._progress, "cancelled")
+        logger.info(f"README 预热已取消（完成 {self._progress['completed']}/{self._progress['total']}）")
+        return True
+
+    @staticmethod
+    def _finish(progress: dict, status: str) -> None:
+        if progress["status"] == "running":
+            progress["status"] = status
+            progress["finished_at"] = time.time()
+
+    def _budget_low(self, scheduler) -> bool:
+        budget = scheduler.get_budget("core")
+        if budget["remaining"] is None:
+            return False
+        reserve = self.settings["minRemaining"]
+        if budget["limit"]:
+            reserve = min(reserve, budget["limit"] * RESERVE_RATIO)
+        return budget["remaining"] <= reserve
+
+    async def _prefetch(self, github_service, names: List[str], progress: dict) -> List[str]:
+        """GraphQL 批量预取，返回仍需逐个获取的项目"""
+        cache = github_service.readme_cache
+        stale = [name for name in names if cache.fresh_state(name) is None]
+        if not stale or not await github_service.prefetch_readmes(stale):
+            return names
+        done = {name for name in stale if cache.fresh_state(name) is not None}
+        progress["fetched"] += len(done)
+        progress["prefetched"] += len(done)
+        progress["completed"] += len(done)
+        logger.info(f"GraphQL 批量预取 README: {len(done)}/{len(stale)} 个")
+        return [name for name in names if name not in done]
+
+    async def _run(self, github_service, names: List[str], progress: dict) -> None:
+        cache = github_service.readme_cache
+        pending = iter(names)
+        stop = False
+
+        async def worker():
+            nonlocal stop
+            for name in pending:
+                if stop:
+                    return
+                if cache.fresh_state(name) is not None:
+                    progress["skipped"] += 1
+                elif self._budget_low(github_service.scheduler):
+                    stop = True
+                    return
+                else:
+                    try:
+                        await github_service.fetch_readme(name)
+                    except Exception as e:
+                        logger.debug(f"预热 README 失败 {name}: {e}")
+                    state = cache.fresh_state(name)
+                    if state is None:
+                        progress["failed"] += 1
+                    elif state == "missing":
+                        progress["missing"] += 1
+                    else:
+                        progress["fetched"] += 1
+                progress["completed"] += 1
+
+        try:
+            pending = iter(await self._prefetch(github_service, names, progress))
+            await asyncio.gather(*(worker() for _ in range(max(1, int(self.settings["concurrency"])))))
+        except asyncio.CancelledError:
+            self._finish(progress, "cancelled")
+            raise
+        except Exception as e:
+            logger.error(f"README 预热失败: {e}")
+            self._finish(progress, "failed")
+            return
+        self._finish(progress, "budget_exhausted" if stop else "done")
+        logger.info(
+            f"README 预热结束（{progress['status']}）: 获取 {progress['fetched']}，无 README {progress['missing']}，"
+            f"跳过 {progress['skipped']}，失败 {progress['failed']}"
+        )
+
+    def get_progress(self) -> dict:
+        """当前（或最近一次）预热的进度"""
+        progress = dict(self._progress)
+        end = progress["finished_at"] or time.time()
+        progress["elapsed_s"] = round(end - progress["started_at"], 2) if progress["started_at"] else None
+        return progress
+
+
+_warmup: Optional[ReadmeWarmup] = None
+_warmup_lock = threading.Lock()
+
+
+def get_readme_warmup() -> ReadmeWarmup:
+    """获取进程内共享的 README 预热任务"""
+    global _warmup
+    with _warmup_lock:
+        if _warmup is None:
+            _warmup = ReadmeWarmup(load_app_config().get("readmeWarmup", {}) or {})
+        return _warmup
@@ -0,0 +1,237 @@
+"""
+项目刷新流程
+
+/api/projects/refresh 与 /api/projects/refresh-ai 共用：
+抓取热门仓库 → 与当前快照按内容指纹比较，未变化的项目沿用上次的派生字段
+（分类、使用步骤、AI 增强内容），只为新增或变化的项目重新生成 / AI 增强 →
+由历史快照计算趋势 → 保存快照并写入本周历史记录 → 在后台预热快照中项目的 README
+（新上榜的优先）。
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from models.schemas import HistoryRecord, ProjectCreate
+from services.ai_limits import AI_LIMIT_DEFAULTS, load_ai_settings
+from services.github import GitHubService
+from services.readme_warmup import get_readme_warmup
+from services.trends import get_trend_engine
+
+logger = logging.getLogger(__name__)
+
+# 写入历史记录的项目字段（指纹等内部字段不进入历史）
+HISTORY_FIELDS = (
+    "name", "full_name", "url", "description", "language", "stars", "forks",
+    "issues", "fork_url", "issues_url", "category", "trend", "usage_steps",
+)
+
+
+def history_record_id(now: datetime) -> str:
+    return f"{now.year}-W{now.isocalendar()[1]}"
+
+
+def build_history_record(projects: List[ProjectCreate], now: Optional[datetime] = None) -> HistoryRecord:
+    """由本次刷新结果生成本周历史记录"""
+    now = now or datetime.now()
+    week_num = now.isocalendar()[1]
+    year = now.year
+    return HistoryRecord(
+        id=history_record_id(now),
+        week=f"{year}年{week_num}月第{week_num}周",
+        date=now.strftime("%Y-%m-%d"),
+        total_projects=len(projects),
+        projects=[p.model_dump(include=set(HISTORY_FIELDS)) for p in projects]
+    )
+
+
+async def refresh_projects(github_service: GitHubService, storage, ai_service=None,
+                           on_enhanced: Optional[Callable[[ProjectCreate, str], None]] = None) -> dict:
+    """执行一次刷新，返回保存的数据和复用 / 重新计算 / AI 增强的项目数
+
+    调用方需保证同一时间只有一次刷新（见 routers/projects.py 的 REFRESH_KEY），否则并发的刷新
+    会基于同一个旧快照计算，后保存的覆盖先保存的（包括 AI 增强内容）。
+
+    on_enhanced(项目, 状态) 在每个项目 AI 增强完成（enhanced）或命中缓存（cached）时立即调用。
+    """
+    # 上一次的 README 预热让出 GitHub 额度，保存新快照后重新开始
+    warmup = get_readme_warmup()
+    warmup.cancel()
+
+    previous = {p.full_name.casefold(): p for p in storage.get_projects()}
+    repos = await github_service.fetch_trending_repositories()
+    logger.info(f"获取到 {len(repos)} 个项目")
+
+    projects = []
+    reused = 0
+    for repo in repos:
+        old = previous.get((repo.get("full_name") or "").casefold())
+        project = github_service.parse_repository(repo, old)
+        if project is None:
+            continue
+        if old is not None and project.fingerprint == old.fingerprint:
+            reused += 1
+        projects.append(project)
+    recomputed = len(projects) - reused
+
+    enhanced = 0
+    ai_timings: List[dict] = []
+    if ai_service is not None:
+        projects, enhanced, ai_timings = await enhance_projects(ai_service, projects, on_enhanced=on_enhanced)
+
+    logger.info(f"复用 {reused} 个项目，重新计算 {recomputed} 个，AI 增强 {enhanced} 个")
+
+    now = datetime.now()
+    trend_engine = get_trend_engine()
+    trend_engine.sync(storage)
+    projects = trend_engine.apply(projects, history_record_id(now), now.strftime("%Y-%m-%d"))
+
+    saved_data = await storage.save_projects_async(projects)
+    record = build_history_record(projects, now)
+    await storage.add_history_record_async(record)
+    trend_engine.observe(record, storage)
+
+    warmup.start(
+        github_service,
+        [p.full_name for p in projects],
+        [p.full_name for p in projects if p.full_name.casefold() not in previous],
+    )
+    return {
+        "projects": projects,
+        "saved": saved_data,
+        "reused": reused,
+        "recomputed": recomputed,
+        "ai_used": ai_service is not None,
+        "ai_enhanced": enhanced,
+        "ai_timings": ai_timings,
+    }
+
+
+async def enhance_projects(ai_service, projects: List[ProjectCreate], settings: Optional[dict] = None,
+                           on_enhanced: Optional[Callable[[ProjectCreate, str], None]] = None
+                           ) -> Tuple[List[ProjectCreate], int, List[dict]]:
+    """并发 AI 增强尚未增强的项目（新增、内容变化或上次增强失败）
+
+    先查 AI 增强缓存，只有未命中的项目调用模型。ai.batchSize > 1 时按 token 预算把多个项目
+    装入一个请求，批量响应中解析失败的项目单独重试。ai.stream 为 true 时流式请求，批内每个项目
+    解析完成即调用 on_enhanced，超时时保留已完成的项目。请求受每次刷新的并发数限制，每个发出的
+    请求（含对冲和故障切换）另占用所发往 provider 的并发 / 每分钟请求数名额（ai_service.limiter）。
+    超时（按批内项目数放大）或总期限到达时保留未增强的数据，新的缓存条目在结束时一次写回。
+    settings 为空时读取配置。
+    返回 (项目, 增强成功数（含缓存命中）, 每个项目的耗时)。
+    """
+    settings = {**AI_LIMIT_DEFAULTS, **settings} if settings else load_ai_settings()
+    semaphore = asyncio.Semaphore(settings["concurrency"])
+    # 单项目模式下失败不重试（无法区分请求失败与解析失败）
+    retries = settings["batchRetries"] if settings["batchSize"] > 1 else 0
+    results = list(projects)
+    timings = {}
+    pending_calls = []
+
+    def publish(project: ProjectCreate, status: str) -> None:
+        if on_enhanced is None:
+            return
+        try:
+            on_enhanced(project, status)
+        except Exception as e:
+            logger.warning(f"AI 增强回调失败: {e}")
+
+    for i, p in enumerate(projects):
+        if p.ai_enhanced:
+            continue
+        cached = ai_service.from_cache(p)
+        if cached is not None:
+            results[i] = cached
+            timings[i] = {"full_name": p.full_name, "status": "cached", "wait_s": 0.0, "elapsed_s": 0.0,
+                          "batch": 0, "attempts": 0}
+            publish(cached, "cached")
+        else:
+            timings[i] = {"full_name": p.full_name, "status": "deadline", "wait_s": None, "elapsed_s": None,
+                          "batch": None, "attempts": 0}
+            pending_calls.append(i)
+
+    async def enhance(batch: List[int]) -> None:
+        """一次请求增强一批项目（batch 为项目下标）"""
+        done: Dict[int, ProjectCreate] = {}
+
+        def complete(i: int, project: ProjectCreate) -> None:
+            done[i] = project
+            logger.info(f"AI 增强项目: {project.full_name}")
+            publish(project, "enhanced")
+
+        async def request() -> bool:
+            """发出请求，完成的项目写入 done；请求本身失败时返回 False"""
+            batch_projects = [projects[i] for i in batch]
+            if settings["stream"]:
+                async for j, project in ai_service.stream_batch(batch_projects):
+                    complete(batch[j], project)
+                return True
+            enhanced = await ai_service.enhance_batch(batch_projects)
+            if enhanced is None:
+                return False
+            for i, project in zip(batch, enhanced):
+                if project is not None:
+                    complete(i, project)
+            return True
+
+        queued = time.monotonic()
+        async with semaphore:
+            started = time.monotonic()
+            for i in batch:
+                timings[i]["wait_s"] = round(started - queued, 3)
+                timings[i]["batch"] = len(batch)
+                timings[i]["attempts"] += 1
+            try:
+                ok = await asyncio.wait_for(request(), settings["projectTimeoutSeconds"] * len(batch))
+            except asyncio.TimeoutError:
+                missing = "timeout"
+                logger.warning(f"AI 增强超时: {', '.join(projects[i].full_name for i in batch if i not in done)}")
+            except Exception as e:
+                missing = "failed"
+                logger.error(f"AI 增强失败: {e}")
+            else:
+                # 批量响应中缺少或不合法的项目可以单独重试
+                missing = "invalid" if ok and len(batch) > 1 else "failed"
+            finally:
+                elapsed = round(time.monotonic() - started, 3)
+                for i in batch:
+                    timings[i]["elapsed_s"] = elapsed
+            for i in batch:
+                if i in done:
+                    results[i] = done[i]
+                    timings[i]["status"] = "enhanced"
+                else:
+                    timings[i]["status"] = missing
+
+    async def run_rounds() -> None:
+        """按批次增强，只重试批量响应中解析失败的项目"""
+        todo = pending_calls
+        for attempt in range(retries + 1):
+            for i in todo:
+                timings[i]["status"] = "deadline"
+            batches = ai_service.plan_batches(
+                [projects[i] for i in todo], settings["batchSize"], settings["batchTokenBudget"]
+            )
+            await asyncio.gather(*(enhance([todo[j] for j in batch]) for batch in batches))
+            todo = [i for i in todo if timings[i]["status"] == "invalid"]
+            if not todo:
+                return
+            if attempt < retries:
+                logger.info(f"重试 {len(todo)} 个解析失败的项目")
+
+    if pending_calls:
+        try:
+            await asyncio.wait_for(run_rounds(), settings["deadlineSeconds"])
+        except asyncio.TimeoutError:
+            unfinished = sum(1 for i in pending_calls if timings[i]["status"] == "deadline")
+            logger.warning(f"AI 增强达到总期限，{unfinished} 个项目未完成，保留原数据")
+        # 本次刷新写入的缓存条目由写线程一次写回
+        try:
+            await asyncio.wrap_future(ai_service.cache.flush_later())
+        except Exception as e:
+            logger.warning(f"AI 增强缓存写回失败: {e}")
+
+    enhanced_count = sum(1 for t in timings.values() if t["status"] in ("enhanced", "cached"))
+    return results, enhanced_count, [timings[i] for i in sorted(timings)]
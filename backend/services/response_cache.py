@@ -0,0 +1,183 @@
+"""
+预序列化响应缓存
+
+每个数据快照版本只序列化一次 JSON，并预先生成 gzip（以及可用时的 brotli）
+压缩版本；响应带强 ETag，客户端携带 If-None-Match 命中时直接返回 304。
+
+筛选 / 分页等参数组合（variant）单独放在一个有界 LRU 中，组合再多也不会把
+常用的完整列表挤出缓存。
+"""
+
+import gzip
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+from fastapi import Request, Response
+from pydantic import BaseModel
+
+try:
+    import brotli
+except ImportError:  # brotli 为可选依赖
+    brotli = None
+
+
+def _serialize(payload: Any) -> bytes:
+    """序列化为紧凑的 UTF-8 JSON"""
+    if isinstance(payload, BaseModel):
+        return payload.model_dump_json().encode("utf-8")
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _accepted_encodings(header: str) -> set:
+    """解析 Accept-Encoding（忽略 q=0 的编码）"""
+    encodings = set()
+    for part in header.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) == 0:
+                    continue
+            except ValueError:
+                pass
+        encodings.add(token)
+    return encodings
+
+
+def _etag_matches(header: str, digest: str) -> bool:
+    """If-None-Match 比较（弱比较：忽略 W/ 前缀和压缩编码后缀）"""
+    if header.strip() == "*":
+        return True
+    for candidate in header.split(","):
+        tag = candidate.strip().removeprefix("W/").strip('"')
+        if tag.split("-", 1)[0] == digest:
+            return True
+    return False
+
+
+class _Entry:
+    """某一版本的预编码响应"""
+
+    __slots__ = ("body", "digest", "variants", "lock")
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self.digest = hashlib.sha256(body).hexdigest()[:32]
+        self.variants = {}
+        self.lock = threading.Lock()
+
+    def etag(self, encoding: Optional[str] = None) -> str:
+        """强 ETag，不同压缩编码的表示使用不同后缀"""
+        return f'"{self.digest}-{encoding}"' if encoding else f'"{self.digest}"'
+
+    def encoded(self, encoding: str) -> bytes:
+        """获取压缩版本（首次使用时生成，之后复用）"""
+        data = self.variants.get(encoding)
+        if data is None:
+            with self.lock:
+                data = self.variants.get(encoding)
+                if data is None:
+                    if encoding == "br":
+                        data = brotli.compress(self.body)
+                    else:
+                        data = gzip.compress(self.body, compresslevel=6)
+                    self.variants[encoding] = data
+        return data
+
+
+class ResponseCache:
+    """按 (key, 版本) 缓存预编码响应（固定的端点与参数组合分开存放）"""
+
+    # 小于该大小的响应不值得压缩
+    MIN_COMPRESS_SIZE = 512
+
+    def __init__(self, max_entries: int = 64, max_variants: int = 256):
+        self.max_entries = max_entries
+        self.max_variants = max_variants
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._variants: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "not_modified": 0}
+
+    def _get_entry(self, key: Hashable, version: Hashable, build: Callable[[], Any], variant: bool) -> _Entry:
+        entries, limit = (self._variants, self.max_variants) if variant else (self._entries, self.max_entries)
+        with self._lock:
+            cached = entries.get(key)
+            if cached is not None and cached[0] == version:
+                entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return cached[1]
+
+        self._stats["misses"] += 1
+        entry = _Entry(_serialize(build()))
+        if version is not None:
+            with self._lock:
+                entries[key] = (version, entry)
+                entries.move_to_end(key)
+                while len(entries) > limit:
+                    entries.popitem(last=False)
+        return entry
+
+    def respond(
+        self,
+        request: Request,
+        key: Hashable,
+        version: Optional[Hashable],
+        build: Callable[[], Any],
+        variant: bool = False,
+    ) -> Response:
+        """返回缓存的响应；version 为 None 时不缓存（每次重新构建）
+
+        筛选 / 分页等参数组合传 variant=True，缓存在单独的 LRU 中。
+        """
+        entry = self._get_entry(key, version, build, variant)
+
+        encoding = None
+        if len(entry.body) >= self.MIN_COMPRESS_SIZE:
+            accepted = _accepted_encodings(request.headers.get("accept-encoding", ""))
+            if brotli is not None and "br" in accepted:
+                encoding = "br"
+            elif "gzip" in accepted:
+                encoding = "gzip"
+
+        headers = {
+            "ETag": entry.etag(encoding),
+            "Vary": "Accept-Encoding",
+            "Cache-Control": "no-cache",
+        }
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and _etag_matches(if_none_match, entry.digest):
+            self._stats["not_modified"] += 1
+            return Response(status_code=304, headers=headers)
+
+        if encoding:
+            headers["Content-Encoding"] = encoding
+            return Response(content=entry.encoded(encoding), media_type="application/json", headers=headers)
+        return Response(content=entry.body, media_type="application/json", headers=headers)
+
+    def get_stats(self) -> dict:
+        """缓存统计"""
+        return {
+            **self._stats,
+            "entries": len(self._entries),
+            "variant_entries": len(self._variants),
+            "brotli": brotli is not None,
+        }
+
+
+_response_cache: Optional[ResponseCache] = None
+
+
+def get_response_cache() -> ResponseCache:
+    """获取进程内共享的响应缓存"""
+    global _response_cache
+    if _response_cache is None:
+        _response_cache = ResponseCache()
+    return _response_cache
@@ -0,0 +1,131 @@
+"""
+进行中请求合并（single-flight）
+
+按 (操作, 参数...) 作为 key，相同 key 的操作同一时间只执行一次：
+- do()：调用方等待共享的执行结果，某个调用方断开（被取消）不影响其他调用方和执行本身
+- start()：后台执行，返回共享的任务 ID，调用方稍后通过 result() 轮询；
+  结果保留 result_ttl 秒，期间可被多个调用方重复读取
+
+用于 README 异步获取（多个客户端同时打开同一项目页面）和项目刷新（并发的刷新请求）。
+"""
+
+import asyncio
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 后台任务结果的保留时间（秒）
+RESULT_TTL = 300
+
+
+class _Flight:
+    __slots__ = ("id", "task", "keep_result")
+
+    def __init__(self, flight_id: str, task: asyncio.Task, keep_result: bool):
+        self.id = flight_id
+        self.task = task
+        self.keep_result = keep_result
+
+
+class SingleFlight:
+    """按 key 合并进行中的异步操作（单事件循环内使用）"""
+
+    def __init__(self, result_ttl: float = RESULT_TTL):
+        self.result_ttl = result_ttl
+        self._flights: Dict[Hashable, _Flight] = {}
+        # 任务 ID -> (过期时间, 结果)，按过期时间排序
+        self._results: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def _count(self, key: Hashable, field: str) -> None:
+        operation = str(key[0] if isinstance(key, tuple) and key else key)
+        stats = self._stats.setdefault(operation, {"calls": 0, "executed": 0, "coalesced": 0})
+        stats[field] += 1
+
+    def _join(self, key: Hashable, fn: Callable[[], Awaitable], keep_result: bool) -> _Flight:
+        """加入进行中的同 key 操作，没有时启动新的"""
+        self._count(key, "calls")
+        flight = self._flights.get(key)
+        # 任务属于已关闭的事件循环（如测试中多次创建客户端）时视为不存在
+        if flight is not None and not flight.task.done() \
+                and flight.task.get_loop() is asyncio.get_running_loop():
+            self._count(key, "coalesced")
+            flight.keep_result = flight.keep_result or keep_result
+            return flight
+
+        self._count(key, "executed")
+        flight = _Flight(uuid.uuid4().hex[:8], asyncio.ensure_future(fn()), keep_result)
+        self._flights[key] = flight
+        flight.task.add_done_callback(lambda task: self._done(key, flight))
+        return flight
+
+    def _done(self, key: Hashable, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        if flight.task.cancelled():
+            return
+        # 取出异常，避免所有调用方都已断开时出现未处理异常告警
+        error = flight.task.exception()
+        if error is not None:
+            logger.debug(f"合并的操作执行失败 [{flight.id}]: {error}")
+        elif flight.keep_result:
+            self._prune()
+            self._results[flight.id] = (time.monotonic() + self.result_ttl, flight.task.result())
+
+    def _prune(self) -> None:
+        now = time.monotonic()
+        while self._results:
+            flight_id, (expires_at, _) = next(iter(self._results.items()))
+            if expires_at > now:
+                break
+            del self._results[flight_id]
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable]) -> Any:
+        """执行 fn（相同 key 正在执行时等待同一结果）"""
+        flight = self._join(key, fn, keep_result=False)
+        return await asyncio.shield(flight.task)
+
+    def start(self, key: Hashable, fn: Callable[[], Awaitable]) -> str:
+        """在后台执行 fn（相同 key 正在执行时复用），返回任务 ID"""
+        return self._join(key, fn, keep_result=True).id
+
+    def result(self, flight_id: str) -> Tuple[str, Any]:
+        """后台任务状态：("done", 结果) / ("pending", None) / ("unknown", None)（不存在或已过期）"""
+        self._prune()
+        if flight_id in self._results:
+            return "done", self._results[flight_id][1]
+        if any(flight.id == flight_id for flight in self._flights.values()):
+            return "pending", None
+        return "unknown", None
+
+    def get_stats(self) -> dict:
+        """各操作的调用、实际执行和合并次数"""
+        self._prune()
+        calls = sum(s["calls"] for s in self._stats.values())
+        coalesced = sum(s["coalesced"] for s in self._stats.values())
+        return {
+            "in_flight": len(self._flights),
+            "stored_results": len(self._results),
+            "calls": calls,
+            "coalesced": coalesced,
+            "coalesce_rate": round(coalesced / calls, 3) if calls else 0.0,
+            "operations": {name: dict(stats) for name, stats in self._stats.items()},
+        }
+
+
+_singleflight: Optional[SingleFlight] = None
+_singleflight_lock = threading.Lock()
+
+
+def get_singleflight() -> SingleFlight:
+    """获取进程内共享的请求合并器"""
+    global _singleflight
+    with _singleflight_lock:
+        if _singleflight is None:
+            _singleflight = SingleFlight()
+        return _singleflight
@@ -0,0 +1,491 @@
+"""
+SQLite 数据存储引擎
+
+与 StorageService 提供相同的公开方法，数据保存在 WAL 模式的 SQLite 数据库中：
+项目、快照（每周历史记录）和快照成员分别存放在带索引的表里，写入为增量更新，
+历史记录不再受 12 周上限约束。
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from itertools import chain, groupby
+from typing import Iterator, List, Optional, Tuple
+from models.schemas import HistoryRecord
+from services.history_codec import ProjectDictionary, decode_stats, encode_stats
+from services.storage import StorageService
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+
+CREATE TABLE IF NOT EXISTS projects (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    full_name TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    url TEXT NOT NULL,
+    description TEXT,
+    language TEXT,
+    stars INTEGER NOT NULL DEFAULT 0,
+    forks INTEGER NOT NULL DEFAULT 0,
+    issues INTEGER NOT NULL DEFAULT 0,
+    fork_url TEXT,
+    issues_url TEXT,
+    category TEXT,
+    trend TEXT NOT NULL DEFAULT 'stable',
+    usage_steps TEXT NOT NULL DEFAULT '[]',
+    topics TEXT NOT NULL DEFAULT '[]',
+    fingerprint TEXT,
+    ai_enhanced INTEGER NOT NULL DEFAULT 0,
+    stars_delta_7d INTEGER,
+    stars_delta_30d INTEGER,
+    forks_delta_7d INTEGER,
+    current_rank INTEGER,
+    updated_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_projects_name ON projects(name);
+CREATE INDEX IF NOT EXISTS idx_projects_current_rank ON projects(current_rank);
+CREATE INDEX IF NOT EXISTS idx_projects_language ON projects(language);
+
+CREATE TABLE IF NOT EXISTS snapshots (
+    id TEXT PRIMARY KEY,
+    week TEXT NOT NULL,
+    date TEXT NOT NULL,
+    total_projects INTEGER NOT NULL DEFAULT 0,
+    seq INTEGER NOT NULL,
+    stats TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_snapshots_seq ON snapshots(seq);
+
+CREATE TABLE IF NOT EXISTS project_meta (
+    id INTEGER PRIMARY KEY,
+    full_name TEXT,
+    version INTEGER NOT NULL DEFAULT 1,
+    digest TEXT NOT NULL UNIQUE,
+    meta TEXT NOT NULL
+);
+"""
+
+SNAPSHOT_PROJECTS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshot_projects (
+    snapshot_id TEXT NOT NULL REFERENCES snapshots(id) ON DELETE CASCADE,
+    rank INTEGER NOT NULL,
+    project_id INTEGER REFERENCES projects(id),
+    meta_id INTEGER REFERENCES project_meta(id),
+    stars INTEGER,
+    forks INTEGER,
+    issues INTEGER,
+    trend TEXT,
+    label TEXT,
+    PRIMARY KEY (snapshot_id, rank)
+);
+CREATE INDEX IF NOT EXISTS idx_snapshot_projects_project ON snapshot_projects(project_id);
+"""
+
+SCHEMA += SNAPSHOT_PROJECTS_SCHEMA
+
+# snapshot_projects 中每周变化的列，对应 history_codec 中的一行
+ROW_COLUMNS = "meta_id, stars, forks, issues, trend, label"
+
+PROJECT_COLUMNS = (
+    "name", "full_name", "url", "description", "language", "stars", "forks",
+    "issues", "fork_url", "issues_url", "category", "trend", "usage_steps",
+    "topics", "fingerprint", "ai_enhanced", "stars_delta_7d", "stars_delta_30d", "forks_delta_7d",
+)
+
+# 旧版 projects 表缺少的列
+PROJECT_COLUMN_MIGRATIONS = (
+    ("topics", "TEXT NOT NULL DEFAULT '[]'"),
+    ("fingerprint", "TEXT"),
+    ("ai_enhanced", "INTEGER NOT NULL DEFAULT 0"),
+    ("stars_delta_7d", "INTEGER"),
+    ("stars_delta_30d", "INTEGER"),
+    ("forks_delta_7d", "INTEGER"),
+)
+
+
+class SQLiteStorageService(StorageService):
+    """SQLite 数据存储服务"""
+
+    def __init__(self, db_path: str = "./data/trending.db"):
+        super().__init__(os.path.dirname(db_path) or ".")
+        self.db_path = db_path
+        self._local = threading.local()
+        with self._transaction() as conn:
+            conn.executescript(SCHEMA)
+            self._migrate_schema(conn)
+
+    def _migrate_schema(self, conn: sqlite3.Connection) -> None:
+        """升级旧版数据库"""
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(snapshots)")}
+        if "stats" not in columns:
+            conn.execute("ALTER TABLE snapshots ADD COLUMN stats TEXT")
+
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(projects)")}
+        for column, definition in PROJECT_COLUMN_MIGRATIONS:
+            if column not in columns:
+                conn.execute(f"ALTER TABLE projects ADD COLUMN {column} {definition}")
+
+        # 旧版 snapshot_projects 每行保存完整项目 JSON，转换为去重后的行
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(snapshot_projects)")}
+        if "data" in columns:
+            # DDL 不会自动开启事务，显式开启以保证整个转换原子完成
+            conn.execute("BEGIN")
+            conn.execute("ALTER TABLE snapshot_projects RENAME TO snapshot_projects_legacy")
+            conn.execute("DROP INDEX IF EXISTS idx_snapshot_projects_project")
+            for statement in SNAPSHOT_PROJECTS_SCHEMA.split(";"):
+                if statement.strip():
+                    conn.execute(statement)
+            rows = conn.execute(
+                "SELECT snapshot_id, rank, project_id, data FROM snapshot_projects_legacy"
+            ).fetchall()
+            encoded = self._intern_projects(conn, [json.loads(row["data"]) for row in rows])
+            for row, values in zip(rows, encoded):
+                conn.execute(
+                    f"INSERT INTO snapshot_projects(snapshot_id, rank, project_id, {ROW_COLUMNS}) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (row["snapshot_id"], row["rank"], row["project_id"], *self._row_values(values))
+                )
+            conn.execute("DROP TABLE snapshot_projects_legacy")
+            logger.info(f"已将 {len(rows)} 行历史项目转换为去重格式")
+
+    # ==================== 连接管理 ====================
+
+    def _connect(self) -> sqlite3.Connection:
+        """每个线程一个连接（WAL 模式下读写互不阻塞）"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30.0)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    def _transaction(self) -> sqlite3.Connection:
+        """返回可用作事务上下文的连接（with 块结束时提交，异常时回滚）"""
+        return self._connect()
+
+    @contextmanager
+    def _read_snapshot(self):
+        """读事务：同一快照内的多条查询看到一致的数据"""
+        conn = self._connect()
+        if conn.in_transaction:
+            yield conn
+            return
+        conn.execute("BEGIN")
+        try:
+            yield conn
+        finally:
+            conn.execute("COMMIT")
+
+    def _bump_revision(self, conn: sqlite3.Connection, key: str) -> None:
+        """写入后递增数据版本号，使内存快照失效"""
+        conn.execute(
+            "INSERT INTO meta(key, value) VALUES (?, '1') "
+            "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1",
+            (key,)
+        )
+
+    def _get_meta(self, key: str) -> Optional[str]:
+        row = self._connect().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row["value"] if row else None
+
+    def _set_meta(self, conn: sqlite3.Connection, key: str, value: str) -> None:
+        conn.execute(
+            "INSERT INTO meta(key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, value)
+        )
+
+    # ==================== 项目 ====================
+
+    def _upsert_project(self, conn: sqlite3.Connection, item: dict, rank: Optional[int]) -> int:
+        """插入或更新项目，返回项目 id"""
+        values = {col: item.get(col) for col in PROJECT_COLUMNS}
+        values["usage_steps"] = json.dumps(item.get("usage_steps") or [], ensure_ascii=False)
+        values["topics"] = json.dumps(item.get("topics") or [], ensure_ascii=False)
+        values["ai_enhanced"] = int(bool(item.get("ai_enhanced")))
+        values["trend"] = values["trend"] or "stable"
+        for col in ("stars", "forks", "issues"):
+            values[col] = values[col] or 0
+        values["current_rank"] = rank
+        values["updated_at"] = datetime.utcnow().isoformat()
+
+        columns = list(values.keys())
+        updates = ", ".join(f"{col} = excluded.{col}" for col in columns if col != "full_name")
+        row = conn.execute(
+            f"INSERT INTO projects({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)}) "
+            f"ON CONFLICT(full_name) DO UPDATE SET {updates} RETURNING id",
+            [values[col] for col in columns]
+        ).fetchone()
+        return row["id"]
+
+    def _write_projects(self, data: dict) -> dict:
+        """增量更新当前项目列表（在写线程中执行）"""
+        with self._transaction() as conn:
+            conn.execute("UPDATE projects SET current_rank = NULL WHERE current_rank IS NOT NULL")
+            for rank, item in enumerate(data["projects"]):
+                self._upsert_project(conn, item, rank)
+            self._set_meta(conn, "last_updated", data["last_updated"])
+            self._set_meta(conn, "projects_stats", json.dumps(data["stats"], ensure_ascii=False))
+            self._bump_revision(conn, "projects_revision")
+
+        self._projects_snapshot = self._make_projects_snapshot(self._projects_signature(), data)
+        return data
+
+    def _projects_signature(self):
+        revision = self._get_meta("projects_revision")
+        return int(revision) if revision is not None else None
+
+    def _read_projects_data(self) -> dict:
+        with self._read_snapshot() as conn:
+            rows = conn.execute(
+                f"SELECT {', '.join(PROJECT_COLUMNS)} FROM projects "
+                "WHERE current_rank IS NOT NULL ORDER BY current_rank"
+            ).fetchall()
+            last_updated = self._get_meta("last_updated")
+            stats = self._get_meta("projects_stats")
+        projects = []
+        for row in rows:
+            item = dict(row)
+            item["usage_steps"] = json.loads(item["usage_steps"] or "[]")
+            item["topics"] = json.loads(item["topics"] or "[]")
+            item["ai_enhanced"] = bool(item["ai_enhanced"])
+            projects.append(item)
+        return {
+            "last_updated": last_updated,
+            "projects": projects,
+            "total_projects": len(projects),
+            "stats": json.loads(stats) if stats else None
+        }
+
+    # ==================== 项目字典 ====================
+
+    def _load_dictionary(self) -> ProjectDictionary:
+        rows = self._connect().execute(
+            "SELECT id, full_name, version, meta FROM project_meta ORDER BY id"
+        ).fetchall()
+        return ProjectDictionary(
+            {"id": r["id"], "full_name": r["full_name"], "version": r["version"], "meta": json.loads(r["meta"])}
+            for r in rows
+        )
+
+    def _intern_projects(self, conn: sqlite3.Connection, projects: list) -> list:
+        """在当前事务中编码项目列表并写入新的字典条目
+
+        新条目会立即加入内存字典，事务回滚时调用方需丢弃内存字典（见 _history_transaction）。
+        """
+        dictionary = self._get_dictionary()
+        pending = {}
+        encoded = dictionary.encode_projects(projects, pending)
+        for digest, entry in pending.items():
+            conn.execute(
+                "INSERT INTO project_meta(id, full_name, version, digest, meta) VALUES (?, ?, ?, ?, ?)",
+                (entry["id"], entry["full_name"], entry["version"], digest,
+                 json.dumps(entry["meta"], ensure_ascii=False))
+            )
+        dictionary.commit(pending)
+        return encoded
+
+    @contextmanager
+    def _history_transaction(self):
+        """历史写入事务，失败时丢弃可能包含未提交条目的内存字典"""
+        try:
+            with self._transaction() as conn:
+                yield conn
+        except BaseException:
+            self._dictionary = None
+            raise
+
+    @staticmethod
+    def _row_values(encoded) -> tuple:
+        """编码后的行 -> (meta_id, stars, forks, issues, trend, label)"""
+        if isinstance(encoded, str):
+            return (None, None, None, None, None, encoded)
+        return (*encoded, None)
+
+    @staticmethod
+    def _decode_row_values(row: sqlite3.Row):
+        """(meta_id, stars, forks, issues, trend, label) -> 编码后的行"""
+        if row["meta_id"] is None:
+            return row["label"] or ""
+        return [row["meta_id"], row["stars"], row["forks"], row["issues"], row["trend"]]
+
+    def _decode_rows(self, rows: list) -> list:
+        encoded = [self._decode_row_values(row) for row in rows]
+        try:
+            return self._get_dictionary().decode_projects(encoded)
+        except KeyError:
+            return self._get_dictionary(reload=True).decode_projects(encoded)
+
+    # ==================== 历史记录 ====================
+
+    def _insert_snapshot(self, conn: sqlite3.Connection, record: HistoryRecord, seq: int) -> None:
+        """写入一周的快照及其成员"""
+        conn.execute("DELETE FROM snapshots WHERE id = ?", (record.id,))
+        conn.execute(
+            "INSERT INTO snapshots(id, week, date, total_projects, seq, stats) VALUES (?, ?, ?, ?, ?, ?)",
+            (record.id, record.week, record.date, record.total_projects, seq,
+             json.dumps(encode_stats(record.stats, record.projects), ensure_ascii=False)
+             if record.stats is not None else None)
+        )
+        encoded = self._intern_projects(conn, record.projects)
+        for rank, item in enumerate(record.projects):
+            project_id = None
+            if isinstance(item, dict) and item.get("full_name"):
+                row = conn.execute(
+                    "SELECT id FROM projects WHERE full_name = ?", (item["full_name"],)
+                ).fetchone()
+                if row:
+                    project_id = row["id"]
+                elif item.get("url"):
+                    project_id = self._upsert_project(conn, item, None)
+            conn.execute(
+                f"INSERT INTO snapshot_projects(snapshot_id, rank, project_id, {ROW_COLUMNS}) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (record.id, rank, project_id, *self._row_values(encoded[rank]))
+            )
+
+    def _write_history(self, records: List[HistoryRecord]) -> None:
+        """整体替换历史记录（records 最新在前）"""
+        with self._history_transaction() as conn:
+            conn.execute("DELETE FROM snapshots")
+            for seq, record in enumerate(reversed(records), start=1):
+                self._insert_snapshot(conn, record, seq)
+            # 整体替换后清理不再被引用的字典条目
+            conn.execute(
+                "DELETE FROM project_meta WHERE id NOT IN "
+                "(SELECT meta_id FROM snapshot_projects WHERE meta_id IS NOT NULL)"
+            )
+            self._bump_revision(conn, "history_revision")
+        self._get_dictionary().retain(
+            row["id"] for row in self._connect().execute("SELECT id FROM project_meta")
+        )
+
+    def _add_history(self, record: HistoryRecord) -> None:
+        """添加历史记录（同一周的记录会被替换并移到最前）"""
+        with self._history_transaction() as conn:
+            row = conn.execute("SELECT COALESCE(MAX(seq), 0) AS seq FROM snapshots").fetchone()
+            self._insert_snapshot(conn, record, row["seq"] + 1)
+            self._bump_revision(conn, "history_revision")
+
+    def _delete_history(self, record_id: str) -> bool:
+        """删除指定历史记录"""
+        with self._transaction() as conn:
+            cursor = conn.execute("DELETE FROM snapshots WHERE id = ?", (record_id,))
+            if cursor.rowcount == 0:
+                return False
+            self._bump_revision(conn, "history_revision")
+        return True
+
+    def _history_signature(self):
+        revision = self._get_meta("history_revision")
+        return int(revision) if revision is not None else None
+
+    def _make_record(self, row: sqlite3.Row, members: list) -> HistoryRecord:
+        """由 snapshots 行和成员行还原历史记录"""
+        projects = self._decode_rows(members)
+        return HistoryRecord(
+            id=row["id"],
+            week=row["week"],
+            date=row["date"],
+            total_projects=row["total_projects"],
+            projects=projects,
+            stats=decode_stats(json.loads(row["stats"]), projects) if row["stats"] else None
+        )
+
+    def _read_history_records(self, limit: Optional[int] = None, offset: int = 0) -> List[HistoryRecord]:
+        page = (-1 if limit is None else limit, offset)
+        with self._read_snapshot() as conn:
+            snapshots = conn.execute(
+                "SELECT id, week, date, total_projects, stats FROM snapshots "
+                "ORDER BY seq DESC LIMIT ? OFFSET ?",
+                page
+            ).fetchall()
+            members = {}
+            for row in conn.execute(
+                f"SELECT snapshot_id, {ROW_COLUMNS} FROM snapshot_projects "
+                "WHERE snapshot_id IN (SELECT id FROM snapshots ORDER BY seq DESC LIMIT ? OFFSET ?) "
+                "ORDER BY snapshot_id, rank",
+                page
+            ):
+                members.setdefault(row["snapshot_id"], []).append(row)
+        return [self._make_record(row, members.get(row["id"], [])) for row in snapshots]
+
+    def iter_history(self) -> Iterator[HistoryRecord]:
+        """逐周流式读取历史记录（游标迭代，最新在前）
+
+        使用独立连接：流式响应的迭代可能在不同线程中推进，不能复用线程本地连接。
+        """
+        conn = sqlite3.connect(self.db_path, timeout=30.0, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute("BEGIN")
+            rows = conn.execute(
+                "SELECT s.id, s.week, s.date, s.total_projects, s.stats, sp.rank, "
+                "sp.meta_id, sp.stars, sp.forks, sp.issues, sp.trend, sp.label "
+                "FROM snapshots s LEFT JOIN snapshot_projects sp ON sp.snapshot_id = s.id "
+                "ORDER BY s.seq DESC, sp.rank"
+            )
+            for _, group in groupby(rows, key=lambda row: row["id"]):
+                first = next(group)
+                members = [row for row in chain((first,), group) if row["rank"] is not None]
+                yield self._with_stats(self._make_record(first, members))
+        finally:
+            conn.close()
+
+    def query_history(self, offset: int = 0, limit: Optional[int] = None) -> Tuple[List[HistoryRecord], int]:
+        """按周分页（直接在数据库中分页，不加载全部历史）"""
+        total = self._connect().execute("SELECT COUNT(*) AS n FROM snapshots").fetchone()["n"]
+        records = [self._with_stats(r) for r in self._read_history_records(limit, offset)]
+        return records, total
+
+    # ==================== 导入 ====================
+
+    def import_from_json(self, data_dir: str) -> int:
+        """从现有 JSON 文件一次性导入项目与历史记录，返回导入的历史记录数"""
+        return self._writer.run(lambda: self._import_from_json(data_dir))
+
+    def _import_from_json(self, data_dir: str) -> int:
+        source = StorageService(data_dir)
+
+        if os.path.exists(source.projects_file):
+            data = source.load_projects()
+            projects = source.get_projects()
+            self.save_projects(projects)
+            last_updated = data.get("last_updated") or data.get("lastUpdated")
+            if last_updated:
+                with self._transaction() as conn:
+                    self._set_meta(conn, "last_updated", last_updated)
+                    self._bump_revision(conn, "projects_revision")
+            logger.info(f"导入 {len(projects)} 个项目")
+
+        # 导入源目录中的全部历史（SQLite 不按周数裁剪），不改写源目录
+        history = source.read_all_history()
+        if history:
+            self.save_history(history)
+            logger.info(f"导入 {len(history)} 条历史记录")
+        return len(history)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="将 JSON 数据导入 SQLite 存储")
+    parser.add_argument("--data-dir", default="./data", help="JSON 数据目录")
+    parser.add_argument("--db", default="./data/trending.db", help="SQLite 数据库路径")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    count = SQLiteStorageService(args.db).import_from_json(args.data_dir)
+    print(f"导入完成: {count} 条历史记录 -> {args.db}")
@@ -0,0 +1,81 @@
+"""
+统计物化服务
+
+在保存快照时一次性计算聚合统计（语言/分类分布、stars/forks 总数、
+Top-N 列表、stars 分位数），随快照一起存储，读取时直接返回。
+"""
+
+from typing import Iterable, List
+
+TOP_N = 5
+PERCENTILES = (50, 75, 90, 99)
+
+
+def _percentile(sorted_values: List[int], pct: float) -> int:
+    """最近秩法分位数（sorted_values 升序）"""
+    if not sorted_values:
+        return 0
+    rank = max(1, -(-len(sorted_values) * pct // 100))  # ceil
+    return sorted_values[int(rank) - 1]
+
+
+def project_brief(project: dict) -> dict:
+    """Top-N 列表中的项目摘要"""
+    return {
+        "name": project.get("name"),
+        "full_name": project.get("full_name") or project.get("name"),
+        "stars": project.get("stars", 0) or 0,
+        "forks": project.get("forks", 0) or 0,
+        "language": project.get("language"),
+        "category": project.get("category"),
+        "trend": project.get("trend"),
+        "description": project.get("description"),
+    }
+
+
+def compute_stats(projects: Iterable, top_n: int = TOP_N) -> dict:
+    """计算一组项目的聚合统计
+
+    projects 中的元素可以是项目字典，也可以是旧版历史记录里的项目名字符串。
+    """
+    items = [p if isinstance(p, dict) else {"name": str(p)} for p in projects]
+
+    languages = {}
+    categories = {}
+    by_language = {}
+    by_category = {}
+    total_stars = 0
+    total_forks = 0
+
+    ranked = sorted(items, key=lambda p: p.get("stars", 0) or 0, reverse=True)
+    for p in ranked:
+        lang = p.get("language") or "Unknown"
+        category = p.get("category") or "Other"
+        languages[lang] = languages.get(lang, 0) + 1
+        categories[category] = categories.get(category, 0) + 1
+        total_stars += p.get("stars", 0) or 0
+        total_forks += p.get("forks", 0) or 0
+
+        top = by_language.setdefault(lang, [])
+        if len(top) < top_n:
+            top.append(project_brief(p))
+        top = by_category.setdefault(category, [])
+        if len(top) < top_n:
+            top.append(project_brief(p))
+
+    stars = sorted(p.get("stars", 0) or 0 for p in items)
+    percentiles = {f"p{pct}": _percentile(stars, pct) for pct in PERCENTILES}
+    percentiles["min"] = stars[0] if stars else 0
+    percentiles["max"] = stars[-1] if stars else 0
+
+    return {
+        "total_projects": len(items),
+        "total_stars": total_stars,
+        "total_forks": total_forks,
+        "language_distribution": languages,
+        "category_distribution": categories,
+        "stars_percentiles": percentiles,
+        "top_projects": [project_brief(p) for p in ranked[:top_n]],
+        "top_by_language": by_language,
+        "top_by_category": by_category,
+    }
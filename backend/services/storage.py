@@ -2,97 +2,615 @@
 数据存储服务
 """
 
+import asyncio
 import json
+import logging
 import os
+import threading
 from datetime import datetime
-from typing import List, Optional
+from itertools import islice
+from typing import Any, Callable, Hashable, Iterator, List, Optional, Tuple
 from models.schemas import ProjectCreate, HistoryRecord
+from services.config_loader import load_app_config
+from services.history_codec import ProjectDictionary, decode_stats, encode_stats
+from services.stats import compute_stats
+from services.writer import atomic_write_json, get_writer
+
+logger = logging.getLogger(__name__)
+
+# 支持筛选的字段与排序字段
+FILTER_FIELDS = ("language", "category", "trend")
+SORT_KEYS = ("rank", "stars", "forks", "issues", "name")
+MAX_VIEWS_PER_SNAPSHOT = 256
 
 
 class StorageService:
-    """数据存储服务"""
+    """数据存储服务
+
+    解析后的项目与历史记录会缓存在内存快照中，只有当文件的 mtime 或大小
+    发生变化（或本进程自己写入）时才重新加载。
+
+    所有写入都经由共享的单写线程串行执行并原子替换文件，写完后发布新的
+    不可变快照，读者直接替换引用，无需加锁。同步写方法等待写线程完成；
+    事件循环中的调用方使用对应的 *_async 方法，等待期间不阻塞事件循环。
+    """
 
-    def __init__(self, data_dir: str = "./data"):
+    def __init__(self, data_dir: str = "./data", max_history: int = 12):
         self.data_dir = data_dir
         self.projects_file = os.path.join(data_dir, "projects.json")
+        # history.json 为旧版格式，首次读取时迁移到 history.jsonl 追加日志
         self.history_file = os.path.join(data_dir, "history.json")
+        self.history_log = os.path.join(data_dir, "history.jsonl")
+        # 历史记录引用的共享项目元数据字典
+        self.project_dict_file = os.path.join(data_dir, "project_dict.jsonl")
+        self.max_history = max_history
+        self.history_compact_min_bytes = 256 * 1024
         self._ensure_data_dir()
 
+        self._writer = get_writer()
+        self._history_lock = threading.RLock()
+        self._history_compacting = False
+        self._history_log_compacted_size = 0
+        self._history_migrated = False
+        self._dictionary: Optional[ProjectDictionary] = None
+
+        # 内存快照: {"signature": (mtime_ns, size), ...}
+        self._projects_snapshot: Optional[dict] = None
+        self._history_snapshot: Optional[dict] = None
+        self._cache_stats = {
+            "projects": {"hits": 0, "misses": 0},
+            "history": {"hits": 0, "misses": 0},
+        }
+
     def _ensure_data_dir(self):
         """确保数据目录存在"""
         if not os.path.exists(self.data_dir):
             os.makedirs(self.data_dir, exist_ok=True)
 
-    def save_projects(self, projects: List[ProjectCreate]) -> dict:
-        """保存项目数据"""
-        data = {
+    @staticmethod
+    def _file_signature(path: str) -> Optional[Tuple[int, int]]:
+        """文件签名 (mtime_ns, size)，文件不存在时返回 None"""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _write_key(self, kind: str) -> tuple:
+        """写任务合并用的 key（同一存储实例、同一类数据）"""
+        return (kind, id(self))
+
+    async def _run_async(self, fn: Callable[[], Any], key: Optional[Hashable] = None) -> Any:
+        """在事件循环中提交写任务并等待完成（不阻塞事件循环）"""
+        return await asyncio.wrap_future(self._writer.submit(fn, key))
+
+    @staticmethod
+    def _make_projects_data(projects: List[ProjectCreate]) -> dict:
+        items = [p.model_dump() for p in projects]
+        return {
             "last_updated": datetime.utcnow().isoformat(),
-            "projects": [p.model_dump() for p in projects],
-            "total_projects": len(projects)
+            "projects": items,
+            "total_projects": len(projects),
+            "stats": compute_stats(items)
         }
 
-        with open(self.projects_file, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+    def save_projects(self, projects: List[ProjectCreate]) -> dict:
+        """保存项目数据，返回实际写入的数据（连续保存会合并为最后一次）"""
+        data = self._make_projects_data(projects)
+        return self._writer.run(lambda: self._write_projects(data), key=self._write_key("projects"))
 
+    async def save_projects_async(self, projects: List[ProjectCreate]) -> dict:
+        """save_projects 的异步版本"""
+        data = self._make_projects_data(projects)
+        return await self._run_async(lambda: self._write_projects(data), key=self._write_key("projects"))
+
+    def _write_projects(self, data: dict) -> dict:
+        """写入项目数据并发布新快照（在写线程中执行）"""
+        atomic_write_json(self.projects_file, data)
+        self._projects_snapshot = self._make_projects_snapshot(
+            self._file_signature(self.projects_file), data
+        )
         return data
 
-    def load_projects(self) -> dict:
-        """加载项目数据"""
-        if not os.path.exists(self.projects_file):
-            return self._get_default_data()
+    @staticmethod
+    def _build_project_index(projects: List[ProjectCreate]) -> dict:
+        """构建 name / full_name（及大小写不敏感形式）到项目的索引
+
+        短名称可能对应多个仓库，按 stars 降序、full_name 升序取第一个，保证结果确定。
+        """
+        index = {"full_name": {}, "name": {}, "full_name_ci": {}, "name_ci": {}}
+        ranked = sorted(projects, key=lambda p: (-p.stars, p.full_name.casefold(), p.full_name))
+        for p in ranked:
+            index["full_name"].setdefault(p.full_name, p)
+            index["name"].setdefault(p.name, p)
+            index["full_name_ci"].setdefault(p.full_name.casefold(), p)
+            index["name_ci"].setdefault(p.name.casefold(), p)
+
+        # 二级索引：筛选字段值（大小写不敏感）-> 项目位置列表（按存储顺序）
+        for field in FILTER_FIELDS:
+            postings = {}
+            for pos, p in enumerate(projects):
+                postings.setdefault((getattr(p, field) or "").casefold(), []).append(pos)
+            index[field] = {value: tuple(positions) for value, positions in postings.items()}
+        return index
+
+    def _make_projects_snapshot(self, signature: Optional[Tuple[int, int]], data: dict) -> dict:
+        """由原始数据构建项目快照（解析模型、建立索引、物化统计）"""
+        projects = tuple(ProjectCreate(**item) for item in data.get("projects", []))
+        return {
+            "signature": signature,
+            "data": data,
+            "projects": projects,
+            "index": self._build_project_index(projects),
+            # 旧数据没有预先计算的统计时，每个快照只补算一次
+            "stats": data.get("stats") or compute_stats(data.get("projects", [])),
+            # 按 (筛选条件, 排序) 缓存的结果位置列表，随快照一起失效
+            "views": {},
+        }
+
+    def _projects_signature(self):
+        """项目数据版本签名，签名不变则快照有效（None 表示无数据）"""
+        return self._file_signature(self.projects_file)
+
+    def _read_projects_data(self) -> dict:
+        """从存储读取原始项目数据"""
+        with open(self.projects_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _get_projects_snapshot(self) -> dict:
+        """获取项目快照，数据未变化时直接命中缓存"""
+        signature = self._projects_signature()
+        snapshot = self._projects_snapshot
+        if snapshot is not None and signature is not None and snapshot["signature"] == signature:
+            self._cache_stats["projects"]["hits"] += 1
+            return snapshot
+
+        self._cache_stats["projects"]["misses"] += 1
+        if signature is None:
+            return self._make_projects_snapshot(None, self._get_default_data())
 
         try:
-            with open(self.projects_file, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            return data
+            data = self._read_projects_data()
         except Exception as e:
-            print(f"Error loading projects: {e}")
-            return self._get_default_data()
+            logger.error(f"Error loading projects: {e}")
+            # 读取失败不写入缓存，下次重新尝试
+            return self._make_projects_snapshot(None, self._get_default_data())
+
+        snapshot = self._make_projects_snapshot(signature, data)
+        self._projects_snapshot = snapshot
+        return snapshot
+
+    def load_projects(self) -> dict:
+        """加载项目数据（返回缓存对象，调用方不应修改）"""
+        return self._get_projects_snapshot()["data"]
 
     def get_projects(self) -> List[ProjectCreate]:
         """获取项目列表"""
-        data = self.load_projects()
-        projects = []
-        for item in data.get("projects", []):
-            projects.append(ProjectCreate(**item))
-        return projects
+        return list(self._get_projects_snapshot()["projects"])
 
-    def save_history(self, records: List[HistoryRecord]) -> None:
-        """保存历史记录"""
-        data = {"history": [r.model_dump() for r in records]}
+    def get_projects_version(self):
+        """当前项目快照版本（响应缓存用，None 表示无数据不可缓存）"""
+        return self._get_projects_snapshot()["signature"]
 
-        with open(self.history_file, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+    def get_history_version(self):
+        """当前历史记录快照版本"""
+        return self._get_history_snapshot()["signature"]
 
-    def load_history(self) -> List[HistoryRecord]:
-        """加载历史记录"""
-        if not os.path.exists(self.history_file):
-            return []
+    def get_stats(self) -> dict:
+        """获取当前快照的物化统计"""
+        return self._get_projects_snapshot()["stats"]
+
+    def _get_view(self, snapshot: dict, filters: dict, min_stars: Optional[int],
+                  sort: str, order: str) -> tuple:
+        """获取筛选 + 排序后的项目位置列表（每个快照、每种条件只计算一次）"""
+        key = (tuple(sorted((f, v.casefold()) for f, v in filters.items())), min_stars, sort, order)
+        view = snapshot["views"].get(key)
+        if view is not None:
+            return view
+
+        projects = snapshot["projects"]
+        index = snapshot["index"]
+
+        # 从最短的倒排列表开始求交集
+        postings = [index[field].get(value.casefold(), ()) for field, value in filters.items()]
+        if postings:
+            postings.sort(key=len)
+            positions = list(postings[0])
+            for other in postings[1:]:
+                other_set = set(other)
+                positions = [pos for pos in positions if pos in other_set]
+        else:
+            positions = list(range(len(projects)))
+
+        if min_stars is not None:
+            positions = [pos for pos in positions if projects[pos].stars >= min_stars]
+
+        if sort != "rank":
+            if sort == "name":
+                sort_key = lambda pos: projects[pos].full_name.casefold()
+            else:
+                sort_key = lambda pos: getattr(projects[pos], sort)
+            positions.sort(key=sort_key, reverse=(order == "desc"))
+        elif order == "desc":
+            positions.reverse()
+
+        view = tuple(positions)
+        if len(snapshot["views"]) >= MAX_VIEWS_PER_SNAPSHOT:
+            snapshot["views"].clear()
+        snapshot["views"][key] = view
+        return view
+
+    def query_projects(
+        self,
+        language: Optional[str] = None,
+        category: Optional[str] = None,
+        trend: Optional[str] = None,
+        min_stars: Optional[int] = None,
+        sort: str = "rank",
+        order: str = "asc",
+        offset: int = 0,
+        limit: Optional[int] = None,
+    ) -> Tuple[List[ProjectCreate], int]:
+        """筛选、排序并分页，返回 (当前页项目, 匹配总数)
+
+        sort 可选 rank（存储顺序）/ stars / forks / issues / name。
+        """
+        if sort not in SORT_KEYS:
+            raise ValueError(f"不支持的排序字段: {sort}")
+        snapshot = self._get_projects_snapshot()
+        filters = {
+            field: value
+            for field, value in (("language", language), ("category", category), ("trend", trend))
+            if value
+        }
+        view = self._get_view(snapshot, filters, min_stars, sort, order)
+        end = len(view) if limit is None else offset + limit
+        projects = snapshot["projects"]
+        return [projects[pos] for pos in view[offset:end]], len(view)
+
+    def find_project(self, project_name: str) -> Optional[ProjectCreate]:
+        """按 full_name 或 name 查找项目（精确匹配优先，其次大小写不敏感）"""
+        index = self._get_projects_snapshot()["index"]
+        folded = project_name.casefold()
+        return (
+            index["full_name"].get(project_name)
+            or index["name"].get(project_name)
+            or index["full_name_ci"].get(folded)
+            or index["name_ci"].get(folded)
+        )
+
+    # ==================== 历史记录（追加日志） ====================
+    #
+    # 历史记录保存在 history.jsonl 中，每行一个操作：
+    #   {"op": "put", "record": {...}}    写入/覆盖某周记录
+    #   {"op": "delete", "id": "..."}     删除某周记录
+    # 同一周 id 以最后一次写入为准。读取最近几周时从文件尾部倒序扫描，
+    # 不需要解析整个文件；日志过大时在后台线程中压缩。
+    #
+    # record 中的项目以 "rows" 保存（见 services/history_codec.py），元数据在
+    # project_dict.jsonl 中共享；旧版带完整 "projects" 的行仍可读取，压缩时转换。
+
+    def _load_dictionary(self) -> ProjectDictionary:
+        """从字典文件加载项目元数据"""
+        entries = []
+        if os.path.exists(self.project_dict_file):
+            with open(self.project_dict_file, "rb") as f:
+                for line in f:
+                    if line.strip():
+                        entry = self._parse_log_line(line)
+                        if entry is not None:
+                            entries.append(entry)
+        return ProjectDictionary(entries)
+
+    def _get_dictionary(self, reload: bool = False) -> ProjectDictionary:
+        """获取项目字典（首次使用时加载）"""
+        if self._dictionary is None or reload:
+            with self._history_lock:
+                if self._dictionary is None or reload:
+                    self._dictionary = self._load_dictionary()
+        return self._dictionary
+
+    def _save_dictionary_entries(self, pending: dict) -> None:
+        """追加新的字典条目（必须先于引用它们的历史记录落盘）"""
+        if not pending:
+            return
+        lines = "".join(
+            json.dumps(e, ensure_ascii=False) + "\n" for e in sorted(pending.values(), key=lambda e: e["id"])
+        )
+        with self._history_lock:
+            with open(self.project_dict_file, "a", encoding="utf-8") as f:
+                f.write(lines)
+                f.flush()
+                os.fsync(f.fileno())
+        self._get_dictionary().commit(pending)
+
+    def _prune_dictionary(self, referenced: set) -> None:
+        """重写字典文件，只保留仍被引用的条目
+
+        只在历史日志整体替换之后执行；内存中被裁剪的条目仍可解码，
+        正在进行的流式导出仍能解析旧日志中的条目。
+        """
+        dictionary = self._get_dictionary()
+        entries = dictionary.entries(referenced)
+        tmp_path = self.project_dict_file + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.project_dict_file)
+        dictionary.retain(referenced)
+
+    def _encode_record(self, record: HistoryRecord, pending: dict) -> dict:
+        """编码为日志中保存的紧凑格式"""
+        data = record.model_dump(exclude={"projects"})
+        data["rows"] = self._get_dictionary().encode_projects(record.projects, pending)
+        data["stats"] = encode_stats(record.stats, record.projects)
+        return data
+
+    def _decode_record(self, data: dict) -> HistoryRecord:
+        """还原日志中的记录"""
+        if "rows" not in data:
+            return HistoryRecord(**data)
+        rows = data.pop("rows")
+        try:
+            projects = self._get_dictionary().decode_projects(rows)
+        except KeyError:
+            # 字典可能已被其他进程追加，重新加载一次
+            projects = self._get_dictionary(reload=True).decode_projects(rows)
+        data["stats"] = decode_stats(data.get("stats"), projects)
+        return HistoryRecord(**data, projects=projects)
+
+    def _append_history_log(self, entries: List[dict]) -> None:
+        """追加日志行"""
+        lines = "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in entries)
+        with self._history_lock:
+            with open(self.history_log, "a", encoding="utf-8") as f:
+                f.write(lines)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _iter_history_log_reversed(self, block_size: int = 64 * 1024):
+        """从文件尾部倒序逐行读取日志"""
+        with open(self.history_log, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            pos = f.tell()
+            buffer = b""
+            while pos > 0:
+                size = min(block_size, pos)
+                pos -= size
+                f.seek(pos)
+                buffer = f.read(size) + buffer
+                lines = buffer.split(b"\n")
+                buffer = lines[0]
+                for line in reversed(lines[1:]):
+                    if line.strip():
+                        yield line
+            if buffer.strip():
+                yield buffer
+
+    def _iter_history_log(self):
+        """顺序逐行读取日志"""
+        with open(self.history_log, "rb") as f:
+            for line in f:
+                if line.strip():
+                    yield line
+
+    @staticmethod
+    def _parse_log_line(line: bytes) -> Optional[dict]:
+        try:
+            return json.loads(line)
+        except ValueError:
+            # 写入中断留下的半行，忽略
+            logger.warning("跳过损坏的历史日志行")
+            return None
+
+    def _migrate_legacy_history(self) -> None:
+        """将旧版 history.json 转换为追加日志（只执行一次）"""
+        if self._history_migrated:
+            return
+        if not os.path.exists(self.history_log) and os.path.exists(self.history_file):
+            self._writer.run(self._do_migrate_legacy_history)
+        self._history_migrated = True
 
+    def _do_migrate_legacy_history(self) -> None:
+        if os.path.exists(self.history_log) or not os.path.exists(self.history_file):
+            return
         try:
             with open(self.history_file, "r", encoding="utf-8") as f:
                 data = json.load(f)
-            return [HistoryRecord(**item) for item in data.get("history", [])]
+            records = [HistoryRecord(**item) for item in data.get("history", [])]
+        except Exception as e:
+            logger.error(f"Error migrating history: {e}")
+            return
+        self._rewrite_history_log(records)
+        logger.info(f"已将 {len(records)} 条历史记录迁移到 {self.history_log}")
+
+    def _rewrite_history_log(self, records: List[HistoryRecord]) -> None:
+        """用给定记录（最新在前）重写日志，临时文件 + rename 保证原子性"""
+        tmp_path = self.history_log + ".tmp"
+        with self._history_lock:
+            pending = {}
+            encoded = [self._encode_record(record, pending) for record in reversed(records)]
+            self._save_dictionary_entries(pending)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for data in encoded:
+                    f.write(json.dumps({"op": "put", "record": data}, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.history_log)
+            self._history_log_compacted_size = os.path.getsize(self.history_log)
+            self._prune_dictionary({
+                row[0] for data in encoded for row in data["rows"] if not isinstance(row, str)
+            })
+
+    def _iter_history_tail(self) -> Iterator[HistoryRecord]:
+        """从日志尾部逐条产出每周的最终记录（最新在前），只在内存中保留已见过的 id"""
+        seen = set()
+        for line in self._iter_history_log_reversed():
+            entry = self._parse_log_line(line)
+            if entry is None:
+                continue
+            record_id = entry.get("id") if entry.get("op") == "delete" else entry.get("record", {}).get("id")
+            if record_id is None or record_id in seen:
+                continue
+            seen.add(record_id)
+            if entry.get("op") == "put":
+                yield self._decode_record(entry["record"])
+
+    def _read_history_tail(self, limit: Optional[int]) -> List[HistoryRecord]:
+        """从日志尾部读取最近 limit 周的记录（最新在前）"""
+        return list(islice(self._iter_history_tail(), limit))
+
+    def _maybe_compact_history(self) -> None:
+        """日志超过上次压缩后大小的两倍时，排入写线程后台压缩"""
+        size = self._file_signature(self.history_log)
+        if size is None:
+            return
+        threshold = max(self._history_log_compacted_size * 2, self.history_compact_min_bytes)
+        if size[1] <= threshold or self._history_compacting:
+            return
+        self._history_compacting = True
+        self._writer.submit(self.compact_history, key=self._write_key("compact"))
+
+    def compact_history(self) -> None:
+        """压缩历史日志：只保留每周最后一次写入，并按保留周数裁剪"""
+        try:
+            with self._history_lock:
+                records = self._read_history_tail(self.max_history)
+                self._rewrite_history_log(records)
+            logger.info(f"历史日志压缩完成，保留 {len(records)} 条记录")
         except Exception as e:
-            print(f"Error loading history: {e}")
+            logger.error(f"历史日志压缩失败: {e}")
+        finally:
+            self._history_compacting = False
+
+    @staticmethod
+    def _with_stats(record: HistoryRecord) -> HistoryRecord:
+        """为历史记录补充物化统计"""
+        if record.stats is not None:
+            return record
+        return record.model_copy(update={"stats": compute_stats(record.projects)})
+
+    def save_history(self, records: List[HistoryRecord]) -> None:
+        """整体替换历史记录（records 最新在前）"""
+        records = [self._with_stats(r) for r in records]
+        self._writer.run(lambda: self._write_history(records), key=self._write_key("history"))
+
+    def _write_history(self, records: List[HistoryRecord]) -> None:
+        self._rewrite_history_log(records)
+        self._history_snapshot = {
+            "signature": self._file_signature(self.history_log),
+            "records": tuple(records[:self.max_history]),
+        }
+
+    def _history_signature(self):
+        """历史数据版本签名"""
+        self._migrate_legacy_history()
+        return self._file_signature(self.history_log)
+
+    def _read_history_records(self) -> List[HistoryRecord]:
+        """从存储读取历史记录（最新在前）"""
+        return self._read_history_tail(self.max_history)
+
+    def _get_history_snapshot(self) -> dict:
+        """获取历史记录快照"""
+        signature = self._history_signature()
+        snapshot = self._history_snapshot
+        if snapshot is not None and signature is not None and snapshot["signature"] == signature:
+            self._cache_stats["history"]["hits"] += 1
+            return snapshot
+
+        self._cache_stats["history"]["misses"] += 1
+        if signature is None:
+            return {"signature": None, "records": []}
+
+        try:
+            records = [self._with_stats(r) for r in self._read_history_records()]
+        except Exception as e:
+            logger.error(f"Error loading history: {e}")
+            return {"signature": None, "records": []}
+
+        snapshot = {"signature": signature, "records": tuple(records)}
+        self._history_snapshot = snapshot
+        return snapshot
+
+    def load_history(self) -> List[HistoryRecord]:
+        """加载历史记录"""
+        return list(self._get_history_snapshot()["records"])
+
+    def iter_history(self) -> Iterator[HistoryRecord]:
+        """逐条产出历史记录（最新在前，受保留周数限制），用于流式导出
+
+        直接从日志读取，不经过内存快照，也不会一次性加载全部历史。
+        """
+        if self._history_signature() is None:
+            return
+        for record in islice(self._iter_history_tail(), self.max_history):
+            yield self._with_stats(record)
+
+    def query_history(self, offset: int = 0, limit: Optional[int] = None) -> Tuple[List[HistoryRecord], int]:
+        """按周分页读取历史记录（最新在前），返回 (当前页, 总周数)"""
+        records = self._get_history_snapshot()["records"]
+        end = len(records) if limit is None else offset + limit
+        return list(records[offset:end]), len(records)
+
+    def read_all_history(self) -> List[HistoryRecord]:
+        """读取全部历史记录（最新在前），用于导入到其他存储
+
+        不受保留周数限制，也不会把旧版 history.json 迁移为追加日志（只读）。
+        """
+        if os.path.exists(self.history_log):
+            return [self._with_stats(r) for r in self._read_history_tail(None)]
+        if not os.path.exists(self.history_file):
             return []
+        with open(self.history_file, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return [self._with_stats(HistoryRecord(**item)) for item in data.get("history", [])]
 
     def add_history_record(self, record: HistoryRecord) -> None:
-        """添加历史记录"""
-        history = self.load_history()
+        """添加历史记录（追加一行，同一周以最后写入为准）"""
+        record = self._with_stats(record)
+        self._writer.run(lambda: self._add_history(record))
 
-        # 检查是否已存在该周的记录
-        existing = [i for i, h in enumerate(history) if h.id == record.id]
-        for i in existing:
-            history.pop(i)
+    async def add_history_record_async(self, record: HistoryRecord) -> None:
+        """add_history_record 的异步版本"""
+        record = self._with_stats(record)
+        await self._run_async(lambda: self._add_history(record))
 
-        # 添加新记录到开头
-        history.insert(0, record)
+    def _add_history(self, record: HistoryRecord) -> None:
+        history = [h for h in self.load_history() if h.id != record.id]
+        pending = {}
+        data = self._encode_record(record, pending)
+        self._save_dictionary_entries(pending)
+        self._append_history_log([{"op": "put", "record": data}])
 
-        # 只保留最近12周
-        history = history[:12]
+        # 新记录在最前，只保留最近 max_history 周
+        self._history_snapshot = {
+            "signature": self._file_signature(self.history_log),
+            "records": tuple(([record] + history)[:self.max_history]),
+        }
+        self._maybe_compact_history()
 
-        self.save_history(history)
+    def delete_history_record(self, record_id: str) -> bool:
+        """删除指定历史记录，不存在时返回 False"""
+        return self._writer.run(lambda: self._delete_history(record_id))
+
+    async def delete_history_record_async(self, record_id: str) -> bool:
+        """delete_history_record 的异步版本"""
+        return await self._run_async(lambda: self._delete_history(record_id))
+
+    def _delete_history(self, record_id: str) -> bool:
+        history = self.load_history()
+        new_history = [h for h in history if h.id != record_id]
+        if len(new_history) == len(history):
+            return False
+
+        self._append_history_log([{"op": "delete", "id": record_id}])
+        # 被删除的记录之后可能有更早的记录补位，直接让快照失效
+        self._history_snapshot = None
+        self._maybe_compact_history()
+        return True
 
     def get_last_updated(self) -> Optional[datetime]:
         """获取最后更新时间"""
@@ -102,6 +620,19 @@ class StorageService:
             return datetime.fromisoformat(last_updated)
         return None
 
+    def get_cache_stats(self) -> dict:
+        """获取快照缓存命中统计"""
+        return {
+            "writer": self._writer.get_stats(),
+            **{
+                kind: {**counters, "cached": snapshot is not None}
+                for kind, counters, snapshot in (
+                    ("projects", self._cache_stats["projects"], self._projects_snapshot),
+                    ("history", self._cache_stats["history"], self._history_snapshot),
+                )
+            }
+        }
+
     def _get_default_data(self) -> dict:
         """获取默认数据"""
         return {
@@ -109,3 +640,34 @@ class StorageService:
             "projects": [],
             "total_projects": 0
         }
+
+
+_storage: Optional[StorageService] = None
+
+
+def create_storage(data_dir: str = "./data") -> StorageService:
+    """根据配置 storage.engine 创建存储引擎（json / sqlite）"""
+    storage_config = load_app_config().get("storage", {})
+    engine = storage_config.get("engine", "json")
+
+    if engine == "sqlite":
+        from services.sqlite_storage import SQLiteStorageService
+
+        db_path = storage_config.get("path") or os.path.join(data_dir, "trending.db")
+        is_new = not os.path.exists(db_path)
+        storage = SQLiteStorageService(db_path)
+        if is_new:
+            storage.import_from_json(data_dir)
+        return storage
+
+    if engine != "json":
+        logger.warning(f"未知存储引擎 {engine}，使用 json")
+    return StorageService(data_dir, max_history=storage_config.get("historyRetention", 12))
+
+
+def get_storage() -> StorageService:
+    """获取进程内共享的存储服务实例（各路由共用同一份快照缓存）"""
+    global _storage
+    if _storage is None:
+        _storage = create_storage()
+    return _storage
@@ -0,0 +1,276 @@
+"""
+Star 趋势引擎
+
+由历史快照的时间序列计算每个仓库的 star / fork 变化：
+- stars_delta_7d / stars_delta_30d / forks_delta_7d：最近 7 / 30 天的增量，采样点之间线性插值；
+  历史不足一个窗口时按已有跨度等比外推
+- 增速：最近 7 天的日均增量；加速度：增速与前一个 7 天窗口日均增量之差
+- 按配置的阈值分类为 rising / stable / falling，没有历史的项目为 stable
+
+所有仓库按（仓库 × 快照日期）矩阵一次计算：安装 NumPy 时使用数组运算，否则使用纯 Python
+实现，两者结果一致。引擎缓存已解码的历史快照，新快照保存后只追加一列，不重新读取全部历史。
+
+配置（config.json 中的 "trends"，均可选）:
+    {
+      "trends": {
+        "risingGrowth": 0.01,     # 7 天增长率 ≥ 1% 为 rising
+        "risingStars": 500,       # 或 7 天新增 star ≥ 500
+        "fallingGrowth": 0.001,   # 7 天增长率 ≤ 0.1% 为 falling
+        "fallingSlowdown": 0.5    # 或增速比前一个窗口下降超过 50%
+      }
+    }
+"""
+
+import logging
+import math
+import threading
+from datetime import date
+from typing import Dict, List, Optional, Sequence
+
+from models.schemas import HistoryRecord, ProjectCreate
+from services.config_loader import load_app_config
+
+try:
+    import numpy as np
+except ImportError:  # NumPy 为可选依赖
+    np = None
+
+logger = logging.getLogger(__name__)
+
+TREND_DEFAULTS = {
+    "risingGrowth": 0.01,
+    "risingStars": 500,
+    "fallingGrowth": 0.001,
+    "fallingSlowdown": 0.5,
+}
+
+WEEK = 7.0
+MONTH = 30.0
+# 外推所需的最短历史跨度（天）
+MIN_SPAN = 1.0
+
+Matrix = List[List[Optional[float]]]
+
+
+def _day(value: str) -> float:
+    return float(date.fromisoformat(value[:10]).toordinal())
+
+
+def _column(record_id: str, day: float, projects: Sequence) -> dict:
+    """一次快照：full_name（小写）-> (stars, forks)"""
+    values = {}
+    for item in projects:
+        if isinstance(item, ProjectCreate):
+            item = {"full_name": item.full_name, "stars": item.stars, "forks": item.forks}
+        if not isinstance(item, dict) or not item.get("full_name"):
+            continue
+        values[item["full_name"].casefold()] = (item.get("stars") or 0, item.get("forks") or 0)
+    return {"id": record_id, "day": day, "values": values}
+
+
+# ==================== 纯 Python 实现 ====================
+
+def _row_value_at(days: Sequence[float], row: Sequence[Optional[float]], target: float) -> Optional[float]:
+    """target 时刻的插值（两侧都有采样点时），否则为 None"""
+    left = right = None
+    for t, v in zip(days, row):
+        if v is None:
+            continue
+        if t <= target:
+            left = (t, v)
+        elif right is None:
+            right = (t, v)
+    if left is None or right is None:
+        return None
+    (lt, lv), (rt, rv) = left, right
+    return lv + (rv - lv) * ((target - lt) / (rt - lt))
+
+
+def _row_delta(days: Sequence[float], row: Sequence[Optional[float]], window: float) -> Optional[float]:
+    now, current = days[-1], row[-1]
+    past = _row_value_at(days, row, now - window)
+    if past is not None:
+        return current - past
+    first = next((i for i, v in enumerate(row) if v is not None), len(row) - 1)
+    span = now - days[first]
+    if span < MIN_SPAN:
+        return None
+    return (current - row[first]) * window / span
+
+
+def _deltas_python(days: List[float], stars: Matrix, forks: Matrix) -> Dict[str, List[Optional[float]]]:
+    result = {key: [] for key in ("stars_7d", "stars_30d", "forks_7d", "prev_7d")}
+    now = days[-1]
+    for star_row, fork_row in zip(stars, forks):
+        result["stars_7d"].append(_row_delta(days, star_row, WEEK))
+        result["stars_30d"].append(_row_delta(days, star_row, MONTH))
+        result["forks_7d"].append(_row_delta(days, fork_row, WEEK))
+        v7 = _row_value_at(days, star_row, now - WEEK)
+        v14 = _row_value_at(days, star_row, now - 2 * WEEK)
+        result["prev_7d"].append(v7 - v14 if v7 is not None and v14 is not None else None)
+    return result
+
+
+# ==================== NumPy 实现 ====================
+
+def _np_value_at(t, values, valid, target: float):
+    """每行在 target 时刻的插值，两侧缺少采样点的行为 NaN"""
+    rows, cols = values.shape
+    positions = np.arange(cols)
+    split = int(np.searchsorted(t, target, side="right"))
+    left = np.where(valid[:, :split], positions[:split], -1).max(axis=1, initial=-1)
+    right = np.where(valid[:, split:], positions[split:], cols).min(axis=1, initial=cols)
+    ok = (left >= 0) & (right < cols)
+    li, ri = np.clip(left, 0, cols - 1), np.clip(right, 0, cols - 1)
+    lt, rt = t[li], t[ri]
+    lv, rv = values[np.arange(rows), li], values[np.arange(rows), ri]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        interpolated = lv + (rv - lv) * ((target - lt) / (rt - lt))
+    return np.where(ok, interpolated, np.nan)
+
+
+def _np_delta(t, values, valid, window: float):
+    now = t[-1]
+    current = values[:, -1]
+    past = _np_value_at(t, values, valid, now - window)
+    first = np.where(valid, np.arange(values.shape[1]), values.shape[1] - 1).min(axis=1)
+    span = now - t[first]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        extrapolated = np.where(
+            span >= MIN_SPAN, (current - values[np.arange(len(first)), first]) * window / span, np.nan
+        )
+    return np.where(np.isnan(past), extrapolated, current - past)
+
+
+def _deltas_numpy(days: List[float], stars: Matrix, forks: Matrix) -> Dict[str, List[Optional[float]]]:
+    t = np.asarray(days, dtype=float)
+    star_values = np.array([[np.nan if v is None else v for v in row] for row in stars], dtype=float)
+    fork_values = np.array([[np.nan if v is None else v for v in row] for row in forks], dtype=float)
+    star_valid, fork_valid = ~np.isnan(star_values), ~np.isnan(fork_values)
+    now = t[-1]
+    v7 = _np_value_at(t, star_values, star_valid, now - WEEK)
+    v14 = _np_value_at(t, star_values, star_valid, now - 2 * WEEK)
+    result = {
+        "stars_7d": _np_delta(t, star_values, star_valid, WEEK),
+        "stars_30d": _np_delta(t, star_values, star_valid, MONTH),
+        "forks_7d": _np_delta(t, fork_values, fork_valid, WEEK),
+        "prev_7d": v7 - v14,
+    }
+    return {key: [None if math.isnan(v) else float(v) for v in column] for key, column in result.items()}
+
+
+# ==================== 分类 ====================
+
+def classify(stars: float, delta_7d: Optional[float], prev_7d: Optional[float], settings: dict) -> str:
+    """按 7 天增量、增长率和增速变化分类"""
+    if delta_7d is None:
+        return "stable"
+    growth = delta_7d / max(stars - delta_7d, 1.0)
+    if growth >= settings["risingGrowth"] or delta_7d >= settings["risingStars"]:
+        return "rising"
+    if growth <= settings["fallingGrowth"]:
+        return "falling"
+    if prev_7d is not None and prev_7d > 0 and delta_7d < prev_7d * (1 - settings["fallingSlowdown"]):
+        return "falling"
+    return "stable"
+
+
+def compute_trends(days: List[float], stars: Matrix, forks: Matrix,
+                   settings: Optional[dict] = None, use_numpy: Optional[bool] = None) -> List[dict]:
+    """计算每行（仓库）的趋势指标
+
+    days 为升序的快照日期（天），最后一列为当前值且每行都不为空；缺失的采样为 None。
+    """
+    settings = {**TREND_DEFAULTS, **(settings or {})}
+    if not stars:
+        return []
+    use_numpy = np is not None if use_numpy is None else use_numpy
+    deltas = (_deltas_numpy if use_numpy else _deltas_python)(days, stars, forks)
+
+    results = []
+    for i, row in enumerate(stars):
+        delta_7d, prev_7d = deltas["stars_7d"][i], deltas["prev_7d"][i]
+        velocity = delta_7d / WEEK if delta_7d is not None else None
+        prev_velocity = prev_7d / WEEK if prev_7d is not None else None
+        results.append({
+            "stars_delta_7d": round(delta_7d) if delta_7d is not None else None,
+            "stars_delta_30d": round(deltas["stars_30d"][i]) if deltas["stars_30d"][i] is not None else None,
+            "forks_delta_7d": round(deltas["forks_7d"][i]) if deltas["forks_7d"][i] is not None else None,
+            "star_velocity": velocity,
+            "star_acceleration": velocity - prev_velocity
+            if velocity is not None and prev_velocity is not None else None,
+            "trend": classify(row[-1], delta_7d, prev_7d, settings),
+        })
+    return results
+
+
+class TrendEngine:
+    """缓存历史快照列，按需为当前项目计算趋势"""
+
+    def __init__(self, settings: Optional[dict] = None):
+        self.settings = {**TREND_DEFAULTS, **(settings or {})}
+        self._columns: List[dict] = []
+        self._version = None
+        self._lock = threading.Lock()
+
+    def sync(self, storage) -> None:
+        """历史记录在引擎之外变化（删除、导入等）时重新加载"""
+        version = storage.get_history_version()
+        with self._lock:
+            if self._version is not None and self._version == version:
+                return
+            columns = [
+                _column(record.id, _day(record.date), record.projects)
+                for record in storage.iter_history()
+            ]
+            self._columns = sorted(columns, key=lambda c: c["day"])
+            self._version = version
+        logger.info(f"趋势引擎加载 {len(self._columns)} 个历史快照")
+
+    def observe(self, record: HistoryRecord, storage=None) -> None:
+        """新快照保存后追加一列（同一周替换），不重新读取历史"""
+        column = _column(record.id, _day(record.date), record.projects)
+        with self._lock:
+            columns = [c for c in self._columns if c["id"] != record.id] + [column]
+            self._columns = sorted(columns, key=lambda c: c["day"])
+            if storage is not None:
+                self._version = storage.get_history_version()
+
+    def compute(self, projects: List[ProjectCreate], record_id: str, day: str) -> List[dict]:
+        """以 projects 作为 day 这一天的快照（替换同一周的旧快照）计算趋势"""
+        current = _column(record_id, _day(day), projects)
+        with self._lock:
+            columns = [c for c in self._columns if c["id"] != record_id and c["day"] < current["day"]]
+        columns.append(current)
+
+        days = [c["day"] for c in columns]
+        names = [p.full_name.casefold() for p in projects]
+        stars = [[c["values"][n][0] if n in c["values"] else None for c in columns] for n in names]
+        forks = [[c["values"][n][1] if n in c["values"] else None for c in columns] for n in names]
+        return compute_trends(days, stars, forks, self.settings)
+
+    def apply(self, projects: List[ProjectCreate], record_id: str, day: str) -> List[ProjectCreate]:
+        """返回带趋势和增量字段的项目"""
+        trends = self.compute(projects, record_id, day)
+        return [
+            p.model_copy(update={
+                "trend": t["trend"],
+                "stars_delta_7d": t["stars_delta_7d"],
+                "stars_delta_30d": t["stars_delta_30d"],
+                "forks_delta_7d": t["forks_delta_7d"],
+            })
+            for p, t in zip(projects, trends)
+        ]
+
+
+_engine: Optional[TrendEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_trend_engine() -> TrendEngine:
+    """获取进程内共享的趋势引擎"""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = TrendEngine(load_app_config().get("trends", {}) or {})
+        return _engine
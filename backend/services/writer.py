@@ -0,0 +1,125 @@
+"""
+单写线程服务
+
+所有数据文件的写入都通过同一个后台线程串行执行，避免并发刷新、删除之间
+互相覆盖；文件统一以临时文件 + rename 的方式原子替换，读者不会读到半个文件。
+"""
+
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def _atomic_write(path: str, write: Callable[[Any], None], suffix: str) -> None:
+    """原子写入文件（同目录临时文件 + fsync + os.replace）"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", suffix=suffix, dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def atomic_write_json(path: str, data: Any, indent: Optional[int] = 2) -> None:
+    """原子写入 JSON 文件"""
+    _atomic_write(path, lambda f: json.dump(data, f, ensure_ascii=False, indent=indent), ".json")
+
+
+def atomic_write_text(path: str, text: str) -> None:
+    """原子写入文本文件"""
+    _atomic_write(path, lambda f: f.write(text), ".txt")
+
+
+class SnapshotWriter:
+    """单写线程
+
+    submit() 将写任务放入队列。带 key 的任务如果与队尾尚未执行的任务 key 相同，
+    会直接替换它（合并连续写入，只执行最后一次），两个调用方都拿到同一结果。
+    """
+
+    def __init__(self, name: str = "snapshot-writer"):
+        self.name = name
+        self._queue: deque = deque()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {"submitted": 0, "executed": 0, "coalesced": 0, "failed": 0}
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def submit(self, fn: Callable[[], Any], key: Optional[Hashable] = None) -> Future:
+        """提交写任务，返回 Future"""
+        future: Future = Future()
+        with self._cond:
+            self._stats["submitted"] += 1
+            if key is not None and self._queue and self._queue[-1]["key"] == key:
+                job = self._queue[-1]
+                job["fn"] = fn
+                job["futures"].append(future)
+                self._stats["coalesced"] += 1
+            else:
+                self._queue.append({"key": key, "fn": fn, "futures": [future]})
+            self._ensure_thread()
+            self._cond.notify()
+        return future
+
+    def run(self, fn: Callable[[], Any], key: Optional[Hashable] = None) -> Any:
+        """提交写任务并等待完成（在写线程内调用时直接执行，避免自锁）"""
+        if threading.current_thread() is self._thread:
+            return fn()
+        return self.submit(fn, key).result()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                job = self._queue.popleft()
+
+            try:
+                result = job["fn"]()
+            except BaseException as e:
+                self._stats["failed"] += 1
+                logger.error(f"写任务失败 ({job['key']}): {e}")
+                for future in job["futures"]:
+                    future.set_exception(e)
+            else:
+                self._stats["executed"] += 1
+                for future in job["futures"]:
+                    future.set_result(result)
+
+    def get_stats(self) -> dict:
+        """写入统计"""
+        with self._cond:
+            return {**self._stats, "pending": len(self._queue)}
+
+
+_writer: Optional[SnapshotWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_writer() -> SnapshotWriter:
+    """获取进程内共享的写线程"""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = SnapshotWriter()
+        return _writer
@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+AI provider 池测试
+
+在本地桩 /chat/completions 服务器上验证：
+- 对冲：主 provider 超过对冲延迟未返回时请求备用 provider，先返回的有效响应胜出
+- 故障切换：主 provider 返回错误或无效响应时立即使用备用 provider
+- 熔断：错误率或慢请求率超过阈值后熔断，半开探测成功后恢复；无法解析的响应不计入错误率
+- 对冲 / 切换的请求占用所发往 provider 的限制名额，结果按实际响应的 provider 写入缓存
+- 缺少增强字段的响应视为无效，每个响应只解析一次；缓存写入由写线程合并写回
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from models.schemas import ProjectCreate
+from services.ai import AIService
+from services.ai_cache import AICache
+from services.ai_limits import ProviderLimiter
+from services.ai_pool import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, get_provider_health
+
+VALID = '{"enhanced_description": "测试描述", "usage_steps": ["pip install x"], "category": "工具"}'
+PARSED = json.loads(VALID)
+
+HEDGE = {"minDelaySeconds": 0.1, "maxDelaySeconds": 0.1, "defaultDelaySeconds": 0.1}
+
+
+class StubProvider:
+    """桩 provider：固定延迟后返回指定状态码和内容"""
+
+    def __init__(self, latency: float = 0.0, status: int = 200, content: str = VALID):
+        self.latency = latency
+        self.status = status
+        self.content = content
+        self.requests = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                stub.requests += 1
+                self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                time.sleep(stub.latency)
+                body = json.dumps({"choices": [{"message": {"content": stub.content}}]}).encode("utf-8")
+                try:
+                    self.send_response(stub.status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except OSError:
+                    pass  # 对冲请求被取消时客户端已断开
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def make_service(name: str, stubs, breaker=None) -> AIService:
+    """按顺序用桩 provider 组成 provider 池（name 区分各测试的熔断状态）"""
+    services = [
+        AIService(provider=f"{name}-{i}", model="stub", api_key="test", endpoint=stub.url)
+        for i, stub in enumerate(stubs)
+    ]
+    for service in services:
+        get_provider_health(service.name).breaker = CircuitBreaker(breaker)
+        service.limiter = ProviderLimiter(service.provider, 4, 10 ** 6)
+    primary = AIService(provider=f"{name}-0", model="stub", api_key="test", endpoint=stubs[0].url,
+                        fallbacks=services[1:])
+    primary.limiter = services[0].limiter
+    primary.pool.hedge.update(HEDGE)
+    return primary
+
+
+async def call(service: AIService, parse=None):
+    """返回池中胜出的响应（parse 为 None 时为响应文本，都失败时为 None）"""
+    result = await service._call_ai("prompt", parse=parse)
+    return result[1] if result else None
+
+
+def test_hedge_to_fallback():
+    """主 provider 慢时对冲到备用 provider"""
+    print("🔍 测试对冲请求...")
+    slow, fast = StubProvider(latency=1.0, content='{"enhanced_description": "slow"}'), StubProvider(latency=0.05)
+    try:
+        service = make_service("hedge", [slow, fast])
+
+        async def run():
+            started = time.monotonic()
+            result = await service._call_ai("prompt", parse=service._extract_json)
+            return result, time.monotonic() - started
+
+        (member, response), elapsed = asyncio.run(run())
+        assert response == PARSED, response
+        assert member is service.pool.members[1]
+        assert elapsed < 0.6, elapsed
+        assert slow.requests == 1 and fast.requests == 1
+        fallback = get_provider_health("hedge-1/stub")
+        assert fallback.stats["hedges"] == 1 and fallback.stats["wins"] == 1
+        assert get_provider_health("hedge-0/stub").stats["cancelled"] == 1
+        # 对冲请求占用备用 provider 自己的并发 / 速率名额
+        assert member.limiter.get_stats()["requests"] == 1
+        assert service.limiter.get_stats()["requests"] == 1
+    finally:
+        slow.close()
+        fast.close()
+    print(f"   ✅ {elapsed:.2f}s 内由备用 provider 返回")
+
+
+def test_failover_on_error_and_invalid():
+    """错误或无效响应立即切换到下一个 provider"""
+    print("🔍 测试故障切换...")
+    broken, invalid, good = StubProvider(status=500), StubProvider(content="不是 JSON"), StubProvider()
+    try:
+        service = make_service("failover", [broken, invalid, good])
+        response = asyncio.run(call(service, service._extract_json))
+        assert response == PARSED, response
+        assert broken.requests == invalid.requests == good.requests == 1
+        assert get_provider_health("failover-0/stub").stats["hedges"] == 0
+        assert get_provider_health("failover-0/stub").stats["errors"] == 1
+        # 无效响应只切换 provider，不计为错误
+        invalid_stats = get_provider_health("failover-1/stub").stats
+        assert invalid_stats["errors"] == 0 and invalid_stats["invalid"] == 1
+    finally:
+        for stub in (broken, invalid, good):
+            stub.close()
+    print("   ✅ 依次切换到可用的 provider")
+
+
+def test_cache_keyed_on_answering_provider():
+    """备用 provider 的结果按其 provider / model 写入缓存，查缓存时也能命中"""
+    print("🔍 测试缓存归属...")
+    broken, good = StubProvider(status=500), StubProvider()
+    try:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            service = make_service("cache-owner", [broken, good])
+            service.cache = AICache(path=os.path.join(tmpdir, "ai_cache.json"))
+            project = ProjectCreate(name="repo", full_name="owner/repo", url="", description="d")
+            enhanced = asyncio.run(service.enhance_project(project))
+            assert enhanced.ai_enhanced and enhanced.description == "测试描述"
+
+            fallback = service.pool.members[1]
+            assert service.cache.get(service._cache_key(project)) is None
+            assert service.cache.get(service._cache_key(project, fallback)) is not None
+            assert service.from_cache(project).description == "测试描述"
+    finally:
+        broken.close()
+        good.close()
+    print("   ✅ 缓存条目归属实际响应的 provider")
+
+
+def test_empty_fields_fail_over():
+    """单项目响应缺少增强字段（如 {}）时视为无效，切换到下一个 provider"""
+    print("🔍 测试单项目响应校验...")
+    empty, blank, good = StubProvider(content="{}"), StubProvider(content='{"enhanced_description": " "}'), StubProvider()
+    try:
+        service = make_service("validate", [empty, blank, good])
+        assert service._extract_json("{}") is None
+        member, response = asyncio.run(service._call_ai("prompt", parse=service._extract_json))
+        assert member is service.pool.members[2] and response == PARSED
+    finally:
+        for stub in (empty, blank, good):
+            stub.close()
+    print("   ✅ 空的增强字段不会被接受")
+
+
+def test_cache_flushed_on_writer():
+    """写入缓存只标记为脏，由写线程一次写回"""
+    print("🔍 测试缓存写回...")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "ai_cache.json")
+        cache = AICache(path=path)
+        for i in range(5):
+            cache.put(f"k{i}", f"owner/r{i}", "p", "m", {"enhanced_description": f"d{i}"})
+        assert not os.path.exists(path) and cache.get_stats()["dirty"]
+        assert cache.flush_later().result() is True
+        assert cache.flush_later().result() is False
+        assert cache.get_stats()["flushes"] == 1
+        assert AICache(path=path).get("k4")["enhanced_description"] == "d4"
+    print("   ✅ 5 次写入只写回 1 次文件")
+
+def test_invalid_json_does_not_trip_breaker():
+    """无法解析的响应每次只解析、记录一次，不计入熔断器的错误率"""
+    print("🔍 测试无效响应与熔断...")
+    stub = StubProvider(content="不是 JSON")
+    breaker = {"window": 4, "minCalls": 4, "errorRate": 0.5, "openSeconds": 60}
+    records = []
+
+    class Collect(logging.Handler):
+        def emit(self, record):
+            if "解析 AI 响应失败" in record.getMessage():
+                records.append(record)
+
+    handler = Collect()
+    logging.getLogger("services.ai").addHandler(handler)
+    try:
+        service = make_service("invalid-json", [stub], breaker)
+        project = ProjectCreate(name="repo", full_name="owner/repo", url="", description="d")
+
+        async def run():
+            for _ in range(6):
+                enhanced = await service.enhance_project(project, check_cache=False)
+                assert not enhanced.ai_enhanced
+
+        asyncio.run(run())
+        health = get_provider_health(service.name)
+        assert stub.requests == 6 and len(records) == 6, (stub.requests, len(records))
+        assert health.breaker.state == CLOSED and health.breaker.trips == 0
+        assert health.stats["invalid"] == 6 and health.stats["errors"] == 0
+    finally:
+        logging.getLogger("services.ai").removeHandler(handler)
+        stub.close()
+    print("   ✅ 6 次无效响应各记录 1 次，熔断器保持关闭")
+
+
+def test_breaker_trips_and_recovers():
+    """错误率超过阈值后熔断，半开探测成功后恢复"""
+    print("🔍 测试错误率熔断...")
+    stub = StubProvider(status=500)
+    breaker = {"window": 4, "minCalls": 4, "errorRate": 0.5, "openSeconds": 0.2}
+    try:
+        service = make_service("breaker", [stub], breaker)
+        health = get_provider_health(service.name)
+
+        async def run():
+            for _ in range(4):
+                assert await call(service) is None
+            assert health.breaker.state == OPEN
+            # 熔断期间直接失败，不请求上游
+            assert await call(service) is None
+            assert stub.requests == 4 and health.stats["rejected"] == 1
+
+            await asyncio.sleep(0.25)
+            stub.status = 200
+            assert health.breaker.allow() and health.breaker.state == HALF_OPEN
+            health.breaker.release()
+            assert await call(service) == VALID
+            assert health.breaker.state == CLOSED
+
+        asyncio.run(run())
+        assert health.breaker.trips == 1
+    finally:
+        stub.close()
+    print("   ✅ 熔断后拒绝请求，半开探测成功后恢复")
+
+
+def test_breaker_trips_on_latency():
+    """慢请求率超过阈值后熔断，请求转到备用 provider"""
+    print("🔍 测试慢请求熔断...")
+    slow, fast = StubProvider(latency=0.15), StubProvider()
+    breaker = {"window": 3, "minCalls": 3, "slowCallSeconds": 0.1, "slowCallRate": 0.5, "openSeconds": 60}
+    try:
+        service = make_service("latency", [slow, fast], breaker)
+        service.pool.hedge["enabled"] = False
+
+        async def run():
+            for _ in range(3):
+                assert await call(service) == VALID
+            assert get_provider_health("latency-0/stub").breaker.state == OPEN
+            assert await call(service) == VALID
+
+        asyncio.run(run())
+        assert slow.requests == 3 and fast.requests == 1
+        latency = get_provider_health("latency-0/stub").to_dict()["latency"]
+        assert latency["count"] == 3 and latency["buckets"]["le_250ms"] == 3
+    finally:
+        slow.close()
+        fast.close()
+    print("   ✅ 慢 provider 熔断后直接使用备用 provider")
+
+
+def test_hedge_delay_follows_p95():
+    """对冲延迟取近期成功请求的 p95，并限制在配置范围内"""
+    print("🔍 测试对冲延迟...")
+    service = AIService(provider="p95", model="stub", api_key="test", endpoint="http://127.0.0.1:1")
+    service.pool.hedge.update({"minDelaySeconds": 0.5, "maxDelaySeconds": 10, "defaultDelaySeconds": 8, "minSamples": 5})
+    health = get_provider_health(service.name)
+    assert service.pool.hedge_delay(health) == 8
+    for seconds in [1.0] * 18 + [3.0, 30.0]:
+        health.histogram.observe(seconds)
+    assert service.pool.hedge_delay(health) == 3.0
+    health.histogram.observe(60.0)
+    health.histogram.observe(60.0)
+    assert service.pool.hedge_delay(health) == 10
+    print("   ✅ 对冲延迟随 p95 变化")
+
+
+def main():
+    print("=" * 50)
+    print("🚀 AI provider 池测试")
+    print("=" * 50)
+    print()
+
+    tests = [
+        ("对冲请求", test_hedge_to_fallback),
+        ("故障切换", test_failover_on_error_and_invalid),
+        ("缓存归属", test_cache_keyed_on_answering_provider),
+        ("单项目响应校验", test_empty_fields_fail_over),
+        ("缓存写回", test_cache_flushed_on_writer),
+        ("无效响应与熔断", test_invalid_json_does_not_trip_breaker),
+        ("错误率熔断", test_breaker_trips_and_recovers),
+        ("慢请求熔断", test_breaker_trips_on_latency),
+        ("对冲延迟", test_hedge_delay_follows_p95),
+    ]
+
+    passed = 0
+    for name, test_func in tests:
+        try:
+            test_func()
+            passed += 1
+        except Exception as e:
+            print(f"   ❌ {name} 失败: {e}")
+        print()
+
+    print(f"总计: {passed}/{len(tests)} 项测试通过")
+    return 0 if passed == len(tests) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
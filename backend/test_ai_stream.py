@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+AI 流式增强测试
+
+- JSONStreamExtractor：逐字符输入时对象闭合即返回，字符串中的括号 / 转义不影响匹配
+- stream_batch()：在本地桩 SSE 服务器上验证每个项目完成即产出，流式请求失败时改用普通请求
+- /refresh-ai/stream：API Key 通过一次性 token 或已保存的配置传入，不出现在 URL 中
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from fastapi import HTTPException
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import routers.projects as projects_router
+from models.schemas import ProjectCreate
+from routers.config import AIConfig
+from services.ai import AIService, JSONStreamExtractor
+from services.ai_cache import AICache
+
+ITEM_DELAY = 0.2
+
+
+class StubStreamProvider:
+    """桩 provider：stream 请求按 SSE 逐段返回 JSON 数组，每个项目间隔 ITEM_DELAY"""
+
+    def __init__(self, stream_status: int = 200):
+        self.stream_status = stream_status
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)))
+                prompt = body["messages"][-1]["content"]
+                names = [json.loads(line)["full_name"] for line in prompt.splitlines() if line.startswith('{"full_name"')]
+                items = [{"full_name": n, "enhanced_description": f"增强 {n}", "usage_steps": []} for n in names]
+                if not body.get("stream") or stub.stream_status != 200:
+                    status = 200 if not body.get("stream") else stub.stream_status
+                    payload = json.dumps({"choices": [{"message": {"content": json.dumps(items)}}]}).encode("utf-8")
+                    self.send_response(status)
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                text = "```json\n" + json.dumps(items, ensure_ascii=False) + "\n```"
+                for chunk in [text[i:i + 16] for i in range(0, len(text), 16)]:
+                    if chunk.count("}"):
+                        time.sleep(ITEM_DELAY)
+                    delta = {"choices": [{"delta": {"content": chunk}}]}
+                    self.wfile.write(f"data: {json.dumps(delta)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                self.wfile.write(b"data: [DONE]\n\n")
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def make_projects(n: int):
+    return [ProjectCreate(name=f"r{i}", full_name=f"owner/r{i}", url="", description=f"d{i}") for i in range(n)]
+
+
+def make_service(name: str, stub: StubStreamProvider, tmpdir: str) -> AIService:
+    service = AIService(provider=name, model="stub", api_key="test", endpoint=stub.url)
+    service.cache = AICache(path=os.path.join(tmpdir, f"{name}.json"))
+    return service
+
+
+def test_extractor_incremental():
+    """逐字符输入时对象闭合即返回"""
+    print("🔍 测试增量 JSON 提取...")
+    text = '说明 ```json\n[{"full_name": "a/b", "enhanced_description": "x {y} \\" ]"}, {"full_name": "c/d"}]\n```'
+    extractor = JSONStreamExtractor()
+    items = []
+    for i, ch in enumerate(text):
+        for item in extractor.feed(ch):
+            items.append((i, item))
+    assert [item["full_name"] for _, item in items] == ["a/b", "c/d"], items
+    assert items[0][1]["enhanced_description"] == 'x {y} " ]'
+    assert items[0][0] < text.index("c/d")
+    assert JSONStreamExtractor().feed('{不是 JSON} {"ok": [1, {"n": 2}]}') == [{"ok": [1, {"n": 2}]}]
+    print("   ✅ 每个对象闭合时立即返回")
+
+
+def test_stream_batch_yields_early():
+    """批量流式请求中第一个项目先于整批完成产出"""
+    print("🔍 测试流式批量增强...")
+    stub = StubStreamProvider()
+    try:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            service = make_service("stream", stub, tmpdir)
+
+            async def run():
+                started = time.monotonic()
+                return [(i, p, time.monotonic() - started) async for i, p in service.stream_batch(make_projects(4))]
+
+            results = asyncio.run(run())
+            assert [i for i, _, _ in results] == [0, 1, 2, 3]
+            assert all(p.ai_enhanced and p.description == f"增强 owner/r{i}" for i, p, _ in results)
+            first, last = results[0][2], results[-1][2]
+            assert last - first >= ITEM_DELAY * 2, (first, last)
+            assert service.cache.get_stats()["stores"] == 4
+    finally:
+        stub.close()
+    print(f"   ✅ 第一个项目 {first:.2f}s，最后一个 {last:.2f}s")
+
+
+def test_stream_failure_falls_back():
+    """流式请求失败时改用普通请求"""
+    print("🔍 测试流式失败回退...")
+    stub = StubStreamProvider(stream_status=500)
+    try:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            service = make_service("stream-fallback", stub, tmpdir)
+
+            async def run():
+                return [(i, p.description) async for i, p in service.stream_batch(make_projects(2))]
+
+            assert asyncio.run(run()) == [(0, "增强 owner/r0"), (1, "增强 owner/r1")]
+    finally:
+        stub.close()
+    print("   ✅ 回退到普通请求")
+
+
+def test_stream_endpoint_keeps_key_out_of_url():
+    """SSE 刷新使用一次性 token 或已保存的配置中的 API Key"""
+    print("🔍 测试 SSE 刷新 token...")
+    keys = []
+
+    async def fake_refresh(github_service, storage, ai_service=None, on_enhanced=None):
+        keys.append(ai_service.api_key if ai_service else None)
+        return {"projects": [], "saved": {"last_updated": "now"}, "reused": 0, "recomputed": 0,
+                "ai_used": ai_service is not None, "ai_enhanced": 0, "ai_timings": []}
+
+    async def consume(**params) -> str:
+        response = await projects_router.refresh_projects_ai_stream(**params)
+        return "".join([chunk async for chunk in response.body_iterator])
+
+    async def run():
+        issued = await projects_router.create_refresh_ai_stream(AIConfig(provider="openai", api_key="sk-posted"))
+        assert issued["expires_in"] == projects_router.STREAM_TOKEN_TTL
+        body = await consume(token=issued["token"])
+        assert "event: done" in body and "sk-posted" not in body
+        # token 只能使用一次
+        try:
+            await consume(token=issued["token"])
+        except HTTPException as e:
+            assert e.status_code == 401
+        else:
+            raise AssertionError("token 不应被重复使用")
+        # 不带 token 时使用已保存的配置
+        await consume()
+
+    original = projects_router.run_refresh, projects_router.load_saved_config
+    projects_router.run_refresh = fake_refresh
+    projects_router.load_saved_config = lambda: {"ai": {"provider": "qwen", "api_key": "sk-saved"}}
+    try:
+        asyncio.run(run())
+    finally:
+        projects_router.run_refresh, projects_router.load_saved_config = original
+    assert keys == ["sk-posted", "sk-saved"], keys
+    print("   ✅ API Key 不经过 URL")
+
+
+def main():
+    print("=" * 50)
+    print("🚀 AI 流式增强测试")
+    print("=" * 50)
+    print()
+
+    tests = [
+        ("增量 JSON 提取", test_extractor_incremental),
+        ("流式批量增强", test_stream_batch_yields_early),
+        ("流式失败回退", test_stream_failure_falls_back),
+        ("SSE 刷新 token", test_stream_endpoint_keeps_key_out_of_url),
+    ]
+
+    passed = 0
+    for name, test_func in tests:
+        try:
+            test_func()
+            passed += 1
+        except Exception as e:
+            print(f"   ❌ {name} 失败: {e}")
+        print()
+
+    print(f"总计: {passed}/{len(tests)} 项测试通过")
+    return 0 if passed == len(tests) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+GitHub 请求测试
+
+在 httpx.MockTransport 桩上游上验证：
+- README：过期时携带 ETag 条件请求，命中 304 时复用缓存
+- README：没有 README 时负缓存，上游出错时退回过期缓存
+- 调度器：5xx / 连接错误按指数退避重试，额度耗尽时切换 token，全部耗尽且等待过久时报错
+- 共享客户端：按 HTTP_PROXY / NO_PROXY 环境变量经代理发出请求
+- 抓取计划：各查询轮流分配名额，时间窗口查询中新近的项目不会被全局热门项目挤掉
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import services.github as github_module
+import services.rate_limit as rate_limit
+from services.fetch_planner import FETCH_DEFAULTS, CandidatePool
+from services.github import GitHubService
+from services.http import HttpClients
+from services.rate_limit import GitHubScheduler, RateLimitExceeded
+from services.readme_cache import ReadmeCache
+
+FAST = {"backoffBase": 0.01, "backoffMax": 0.02, "maxRetries": 3, "burst": 100}
+
+
+class Upstream:
+    """桩 GitHub：替换调度器使用的 HTTP 客户端，由 handler 生成响应并记录请求"""
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.requests = []
+
+    def __enter__(self):
+        def handle(request: httpx.Request) -> httpx.Response:
+            self.requests.append(request)
+            return self.handler(request)
+
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handle))
+        self._original = rate_limit.get_http_client
+        rate_limit.get_http_client = lambda name: client
+        return self
+
+    def __exit__(self, *exc):
+        rate_limit.get_http_client = self._original
+
+    def auths(self):
+        return [r.headers.get("Authorization") for r in self.requests]
+
+
+def make_service(tmpdir: str, **cache_options) -> GitHubService:
+    service = GitHubService(token="t")
+    service.scheduler.settings.update({**FAST, "maxRetries": 0})
+    service.readme_cache = ReadmeCache(tmpdir, **cache_options)
+    return service
+
+
+def test_readme_revalidation():
+    """过期的 README 携带 ETag 重新验证，304 时复用缓存"""
+    print("🔍 测试 README 条件请求...")
+
+    def handler(request):
+        if request.headers.get("If-None-Match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, headers={"ETag": '"v1"'}, content="# Hello".encode("utf-8"))
+
+    with tempfile.TemporaryDirectory() as tmpdir, Upstream(handler) as upstream:
+        service = make_service(tmpdir, ttl=0)
+
+        async def run():
+            assert await service.fetch_readme("owner/repo") == "# Hello"
+            assert await service.fetch_readme("https://github.com/owner/repo") == "# Hello"
+
+        asyncio.run(run())
+        assert [r.headers.get("If-None-Match") for r in upstream.requests] == [None, '"v1"']
+        assert all(r.url.path == "/repos/owner/repo/readme" for r in upstream.requests)
+        assert service.readme_cache.get_stats()["revalidated"] == 1
+
+        # 未过期时不请求上游
+        service.readme_cache.ttl = 3600
+        assert asyncio.run(service.fetch_readme("owner/repo")) == "# Hello"
+        assert len(upstream.requests) == 2
+    print("   ✅ 304 复用缓存内容")
+
+
+def test_readme_missing_and_stale():
+    """没有 README 时负缓存；上游出错时退回过期缓存"""
+    print("🔍 测试 README 负缓存与过期回退...")
+
+    def handler(request):
+        if request.url.path.startswith("/repos/owner/none/"):
+            return httpx.Response(404)
+        return httpx.Response(500)
+
+    with tempfile.TemporaryDirectory() as tmpdir, Upstream(handler) as upstream:
+        service = make_service(tmpdir, ttl=0)
+
+        async def run():
+            assert await service.fetch_readme("owner/none") is None
+            probes = len(upstream.requests)
+            # /readme + 每个常见文件名各一次
+            assert probes == 1 + len(GitHubService.README_FILENAMES)
+            assert await service.fetch_readme("owner/none") is None
+            assert len(upstream.requests) == probes
+            assert service.readme_cache.fresh_state("owner/none") == "missing"
+
+            service.readme_cache.put("owner/stale", "# Old")
+            assert await service.fetch_readme("owner/stale") == "# Old"
+            assert len(upstream.requests) == probes + 1
+            assert await service.fetch_readme("owner/broken") is None
+            assert service.readme_cache.lookup("owner/broken") is None
+
+        asyncio.run(run())
+    print("   ✅ 负缓存期间不再请求，出错时使用过期缓存")
+
+
+def sequence(*responses):
+    """依次返回给定响应的处理函数（元素为 httpx.Response 或异常）"""
+    remaining = list(responses)
+
+    def handler(request):
+        item = remaining.pop(0) if len(remaining) > 1 else remaining[0]
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+    return handler
+
+
+def test_retry_with_backoff():
+    """5xx 和连接错误按退避重试"""
+    print("🔍 测试退避重试...")
+    scheduler = GitHubScheduler(["t"], FAST)
+    for attempt in range(8):
+        cap = min(FAST["backoffMax"], FAST["backoffBase"] * 2 ** attempt)
+        assert cap / 2 <= scheduler._backoff(attempt) <= cap
+
+    handler = sequence(httpx.Response(502), httpx.ConnectError("reset"), httpx.Response(503), httpx.Response(200))
+    with Upstream(handler) as upstream:
+        response = asyncio.run(scheduler.request("GET", "https://api.github.com/repos/o/r"))
+    assert response.status_code == 200 and len(upstream.requests) == 4
+    stats = scheduler.get_stats()
+    assert stats["retries"] == 3 and stats["server_errors"] == 2
+
+    # 重试耗尽时返回最后一次响应
+    with Upstream(sequence(httpx.Response(500))) as upstream:
+        response = asyncio.run(scheduler.request("GET", "https://api.github.com/repos/o/r"))
+    assert response.status_code == 500 and len(upstream.requests) == FAST["maxRetries"] + 1
+    print("   ✅ 退避重试后成功，重试耗尽时返回最后的响应")
+
+
+def test_token_rotation():
+    """额度耗尽或次级限速时切换 token，全部不可用且等待过久时抛出 RateLimitExceeded"""
+    print("🔍 测试 token 轮换...")
+    reset = str(int(time.time()) + 3600)
+
+    def handler(request):
+        if request.headers["Authorization"] == "token a":
+            return httpx.Response(403, headers={"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": reset,
+                                                "X-RateLimit-Limit": "5000"}, text="API rate limit exceeded")
+        if request.url.path.endswith("/limited"):
+            return httpx.Response(403, headers={"Retry-After": "60"}, text="secondary rate limit")
+        return httpx.Response(200, headers={"X-RateLimit-Remaining": "4999", "X-RateLimit-Limit": "5000"})
+
+    scheduler = GitHubScheduler(["a", "b"], {**FAST, "maxWaitSeconds": 5})
+    with Upstream(handler) as upstream:
+        async def run():
+            first = await scheduler.request("GET", "https://api.github.com/repos/o/r")
+            second = await scheduler.request("GET", "https://api.github.com/repos/o/r")
+            assert first.status_code == second.status_code == 200
+            assert upstream.auths() == ["token a", "token b", "token b"]
+            assert scheduler.get_budget("core")["exhausted_tokens"] == 1
+            # b 也被次级限速暂停 60 秒，超过最长等待时间
+            try:
+                await scheduler.request("GET", "https://api.github.com/limited")
+            except RateLimitExceeded as e:
+                assert e.resource == "core" and e.reset_in > 5
+            else:
+                raise AssertionError("应当抛出 RateLimitExceeded")
+
+        asyncio.run(run())
+    assert scheduler.get_stats()["rate_limited"] == 2
+
+    # 额度相同时在 token 间轮换
+    scheduler = GitHubScheduler(["c", "d"], FAST)
+    ok = httpx.Response(200, headers={"X-RateLimit-Remaining": "100"})
+    with Upstream(sequence(ok)) as upstream:
+        async def run_many():
+            for _ in range(4):
+                await scheduler.request("GET", "https://api.github.com/repos/o/r")
+
+        asyncio.run(run_many())
+    assert upstream.auths() == ["token c", "token d", "token c", "token d"]
+    print("   ✅ 耗尽的 token 被跳过，额度相同时轮换")
+
+
+def test_shared_client_uses_env_proxy():
+    """共享客户端与 httpx 默认客户端一样读取代理环境变量"""
+    print("🔍 测试代理环境变量...")
+    seen = []
+
+    class Proxy(BaseHTTPRequestHandler):
+        def do_GET(self):
+            seen.append(self.path)
+            self.send_response(200)
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"ok")
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Proxy)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    proxy = f"http://127.0.0.1:{server.server_address[1]}"
+    keys = ("HTTP_PROXY", "http_proxy", "NO_PROXY", "no_proxy", "ALL_PROXY", "all_proxy")
+    saved = {key: os.environ.pop(key) for key in keys if key in os.environ}
+    os.environ.update({"HTTP_PROXY": proxy, "NO_PROXY": "direct.invalid"})
+    try:
+        clients = HttpClients()
+
+        async def run():
+            client = clients.get("github")
+            response = await client.get("http://api.github.invalid/repos/o/r")
+            assert response.text == "ok"
+            try:
+                await client.get("http://direct.invalid/", timeout=2)
+            except httpx.HTTPError:
+                pass
+            await clients.aclose()
+
+        asyncio.run(run())
+    finally:
+        for key in ("HTTP_PROXY", "NO_PROXY"):
+            os.environ.pop(key, None)
+        os.environ.update(saved)
+        server.shutdown()
+        server.server_close()
+    assert seen == ["http://api.github.invalid/repos/o/r"], seen
+    assert clients.get_stats()["github"]["requests"] == 2
+    print("   ✅ 请求经代理发出，NO_PROXY 中的主机直连")
+
+
+def test_windowed_repos_reach_output():
+    """全局热门查询的结果 star 数都更高时，时间窗口和语言查询的项目仍能进入最终结果"""
+    print("🔍 测试抓取名额分配...")
+
+    def repo(full_name: str, stars: int) -> dict:
+        return {"full_name": full_name, "stargazers_count": stars}
+
+    def handler(request):
+        q, page = request.url.params["q"], int(request.url.params["page"])
+        if q.startswith("stars:>"):
+            items = [repo(f"big/r{i}", 100000 - i) for i in range((page - 1) * 5, page * 5)]
+        elif q.startswith("created:>"):
+            items = [repo("fresh/new", 300), repo("fresh/other", 150)]
+        else:
+            items = [repo("rust/tool", 200)]
+        return httpx.Response(200, json={"items": items})
+
+    settings = {**FETCH_DEFAULTS, "languages": ["Rust"], "windows": ["created"], "perPage": 5, "maxResults": 6}
+    with tempfile.TemporaryDirectory() as tmpdir, Upstream(handler) as upstream:
+        service = make_service(tmpdir)
+        original = github_module.load_fetch_settings
+        github_module.load_fetch_settings = lambda: dict(settings)
+        try:
+            repos = asyncio.run(service.fetch_trending_repositories())
+        finally:
+            github_module.load_fetch_settings = original
+    names = [r["full_name"] for r in repos]
+    assert names == ["big/r0", "big/r1", "big/r2", "fresh/new", "rust/tool", "fresh/other"], names
+    # top 查询翻到第 2 页（maxResults 6 > perPage 5），不足一页的查询不再翻页
+    assert len(upstream.requests) == 2 + 1 + 1
+
+    # 重复项目不占名额，命中完的查询把名额让给其他查询
+    pool = CandidatePool()
+    pool.add([repo("big/a", 900), repo("big/b", 800), repo("big/c", 700)], "top")
+    pool.add([repo("big/a", 901), repo("new/x", 50)], "pushed")
+    ranked = pool.ranked(4, ["top", "pushed"])
+    assert [r["full_name"] for r in ranked] == ["big/a", "big/b", "big/c", "new/x"]
+    assert ranked[0]["stargazers_count"] == 901
+    assert [r["full_name"] for r in pool.ranked(2, ["pushed", "top"])] == ["big/a", "big/b"]
+    assert len(pool.ranked()) == 4 and pool.sources("BIG/A") == ["top", "pushed"]
+    print("   ✅ 新近项目进入结果，按 star 数排序")
+
+
+def main():
+    print("=" * 50)
+    print("🚀 GitHub 请求测试")
+    print("=" * 50)
+    print()
+
+    tests = [
+        ("README 条件请求", test_readme_revalidation),
+        ("README 负缓存与过期回退", test_readme_missing_and_stale),
+        ("退避重试", test_retry_with_backoff),
+        ("token 轮换", test_token_rotation),
+        ("代理环境变量", test_shared_client_uses_env_proxy),
+        ("抓取名额分配", test_windowed_repos_reach_output),
+    ]
+
+    passed = 0
+    for name, test_func in tests:
+        try:
+            test_func()
+            passed += 1
+        except Exception as e:
+            print(f"   ❌ {name} 失败: {e}")
+        print()
+
+    print(f"总计: {passed}/{len(tests)} 项测试通过")
+    return 0 if passed == len(tests) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
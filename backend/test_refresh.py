@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+刷新流程测试
+
+在临时存储和桩 GitHub / AI 服务上验证：
+- 增量刷新：内容指纹不变的项目沿用上次的派生字段（含 AI 增强内容），只重新生成新增或变化的项目
+- README 预热：新上榜的优先、跳过未过期的缓存、并发受限，额度不足时停止，新的预热取消旧的
+- AI 增强：单个项目超时不影响其他项目，总期限到达时返回已完成的部分结果和每个项目的耗时
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import Future
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import services.refresh as refresh
+from models.schemas import ProjectCreate
+from services.github import GitHubService
+from services.readme_cache import ReadmeCache
+from services.readme_warmup import ReadmeWarmup
+from services.storage import StorageService
+from services.trends import TrendEngine
+
+
+def make_repo(full_name: str, stars: int, description: str = "a tool", pushed_at: str = "2026-01-01T00:00:00Z"):
+    return {
+        "full_name": full_name, "html_url": f"https://github.com/{full_name}", "description": description,
+        "language": "Python", "topics": ["cli"], "pushed_at": pushed_at,
+        "stargazers_count": stars, "forks_count": 1, "open_issues_count": 0,
+    }
+
+
+class FakeGitHub(GitHubService):
+    """桩 GitHub：返回预设的仓库列表，记录重新生成的项目"""
+
+    def __init__(self):
+        super().__init__(token="t")
+        self.repos = []
+        self.parsed = []
+
+    async def fetch_trending_repositories(self, days=None, per_page=None):
+        return list(self.repos)
+
+    def _parse_repository(self, repo):
+        self.parsed.append(repo["full_name"])
+        return super()._parse_repository(repo)
+
+
+class FakeAI:
+    """桩 AI 服务：每个项目一个请求，可为单个项目设置延迟"""
+
+    class Cache:
+        def flush_later(self) -> Future:
+            future = Future()
+            future.set_result(None)
+            return future
+
+    def __init__(self, delays=None):
+        self.delays = delays or {}
+        self.calls = []
+        self.cache = self.Cache()
+
+    def from_cache(self, project):
+        return None
+
+    def plan_batches(self, projects, batch_size, token_budget):
+        return [[i] for i in range(len(projects))]
+
+    async def enhance_batch(self, projects):
+        [project] = projects
+        self.calls.append(project.full_name)
+        await asyncio.sleep(self.delays.get(project.full_name, 0))
+        return [project.model_copy(update={"description": f"AI {project.full_name}", "ai_enhanced": True})]
+
+
+class FakeWarmup:
+    """桩 README 预热：只记录调用"""
+
+    def __init__(self):
+        self.started = []
+
+    def cancel(self) -> bool:
+        return False
+
+    def start(self, github_service, full_names, new_names=()) -> bool:
+        self.started.append((list(full_names), list(new_names)))
+        return True
+
+
+def run_refresh(github: FakeGitHub, storage: StorageService, ai_service=None) -> dict:
+    """以独立的趋势引擎和桩预热执行一次刷新"""
+    originals = refresh.get_trend_engine, refresh.get_readme_warmup
+    engine, warmup = TrendEngine(), FakeWarmup()
+    refresh.get_trend_engine, refresh.get_readme_warmup = (lambda: engine), (lambda: warmup)
+    try:
+        result = asyncio.run(refresh.refresh_projects(github, storage, ai_service))
+    finally:
+        refresh.get_trend_engine, refresh.get_readme_warmup = originals
+    result["warmup"] = warmup.started
+    return result
+
+
+def test_incremental_refresh_reuses_unchanged():
+    """指纹不变的项目沿用派生字段并更新 stars，描述变化和新上榜的项目重新生成和 AI 增强"""
+    print("🔍 测试增量刷新...")
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = StorageService(tmp)
+        github, ai = FakeGitHub(), FakeAI()
+        github.repos = [make_repo("o/keep", 300), make_repo("o/edit", 200), make_repo("o/push", 100)]
+        first = run_refresh(github, storage, ai)
+        assert (first["reused"], first["recomputed"], first["ai_enhanced"]) == (0, 3, 3)
+        assert github.parsed == ["o/keep", "o/edit", "o/push"]
+
+        github.parsed, ai.calls = [], []
+        github.repos = [
+            make_repo("o/keep", 350),
+            make_repo("o/edit", 210, description="a better tool"),
+            make_repo("o/push", 120, pushed_at="2026-02-01T00:00:00Z"),
+            make_repo("o/new", 90),
+        ]
+        second = run_refresh(github, storage, ai)
+        assert (second["reused"], second["recomputed"], second["ai_enhanced"]) == (1, 3, 3)
+        assert github.parsed == ai.calls == ["o/edit", "o/push", "o/new"]
+
+        projects = {p.full_name: p for p in storage.get_projects()}
+        keep = projects["o/keep"]
+        assert keep.stars == 350 and keep.ai_enhanced and keep.description == "AI o/keep"
+        assert all(p.ai_enhanced for p in projects.values())
+        assert second["warmup"] == [(["o/keep", "o/edit", "o/push", "o/new"], ["o/new"])]
+    print("   ✅ 复用 1 个，重新计算 3 个")
+
+
+class WarmupGitHub:
+    """桩 GitHub：记录 README 请求顺序与最大并发，remaining 模拟 core 剩余额度"""
+
+    class Scheduler:
+        def __init__(self, github):
+            self.github = github
+
+        def get_budget(self, resource):
+            return {"remaining": self.github.remaining, "limit": 5000}
+
+    def __init__(self, tmpdir: str, delay: float = 0.02):
+        self.readme_cache = ReadmeCache(tmpdir)
+        self.scheduler = self.Scheduler(self)
+        self.delay = delay
+        self.remaining = 5000
+        self.fetched = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def prefetch_readmes(self, names):
+        return False
+
+    async def fetch_readme(self, full_name):
+        self.fetched.append(full_name)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight -= 1
+        self.remaining -= 1
+        if full_name.endswith("/none"):
+            self.readme_cache.put_missing(full_name)
+        else:
+            self.readme_cache.put(full_name, f"# {full_name}")
+
+
+def test_readme_warmup():
+    """新上榜的项目先获取，跳过未过期的缓存，并发不超过配置，额度不足时停止，重新开始时取消旧任务"""
+    print("🔍 测试 README 预热...")
+    names = [f"o/r{i}" for i in range(8)] + ["o/none"]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        github = WarmupGitHub(tmp)
+        github.readme_cache.put("o/r1", "# cached")
+        warmup = ReadmeWarmup({"concurrency": 2})
+
+        async def run():
+            assert warmup.start(github, names, ["o/r5", "O/NONE"])
+            await warmup._task
+
+        asyncio.run(run())
+        progress = warmup.get_progress()
+        assert github.fetched[:2] == ["o/r5", "o/none"] and "o/r1" not in github.fetched
+        assert github.max_in_flight == 2
+        assert progress["status"] == "done" and progress["new"] == 2
+        assert (progress["completed"], progress["fetched"], progress["missing"], progress["skipped"]) == (9, 7, 1, 1)
+        assert github.readme_cache.fresh_state("o/r7") is not None
+
+    # 剩余额度降到保留值（minRemaining）时停止
+    with tempfile.TemporaryDirectory() as tmp:
+        github = WarmupGitHub(tmp)
+        github.remaining = 103
+        warmup = ReadmeWarmup({"concurrency": 1, "minRemaining": 100})
+
+        async def run_budget():
+            warmup.start(github, names)
+            await warmup._task
+
+        asyncio.run(run_budget())
+        assert warmup.get_progress()["status"] == "budget_exhausted" and len(github.fetched) == 3
+
+    # 新的预热开始时取消正在进行的预热
+    with tempfile.TemporaryDirectory() as tmp:
+        github = WarmupGitHub(tmp, delay=0.2)
+        warmup = ReadmeWarmup({"concurrency": 1})
+
+        async def run_cancel():
+            warmup.start(github, names)
+            await asyncio.sleep(0.05)
+            first = warmup._progress
+            warmup.start(github, ["o/other"])
+            await warmup._task
+            return first
+
+        first = asyncio.run(run_cancel())
+        assert first["status"] == "cancelled" and first["completed"] == 0
+        assert warmup.get_progress()["status"] == "done"
+        assert github.fetched == ["o/r0", "o/other"]
+    print("   ✅ 新上榜优先，额度不足时停止，可取消")
+
+
+def test_enhance_deadline_returns_partial():
+    """总期限到达时已完成的项目保留增强结果，其余保留原数据并标记为 deadline"""
+    print("🔍 测试 AI 增强总期限...")
+    projects = [
+        ProjectCreate(name=name, full_name=f"o/{name}", url="", description=name)
+        for name in ("fast", "hang", "slow", "queued")
+    ]
+    ai = FakeAI({"o/fast": 0.05, "o/hang": 5, "o/slow": 5, "o/queued": 0})
+    published = []
+    settings = {"concurrency": 1, "projectTimeoutSeconds": 0.3, "deadlineSeconds": 0.5}
+
+    started = time.monotonic()
+    results, enhanced, timings = asyncio.run(refresh.enhance_projects(
+        ai, projects, settings, on_enhanced=lambda p, status: published.append((p.full_name, status))
+    ))
+    elapsed = time.monotonic() - started
+
+    assert elapsed < 1.0, elapsed
+    assert enhanced == 1 and published == [("o/fast", "enhanced")]
+    assert results[0].ai_enhanced and results[0].description == "AI o/fast"
+    assert results[1:] == projects[1:]
+    assert [t["status"] for t in timings] == ["enhanced", "timeout", "deadline", "deadline"]
+    assert [t["full_name"] for t in timings] == [p.full_name for p in projects]
+    assert 0.25 <= timings[1]["elapsed_s"] < 0.45
+    assert timings[3]["wait_s"] is None and ai.calls == ["o/fast", "o/hang", "o/slow"]
+    print(f"   ✅ {elapsed:.2f}s 返回，1 个增强，1 个超时，2 个未完成")
+
+
+def main():
+    print("=" * 50)
+    print("🚀 刷新流程测试")
+    print("=" * 50)
+    print()
+
+    tests = [
+        ("增量刷新", test_incremental_refresh_reuses_unchanged),
+        ("README 预热", test_readme_warmup),
+        ("AI 增强总期限", test_enhance_deadline_returns_partial),
+    ]
+
+    passed = 0
+    for name, test_func in tests:
+        try:
+            test_func()
+            passed += 1
+        except Exception as e:
+            print(f"   ❌ {name} 失败: {e}")
+        print()
+
+    print(f"总计: {passed}/{len(tests)} 项测试通过")
+    return 0 if passed == len(tests) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
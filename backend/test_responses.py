@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+响应缓存与分页测试
+
+- ResponseCache：同一版本只序列化一次，按 Accept-Encoding 压缩，ETag 匹配时返回 304，
+  版本变化后 ETag 随之变化；筛选 / 分页组合不会挤掉默认响应
+- 游标分页：游标可逆、格式错误时报错，逐页读取覆盖全部项目且不重复
+- 历史导出：NDJSON 每行一周、CSV 每行一个项目-周，逐条从存储读取
+"""
+
+import asyncio
+import csv
+import gzip
+import io
+import json
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from starlette.requests import Request
+
+import routers.history as history_router
+from fastapi import HTTPException
+from models.schemas import HistoryRecord, ProjectCreate
+from services.pagination import decode_cursor, encode_cursor, next_cursor
+from services.response_cache import ResponseCache
+from services.storage import StorageService
+
+
+def make_request(**headers) -> Request:
+    raw = [(name.replace("_", "-").encode("latin-1"), value.encode("latin-1")) for name, value in headers.items()]
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": raw})
+
+
+class Builder:
+    """记录构建（序列化）次数"""
+
+    def __init__(self, size: int = 100):
+        self.size = size
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return {"projects": [{"name": f"repo-{i}", "description": "x" * 20} for i in range(self.size)],
+                "build": self.calls}
+
+
+def test_etag_and_not_modified():
+    """相同版本复用序列化结果，If-None-Match 匹配时返回 304"""
+    print("🔍 测试 ETag / 304...")
+    cache = ResponseCache()
+    build = Builder()
+
+    first = cache.respond(make_request(accept_encoding="gzip"), "projects", 1, build)
+    assert first.status_code == 200 and first.headers["content-encoding"] == "gzip"
+    assert gzip.decompress(first.body).startswith(b'{"projects":')
+    etag = first.headers["etag"]
+
+    plain = cache.respond(make_request(), "projects", 1, build)
+    assert "content-encoding" not in plain.headers
+    assert plain.headers["etag"] != etag and plain.headers["etag"] == etag.replace("-gzip", "")
+    assert build.calls == 1
+
+    # 带或不带压缩后缀的 ETag 都视为同一表示
+    for tag in (etag, plain.headers["etag"], f"W/{etag}"):
+        response = cache.respond(make_request(if_none_match=tag, accept_encoding="gzip"), "projects", 1, build)
+        assert response.status_code == 304 and not response.body
+    assert cache.get_stats()["not_modified"] == 3
+
+    # ETag 由内容计算：版本变化且内容变化时不再匹配
+    changed = cache.respond(make_request(if_none_match=etag, accept_encoding="gzip"), "projects", 2, build)
+    assert changed.status_code == 200 and changed.headers["etag"] != etag
+    assert build.calls == 2
+
+    # version 为 None 时不缓存
+    cache.respond(make_request(), "uncached", None, build)
+    cache.respond(make_request(), "uncached", None, build)
+    assert build.calls == 4
+
+    small = cache.respond(make_request(accept_encoding="gzip"), "small", 1, Builder(size=1))
+    assert "content-encoding" not in small.headers
+    print("   ✅ 序列化 1 次，304 与版本失效正常")
+
+
+def test_variants_do_not_evict_defaults():
+    """大量筛选 / 分页组合不会挤掉默认响应"""
+    print("🔍 测试参数组合缓存...")
+    cache = ResponseCache(max_entries=2, max_variants=4)
+    build = Builder()
+    cache.respond(make_request(), "projects", 1, build)
+    for page in range(20):
+        cache.respond(make_request(), ("projects", page), 1, Builder(), variant=True)
+    cache.respond(make_request(), "projects", 1, build)
+    assert build.calls == 1
+    stats = cache.get_stats()
+    assert stats["entries"] == 1 and stats["variant_entries"] == 4
+    print("   ✅ 默认响应保持缓存")
+
+
+def test_cursor_pagination():
+    """游标逐页读取覆盖全部结果，不重复"""
+    print("🔍 测试游标分页...")
+    assert decode_cursor(None) == 0 and decode_cursor("") == 0
+    assert all(decode_cursor(encode_cursor(n)) == n for n in (0, 1, 37, 10 ** 6))
+    for bad in ("!!!", encode_cursor(5)[:-1] + "*", "eDo1"):
+        try:
+            decode_cursor(bad)
+        except ValueError:
+            continue
+        raise AssertionError(f"游标 {bad} 应当无效")
+    assert next_cursor(20, 10, 30) is None and decode_cursor(next_cursor(0, 10, 30)) == 10
+
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = StorageService(tmp)
+        storage.save_projects([
+            ProjectCreate(
+                name=f"repo-{i}", full_name=f"owner/repo-{i}", url=f"https://github.com/owner/repo-{i}",
+                language="Python" if i % 3 else "Go", stars=1000 - i * 7 % 50,
+            )
+            for i in range(23)
+        ])
+        for query in ({}, {"language": "python", "sort": "stars", "order": "desc"}):
+            expected, total = storage.query_projects(**query)
+            seen, cursor = [], None
+            while True:
+                offset = decode_cursor(cursor)
+                page, page_total = storage.query_projects(offset=offset, limit=5, **query)
+                assert page_total == total
+                seen.extend(page)
+                cursor = next_cursor(offset, len(page), total)
+                if cursor is None:
+                    break
+            assert [p.full_name for p in seen] == [p.full_name for p in expected]
+            assert len({p.full_name for p in seen}) == total
+        assert total == 15
+    print("   ✅ 分页结果与一次性查询一致")
+
+
+def test_history_export_streams_records():
+    """导出按周逐条读取存储：取到第一行时只解码了一周"""
+    print("🔍 测试历史导出...")
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = StorageService(tmp)
+        for week in range(1, 6):
+            projects = [
+                ProjectCreate(name=f"repo-{i}", full_name=f"owner/repo-{i}", url="", stars=week * 10 + i).model_dump()
+                for i in range(3)
+            ]
+            storage.add_history_record(HistoryRecord(
+                id=f"2026-W{week}", week=f"第{week}周", date=f"2026-01-0{week}",
+                total_projects=len(projects), projects=projects
+            ))
+        storage.add_history_record(HistoryRecord(
+            id="2025-W52", week="", date="2025-12-28", total_projects=1, projects=["legacy-repo"]
+        ))
+
+        decoded = []
+        original_decode = storage._decode_record
+        storage._decode_record = lambda data: decoded.append(data["id"]) or original_decode(data)
+        original_storage = history_router.storage
+        history_router.storage = storage
+        try:
+            lines = history_router._export_ndjson()
+            first = json.loads(next(lines))
+            assert first["id"] == "2025-W52" and decoded == ["2025-W52"]
+            rest = [json.loads(line) for line in lines]
+            assert [r["id"] for r in rest] == [f"2026-W{w}" for w in range(5, 0, -1)]
+            assert rest[0]["projects"][2]["stars"] == 52
+
+            rows = list(csv.reader(io.StringIO("".join(history_router._export_csv()))))
+            assert rows[0] == list(history_router.EXPORT_CSV_COLUMNS)
+            assert len(rows) == 1 + 1 + 5 * 3
+            assert rows[1][:5] == ["2025-W52", "", "2025-12-28", "1", "legacy-repo"]
+            assert rows[2][:6] == ["2026-W5", "第5周", "2026-01-05", "1", "repo-0", "owner/repo-0"]
+
+            response = asyncio.run(history_router.export_history(format="csv"))
+            assert response.media_type.startswith("text/csv")
+            try:
+                asyncio.run(history_router.export_history(format="xml"))
+            except HTTPException as e:
+                assert e.status_code == 400
+            else:
+                raise AssertionError("不支持的格式应当返回 400")
+        finally:
+            history_router.storage = original_storage
+    print("   ✅ NDJSON / CSV 逐周输出，内容完整")
+
+
+def main():
+    print("=" * 50)
+    print("🚀 响应缓存与分页测试")
+    print("=" * 50)
+    print()
+
+    tests = [
+        ("ETag / 304", test_etag_and_not_modified),
+        ("参数组合缓存", test_variants_do_not_evict_defaults),
+        ("游标分页", test_cursor_pagination),
+        ("历史导出", test_history_export_streams_records),
+    ]
+
+    passed = 0
+    for name, test_func in tests:
+        try:
+            test_func()
+            passed += 1
+        except Exception as e:
+            print(f"   ❌ {name} 失败: {e}")
+        print()
+
+    print(f"总计: {passed}/{len(tests)} 项测试通过")
+    return 0 if passed == len(tests) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+请求合并（single-flight）测试
+
+验证 N 个并发的相同请求只触发一次上游调用：
+- do()：并发刷新共享同一次执行和结果，某个调用方断开不影响其他调用方
+- start()：并发的 README 异步请求得到同一个任务 ID，结果可被多次读取，过期后清除
+- GitHubService.fetch_readme()：所有调用方共用同一次获取
+- /refresh 与 /refresh-ai（不同 provider / API Key）同时请求时只执行一次刷新
+"""
+
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import routers.projects as projects_router
+from services.github import GitHubService
+from services.singleflight import SingleFlight, get_singleflight
+
+CONCURRENT = 10
+
+
+class Upstream:
+    """模拟上游：记录调用次数，耗时一段时间后返回"""
+
+    def __init__(self, delay: float = 0.05):
+        self.delay = delay
+        self.calls = 0
+
+    async def fetch(self, value):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return {"value": value, "call": self.calls}
+
+
+def test_concurrent_do_single_upstream_call():
+    """并发的相同 do() 只执行一次"""
+    print(f"🔍 测试 {CONCURRENT} 个并发刷新...")
+
+    async def run():
+        flight = SingleFlight()
+        upstream = Upstream()
+        results = await asyncio.gather(*(
+            flight.do(("refresh",), lambda: upstream.fetch("projects"))
+            for _ in range(CONCURRENT)
+        ))
+        assert upstream.calls == 1, upstream.calls
+        assert all(r is results[0] for r in results)
+
+        stats = flight.get_stats()
+        assert stats["operations"]["refresh"] == {"calls": CONCURRENT, "executed": 1, "coalesced": CONCURRENT - 1}
+        assert stats["in_flight"] == 0
+
+        # 完成后再次调用会重新执行
+        await flight.do(("refresh",), lambda: upstream.fetch("projects"))
+        assert upstream.calls == 2
+
+        # 不同参数不合并
+        await asyncio.gather(
+            flight.do(("refresh-ai", "qwen"), lambda: upstream.fetch("a")),
+            flight.do(("refresh-ai", "openai"), lambda: upstream.fetch("b")),
+        )
+        assert upstream.calls == 4
+
+    asyncio.run(run())
+    print(f"   ✅ {CONCURRENT} 个请求只调用上游 1 次")
+
+
+def test_cancelled_caller_does_not_cancel_flight():
+    """某个调用方被取消时，共享的执行继续，其他调用方正常拿到结果"""
+    print("🔍 测试调用方断开...")
+
+    async def run():
+        flight = SingleFlight()
+        upstream = Upstream(delay=0.1)
+        first = asyncio.ensure_future(flight.do(("refresh",), lambda: upstream.fetch("x")))
+        second = asyncio.ensure_future(flight.do(("refresh",), lambda: upstream.fetch("x")))
+        await asyncio.sleep(0.02)
+        first.cancel()
+        result = await second
+        assert result["value"] == "x" and upstream.calls == 1
+        assert first.cancelled()
+
+    asyncio.run(run())
+    print("   ✅ 其他调用方不受影响")
+
+
+def test_concurrent_start_shares_task_id():
+    """并发的相同 start() 共享任务 ID，结果可重复读取并按 TTL 过期"""
+    print(f"🔍 测试 {CONCURRENT} 个并发 README 异步请求...")
+
+    async def run():
+        flight = SingleFlight(result_ttl=0.2)
+        upstream = Upstream()
+        ids = [flight.start(("readme", "owner/repo"), lambda: upstream.fetch("# README")) for _ in range(CONCURRENT)]
+        assert len(set(ids)) == 1, ids
+        assert flight.result(ids[0]) == ("pending", None)
+
+        await asyncio.sleep(upstream.delay * 2)
+        assert upstream.calls == 1
+        for _ in range(3):
+            state, result = flight.result(ids[0])
+            assert state == "done" and result["value"] == "# README"
+
+        await asyncio.sleep(0.25)
+        assert flight.result(ids[0]) == ("unknown", None)
+        assert flight.get_stats()["stored_results"] == 0
+
+    asyncio.run(run())
+    print(f"   ✅ {CONCURRENT} 个请求共享 1 个任务，结果可重复读取")
+
+
+def test_failure_is_shared():
+    """执行失败时所有等待的调用方都收到异常，之后可以重试"""
+    print("🔍 测试失败传递...")
+
+    async def run():
+        flight = SingleFlight()
+        calls = 0
+
+        async def failing():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.02)
+            raise RuntimeError("upstream down")
+
+        results = await asyncio.gather(
+            *(flight.do(("refresh",), failing) for _ in range(CONCURRENT)), return_exceptions=True
+        )
+        assert calls == 1
+        assert all(isinstance(r, RuntimeError) for r in results)
+
+        await asyncio.gather(flight.do(("refresh",), failing), return_exceptions=True)
+        assert calls == 2
+
+    asyncio.run(run())
+    print("   ✅ 异常共享，失败后可重试")
+
+
+def test_fetch_readme_coalesced():
+    """并发的 fetch_readme（含 readme-async 后台任务）只获取一次"""
+    print(f"🔍 测试 {CONCURRENT} 个并发 fetch_readme...")
+
+    async def run():
+        service = GitHubService()
+        upstream = Upstream()
+        service._fetch_readme = lambda owner, repo: upstream.fetch(f"# {owner}/{repo}")
+        flight = get_singleflight()
+        task_id = flight.start(("readme-async", "owner/repo"), lambda: service.fetch_readme("owner/repo"))
+        results = await asyncio.gather(*(
+            service.fetch_readme(name) for name in ["owner/repo", "Owner/Repo"] * (CONCURRENT // 2)
+        ))
+        assert upstream.calls == 1, upstream.calls
+        assert all(r is results[0] for r in results)
+        await asyncio.sleep(0)
+        assert flight.result(task_id) == ("done", results[0])
+
+    asyncio.run(run())
+    print("   ✅ 页面请求与后台任务共用一次获取")
+
+def test_refresh_endpoints_share_one_flight():
+    """普通刷新和不同参数的 AI 刷新同时请求时共用一次刷新"""
+    print("🔍 测试刷新接口合并...")
+    upstream = Upstream()
+
+    async def fake_refresh(github_service, storage, ai_service=None, on_enhanced=None):
+        await upstream.fetch("refresh")
+        return {"projects": [], "saved": {"last_updated": "now"}, "reused": 0, "recomputed": 0,
+                "ai_used": ai_service is not None, "ai_enhanced": 0, "ai_timings": []}
+
+    async def run():
+        original = projects_router.run_refresh
+        projects_router.run_refresh = fake_refresh
+        try:
+            return await asyncio.gather(
+                projects_router.refresh_projects(),
+                projects_router.refresh_projects_ai(provider="qwen", api_key="key-a"),
+                projects_router.refresh_projects_ai(provider="openai", api_key="key-b"),
+            )
+        finally:
+            projects_router.run_refresh = original
+
+    plain, ai_a, ai_b = asyncio.run(run())
+    assert upstream.calls == 1, upstream.calls
+    assert plain.success and ai_a["ai_enhanced"] is False and ai_a == ai_b
+    print("   ✅ 3 个刷新请求只执行 1 次刷新")
+
+
+def main():
+    print("=" * 50)
+    print("🚀 请求合并测试")
+    print("=" * 50)
+    print()
+
+    tests = [
+        ("并发刷新合并", test_concurrent_do_single_upstream_call),
+        ("调用方断开", test_cancelled_caller_does_not_cancel_flight),
+        ("README 任务共享", test_concurrent_start_shares_task_id),
+        ("失败传递", test_failure_is_shared),
+        ("README 获取合并", test_fetch_readme_coalesced),
+        ("刷新接口合并", test_refresh_endpoints_share_one_flight),
+    ]
+
+    passed = 0
+    for name, test_func in tests:
+        try:
+            test_func()
+            passed += 1
+        except Exception as e:
+            print(f"   ❌ {name} 失败: {e}")
+        print()
+
+    print(f"总计: {passed}/{len(tests)} 项测试通过")
+    return 0 if passed == len(tests) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,429 @@
+#!/usr/bin/env python3
+"""
+存储层测试
+
+多个线程同时执行“刷新”（保存项目 + 添加历史记录）和读取，验证：
+- 读者不会读到半个文件或回退到空数据（无撕裂读）
+- 每次刷新写入的历史记录都不会丢失
+- 异步写方法（含配置保存）不阻塞事件循环
+
+以及：
+- 内存快照在文件 (mtime_ns, size) 变化时重新读取，未变化时命中
+- 按名称查找：精确匹配优先，重复的短名称取 stars 最多的仓库
+- 从 JSON 数据目录导入 SQLite（全部历史，不改动源目录）
+- 追加日志的删除标记（tombstone）与压缩
+- 项目字典编码解码后与原始项目一致
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import routers.config as config_router
+from models.schemas import ProjectCreate, HistoryRecord
+from services.history_codec import ProjectDictionary, decode_stats, encode_stats
+from services.stats import compute_stats
+from services.storage import StorageService
+from services.sqlite_storage import SQLiteStorageService
+from services.writer import get_writer
+
+REFRESHES = 40
+READERS = 8
+PROJECTS_PER_REFRESH = 30
+
+
+def make_projects(tag: int):
+    """同一次刷新的所有项目带相同的 tag，读者据此判断是否读到混合数据"""
+    return [
+        ProjectCreate(
+            name=f"repo-{i}",
+            full_name=f"owner-{i}/repo-{i}",
+            url=f"https://github.com/owner-{i}/repo-{i}",
+            description=f"refresh-{tag}",
+            stars=tag * 100 + i,
+        )
+        for i in range(PROJECTS_PER_REFRESH)
+    ]
+
+
+def run_stress(storage: StorageService, raw_file: str = None):
+    """并发刷新与读取，返回发现的错误列表"""
+    errors = []
+    stop = threading.Event()
+    first_write = threading.Event()
+
+    def refresher(tag: int):
+        try:
+            storage.save_projects(make_projects(tag))
+            first_write.set()
+            storage.add_history_record(HistoryRecord(
+                id=f"2026-W{tag}",
+                week=f"第{tag}周",
+                date="2026-01-01",
+                total_projects=PROJECTS_PER_REFRESH,
+                projects=[p.model_dump() for p in make_projects(tag)]
+            ))
+        except Exception as e:
+            errors.append(f"refresh {tag}: {e}")
+
+    def reader():
+        first_write.wait()
+        while not stop.is_set():
+            projects = storage.get_projects()
+            tags = {p.description for p in projects}
+            if len(projects) != PROJECTS_PER_REFRESH or len(tags) != 1:
+                errors.append(f"torn read: {len(projects)} projects, tags={tags}")
+                return
+            if raw_file:
+                try:
+                    with open(raw_file, "r", encoding="utf-8") as f:
+                        if len(json.load(f)["projects"]) != PROJECTS_PER_REFRESH:
+                            errors.append("torn file read")
+                            return
+                except ValueError as e:
+                    errors.append(f"torn file read: {e}")
+                    return
+
+    readers = [threading.Thread(target=reader) for _ in range(READERS)]
+    refreshers = [threading.Thread(target=refresher, args=(tag,)) for tag in range(REFRESHES)]
+    for t in readers + refreshers:
+        t.start()
+    for t in refreshers:
+        t.join()
+    stop.set()
+    for t in readers:
+        t.join()
+
+    history_ids = {h.id for h in storage.load_history()}
+    missing = {f"2026-W{tag}" for tag in range(REFRESHES)} - history_ids
+    if missing:
+        errors.append(f"lost history records: {sorted(missing)}")
+    return errors
+
+
+def test_json_storage_concurrent_refresh():
+    """JSON 存储并发刷新"""
+    print("🔍 测试 JSON 存储并发刷新...")
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = StorageService(tmp, max_history=REFRESHES)
+        errors = run_stress(storage, raw_file=storage.projects_file)
+        assert not errors, errors[:5]
+
+        # 新实例从磁盘读取，结果一致
+        reloaded = StorageService(tmp, max_history=REFRESHES)
+        assert len(reloaded.load_history()) == REFRESHES
+    print(f"   ✅ {REFRESHES} 次并发刷新无撕裂读、无丢失")
+
+
+def test_sqlite_storage_concurrent_refresh():
+    """SQLite 存储并发刷新"""
+    print("🔍 测试 SQLite 存储并发刷新...")
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = SQLiteStorageService(os.path.join(tmp, "trending.db"))
+        errors = run_stress(storage)
+        assert not errors, errors[:5]
+    print(f"   ✅ {REFRESHES} 次并发刷新无撕裂读、无丢失")
+
+
+def test_concurrent_delete_and_refresh():
+    """删除历史记录与刷新并发执行"""
+    print("🔍 测试删除与刷新并发...")
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = StorageService(tmp, max_history=REFRESHES * 2)
+        for tag in range(REFRESHES):
+            storage.add_history_record(HistoryRecord(
+                id=f"old-{tag}", week="", date="", total_projects=0, projects=[]
+            ))
+
+        threads = [
+            threading.Thread(target=storage.delete_history_record, args=(f"old-{tag}",))
+            for tag in range(REFRESHES)
+        ] + [
+            threading.Thread(target=storage.add_history_record, args=(HistoryRecord(
+                id=f"new-{tag}", week="", date="", total_projects=0, projects=[]
+            ),))
+            for tag in range(REFRESHES)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        ids = {h.id for h in StorageService(tmp, max_history=REFRESHES * 2).load_history()}
+        assert ids == {f"new-{tag}" for tag in range(REFRESHES)}, sorted(ids)
+    print("   ✅ 删除与新增互不覆盖")
+
+
+def test_async_writes_do_not_block_loop():
+    """异步写方法等待写线程期间事件循环继续运行"""
+    print("🔍 测试异步写入...")
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = StorageService(tmp)
+        record = HistoryRecord(id="2026-W1", week="", date="", total_projects=0, projects=[])
+
+        async def run():
+            ticks = 0
+
+            async def ticker():
+                nonlocal ticks
+                while True:
+                    await asyncio.sleep(0.01)
+                    ticks += 1
+
+            task = asyncio.create_task(ticker())
+            # 先让写线程忙 0.3 秒
+            storage._writer.submit(lambda: time.sleep(0.3))
+            data = await storage.save_projects_async(make_projects(1))
+            await storage.add_history_record_async(record)
+            deleted = await storage.delete_history_record_async(record.id)
+            task.cancel()
+            return data, deleted, ticks
+
+        data, deleted, ticks = asyncio.run(run())
+        assert data["total_projects"] == PROJECTS_PER_REFRESH and deleted
+        assert ticks >= 10, ticks
+        assert len(StorageService(tmp).get_projects()) == PROJECTS_PER_REFRESH
+        assert StorageService(tmp).load_history() == []
+    print(f"   ✅ 等待写入期间事件循环运行了 {ticks} 次")
+
+def test_async_config_save_does_not_block_loop():
+    """配置保存等待写线程期间事件循环继续运行，并与已有配置合并"""
+    print("🔍 测试异步保存配置...")
+    original = config_router.CONFIG_FILE
+    with tempfile.TemporaryDirectory() as tmp:
+        config_router.CONFIG_FILE = os.path.join(tmp, "config.json")
+        try:
+            with open(config_router.CONFIG_FILE, "w", encoding="utf-8") as f:
+                json.dump({"ai": {"provider": "qwen"}, "github": {"token": "old"}}, f)
+
+            async def run():
+                ticks = 0
+
+                async def ticker():
+                    nonlocal ticks
+                    while True:
+                        await asyncio.sleep(0.01)
+                        ticks += 1
+
+                task = asyncio.create_task(ticker())
+                get_writer().submit(lambda: time.sleep(0.3))
+                await config_router.save_config_async({"github": {"token": "new"}})
+                task.cancel()
+                return ticks
+
+            ticks = asyncio.run(run())
+            assert ticks >= 10, ticks
+            assert config_router.load_config() == {"ai": {"provider": "qwen"}, "github": {"token": "new"}}
+        finally:
+            config_router.CONFIG_FILE = original
+    print(f"   ✅ 等待写入期间事件循环运行了 {ticks} 次")
+
+
+def test_snapshot_invalidated_by_signature():
+    """快照按 (mtime_ns, size) 失效：命中时复用已解析的对象，文件被外部改写后重新读取"""
+    print("🔍 测试内存快照失效...")
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = StorageService(tmp)
+        storage.save_projects(make_projects(1))
+        storage.add_history_record(HistoryRecord(id="2026-W1", week="", date="", total_projects=0, projects=[]))
+
+        # 写入后发布新快照，读取直接命中
+        history_misses = storage.get_cache_stats()["history"]["misses"]
+        first = storage.get_projects()
+        assert all(a is b for a, b in zip(first, storage.get_projects()))
+        assert storage.load_history()[0] is storage.load_history()[0]
+        stats = storage.get_cache_stats()
+        assert stats["projects"]["hits"] == 2 and stats["projects"]["misses"] == 0
+        assert stats["history"]["hits"] >= 2 and stats["history"]["misses"] == history_misses
+
+        def rewrite(description: str, mtime_ns: int) -> None:
+            with open(storage.projects_file, encoding="utf-8") as f:
+                data = json.load(f)
+            data["projects"][0]["description"] = description
+            with open(storage.projects_file, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.utime(storage.projects_file, ns=(mtime_ns, mtime_ns))
+
+        # 大小不变、mtime 变化
+        mtime_ns = os.stat(storage.projects_file).st_mtime_ns
+        rewrite("external!", mtime_ns + 10 ** 9)
+        assert storage.get_projects()[0].description == "external!"
+        # mtime 不变、大小变化
+        rewrite("external, longer", mtime_ns + 10 ** 9)
+        assert storage.get_projects()[0].description == "external, longer"
+        assert storage.get_projects()[0] is storage.get_projects()[0]
+
+        stats = storage.get_cache_stats()["projects"]
+        assert stats["misses"] == 2 and stats["hits"] == 4 and stats["cached"]
+    print("   ✅ 未变化时命中快照，mtime 或大小变化时重新读取")
+
+
+def make_record(record_id: str, tag: int) -> HistoryRecord:
+    return HistoryRecord(
+        id=record_id, week=record_id, date="2026-01-01", total_projects=PROJECTS_PER_REFRESH,
+        projects=[p.model_dump() for p in make_projects(tag)]
+    )
+
+
+def test_find_project_resolves_duplicate_names():
+    """短名称对应多个仓库时取 stars 最多的，stars 相同按 full_name 升序；精确匹配优先于大小写不敏感"""
+    print("🔍 测试按名称查找项目...")
+
+    def project(full_name: str, stars: int) -> ProjectCreate:
+        return ProjectCreate(name=full_name.split("/")[1], full_name=full_name,
+                             url=f"https://github.com/{full_name}", stars=stars)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = StorageService(tmp)
+        storage.save_projects([
+            project("small/tool", 10),
+            project("big/tool", 500),
+            project("zeta/lib", 100),
+            project("alpha/lib", 100),
+            project("owner/Widget", 1),
+            project("other/widget", 50),
+        ])
+        assert storage.find_project("tool").full_name == "big/tool"
+        assert storage.find_project("small/tool").full_name == "small/tool"
+        assert storage.find_project("SMALL/TOOL").full_name == "small/tool"
+        assert storage.find_project("lib").full_name == "alpha/lib"
+        # 精确匹配优先于 stars 更多的大小写不敏感匹配
+        assert storage.find_project("Widget").full_name == "owner/Widget"
+        assert storage.find_project("WIDGET").full_name == "other/widget"
+        assert storage.find_project("missing") is None
+
+        # 重新加载后结果不变
+        assert StorageService(tmp).find_project("tool").full_name == "big/tool"
+    print("   ✅ 重复短名称的解析结果确定")
+
+
+def test_sqlite_import_from_json():
+    """导入 JSON 数据目录的全部历史（不受保留周数限制），不改写源目录"""
+    print("🔍 测试导入 SQLite...")
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "json")
+        storage = StorageService(source, max_history=20)
+        storage.save_projects(make_projects(7))
+        for week in range(15):
+            storage.add_history_record(make_record(f"2026-W{week:02d}", week))
+        files = {name: os.path.getmtime(os.path.join(source, name)) for name in os.listdir(source)}
+
+        db = SQLiteStorageService(os.path.join(tmp, "trending.db"))
+        assert db.import_from_json(source) == 15
+        assert [h.id for h in db.load_history()] == [h.id for h in storage.load_history()]
+        assert db.load_history()[0].projects == storage.load_history()[0].projects
+        assert [p.full_name for p in db.get_projects()] == [p.full_name for p in storage.get_projects()]
+        assert {name: os.path.getmtime(os.path.join(source, name)) for name in os.listdir(source)} == files
+
+        # 旧版 history.json 直接读取，不在源目录迁移为 history.jsonl
+        legacy = os.path.join(tmp, "legacy")
+        os.makedirs(legacy)
+        with open(os.path.join(legacy, "history.json"), "w", encoding="utf-8") as f:
+            json.dump({"history": [make_record(f"old-{i}", i).model_dump() for i in range(3)]}, f)
+        db = SQLiteStorageService(os.path.join(tmp, "legacy.db"))
+        assert db.import_from_json(legacy) == 3
+        assert sorted(os.listdir(legacy)) == ["history.json"]
+    print("   ✅ 导入 15 周历史，源目录未改动")
+
+
+def test_history_log_tombstones_and_compaction():
+    """删除写入 tombstone，压缩后日志只保留每周最后一次写入"""
+    print("🔍 测试历史日志删除与压缩...")
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = StorageService(tmp, max_history=50)
+        storage.history_compact_min_bytes = 1 << 30  # 只手动压缩
+        for week in range(5):
+            storage.add_history_record(make_record(f"2026-W{week}", week))
+        storage.add_history_record(make_record("2026-W1", 10))
+        assert storage.delete_history_record("2026-W3")
+        assert not storage.delete_history_record("2026-W3")
+
+        with open(storage.history_log, encoding="utf-8") as f:
+            ops = [json.loads(line)["op"] for line in f]
+        assert ops == ["put"] * 6 + ["delete"], ops
+
+        expected = ["2026-W1", "2026-W4", "2026-W2", "2026-W0"]
+        reloaded = StorageService(tmp, max_history=50)
+        assert [h.id for h in reloaded.load_history()] == expected
+        assert reloaded.load_history()[0].projects[0]["description"] == "refresh-10"
+
+        storage._writer.run(storage.compact_history)
+        with open(storage.history_log, encoding="utf-8") as f:
+            entries = [json.loads(line) for line in f]
+        assert [e["op"] for e in entries] == ["put"] * 4
+        assert [h.id for h in StorageService(tmp, max_history=50).load_history()] == expected
+
+        # 压缩时按保留周数裁剪
+        small = StorageService(tmp, max_history=2)
+        small._writer.run(small.compact_history)
+        assert [h.id for h in StorageService(tmp, max_history=50).load_history()] == expected[:2]
+    print("   ✅ tombstone 生效，压缩后内容不变")
+
+
+def test_history_codec_round_trip():
+    """项目字典编码后解码与原始项目一致，相同元数据只保存一次"""
+    print("🔍 测试历史记录编码...")
+    week1 = [p.model_dump() for p in make_projects(1)]
+    week2 = [dict(p.model_dump(), description="refresh-1") for p in make_projects(2)]
+    week2[0]["description"] = "changed"
+    week2[1]["fork_url"] = "https://example.com/custom-fork"
+    del week2[2]["trend"]
+    week2.append("legacy-string-item")
+
+    dictionary = ProjectDictionary()
+    pending = {}
+    rows1 = dictionary.encode_projects(week1, pending)
+    rows2 = dictionary.encode_projects(week2, pending)
+    dictionary.commit(pending)
+    # 第二周只有 3 个项目的元数据变化
+    assert len(dictionary) == PROJECTS_PER_REFRESH + 3, len(dictionary)
+
+    reloaded = ProjectDictionary(json.loads(json.dumps(dictionary.entries())))
+    assert reloaded.decode_projects(rows1) == week1
+    assert reloaded.decode_projects(rows2) == week2
+
+    stats = compute_stats(week1)
+    assert decode_stats(encode_stats(stats, week1), week1) == stats
+    print(f"   ✅ {len(week1) + len(week2)} 个项目编码后还原一致，字典 {len(dictionary)} 条")
+
+
+def main():
+    print("=" * 50)
+    print("🚀 存储层并发压力测试")
+    print("=" * 50)
+    print()
+
+    tests = [
+        ("JSON 并发刷新", test_json_storage_concurrent_refresh),
+        ("SQLite 并发刷新", test_sqlite_storage_concurrent_refresh),
+        ("删除与刷新并发", test_concurrent_delete_and_refresh),
+        ("异步写入", test_async_writes_do_not_block_loop),
+        ("异步保存配置", test_async_config_save_does_not_block_loop),
+        ("内存快照失效", test_snapshot_invalidated_by_signature),
+        ("按名称查找项目", test_find_project_resolves_duplicate_names),
+        ("导入 SQLite", test_sqlite_import_from_json),
+        ("历史日志删除与压缩", test_history_log_tombstones_and_compaction),
+        ("历史记录编码", test_history_codec_round_trip),
+    ]
+
+    passed = 0
+    for name, test_func in tests:
+        try:
+            test_func()
+            passed += 1
+        except Exception as e:
+            print(f"   ❌ {name} 失败: {e}")
+        print()
+
+    print(f"总计: {passed}/{len(tests)} 项测试通过")
+    return 0 if passed == len(tests) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
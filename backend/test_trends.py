@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+趋势引擎测试
+
+- 插值与外推：窗口内线性插值，历史不足一个窗口时按已有跨度外推
+- NumPy 与纯 Python 实现在带缺失采样的随机矩阵上结果一致；未安装 NumPy 时使用纯 Python
+- TrendEngine：新快照替换同一周的旧快照
+"""
+
+import math
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import services.trends as trends
+from models.schemas import HistoryRecord, ProjectCreate
+from services.trends import TrendEngine, compute_trends
+
+
+def close(a, b) -> bool:
+    if a is None or b is None:
+        return a is b
+    if isinstance(a, str):
+        return a == b
+    return math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-9)
+
+
+def test_interpolation_and_extrapolation():
+    """手算的增量与分类"""
+    print("🔍 测试插值与外推...")
+    days = [0.0, 10.0, 20.0]
+    stars = [
+        [1000, 1100, 1300],   # 第 13 天插值 1160，第 6 天 1060；30 天按 20 天跨度外推
+        [None, 2000, 2002],   # 只有 10 天历史：30 天增量按跨度外推
+        [None, None, 50],     # 没有历史
+    ]
+    forks = [[10, 20, 30], [None, 5, 5], [None, None, 1]]
+    for use_numpy in ([False, True] if trends.np is not None else [False]):
+        rising, slow, new = compute_trends(days, stars, forks, use_numpy=use_numpy)
+        assert rising["stars_delta_7d"] == 140 and rising["stars_delta_30d"] == 450
+        assert rising["forks_delta_7d"] == 7 and rising["trend"] == "rising"
+        assert close(rising["star_velocity"], 20.0)
+        assert close(rising["star_acceleration"], 20.0 - 100 / 7)
+        assert slow["stars_delta_7d"] == 1 and slow["stars_delta_30d"] == 6
+        assert slow["star_acceleration"] is None and slow["trend"] == "falling"
+        assert new["stars_delta_7d"] is None and new["trend"] == "stable"
+    print("   ✅ 增量、增速与分类正确")
+
+
+def test_numpy_python_parity():
+    """NumPy 与纯 Python 实现在随机矩阵上结果一致"""
+    if trends.np is None:
+        print("⏭️  未安装 NumPy，跳过")
+        return
+    print("🔍 测试 NumPy / 纯 Python 一致性...")
+    rng = random.Random(42)
+    for _ in range(20):
+        cols = rng.randint(1, 12)
+        days = sorted(rng.sample(range(0, 120), cols))
+        stars, forks = [], []
+        for _ in range(50):
+            value = rng.randint(0, 50000)
+            star_row, fork_row = [], []
+            for col in range(cols):
+                value += rng.randint(-20, 800)
+                missing = col < cols - 1 and rng.random() < 0.3
+                star_row.append(None if missing else value)
+                fork_row.append(None if missing else value // 10)
+            stars.append(star_row)
+            forks.append(fork_row)
+        expected = compute_trends(days, stars, forks, use_numpy=False)
+        actual = compute_trends(days, stars, forks, use_numpy=True)
+        for e, a in zip(expected, actual):
+            assert all(close(e[key], a[key]) for key in e), (e, a)
+    print("   ✅ 20 组随机矩阵结果一致")
+
+
+def test_python_fallback_without_numpy():
+    """未安装 NumPy 时自动使用纯 Python 实现"""
+    print("🔍 测试无 NumPy 回退...")
+    original = trends.np
+    trends.np = None
+    try:
+        result = compute_trends([0.0, 7.0], [[100, 200]], [[1, 2]])
+    finally:
+        trends.np = original
+    assert result[0]["stars_delta_7d"] == 100 and result[0]["trend"] == "rising"
+    print("   ✅ 纯 Python 实现正常")
+
+
+def test_engine_replaces_same_week():
+    """同一周的新快照替换旧快照，不影响更早的历史"""
+    print("🔍 测试趋势引擎...")
+
+    def record(week: str, day: str, stars: int) -> HistoryRecord:
+        projects = [ProjectCreate(name="repo", full_name="Owner/Repo", url="", stars=stars, forks=1)]
+        return HistoryRecord(id=week, week=week, date=day, total_projects=1, projects=projects)
+
+    engine = TrendEngine()
+    engine.observe(record("2026-W01", "2026-01-01", 1000))
+    engine.observe(record("2026-W02", "2026-01-08", 1100))
+    [project] = engine.apply(
+        [ProjectCreate(name="repo", full_name="owner/repo", url="", stars=1200, forks=1)],
+        "2026-W02", "2026-01-08",
+    )
+    assert project.stars_delta_7d == 200 and project.trend == "rising"
+    print("   ✅ 同一周的快照被替换")
+
+
+def main():
+    print("=" * 50)
+    print("🚀 趋势引擎测试")
+    print("=" * 50)
+    print()
+
+    tests = [
+        ("插值与外推", test_interpolation_and_extrapolation),
+        ("NumPy / 纯 Python 一致性", test_numpy_python_parity),
+        ("无 NumPy 回退", test_python_fallback_without_numpy),
+        ("趋势引擎", test_engine_replaces_same_week),
+    ]
+
+    passed = 0
+    for name, test_func in tests:
+        try:
+            test_func()
+            passed += 1
+        except Exception as e:
+            print(f"   ❌ {name} 失败: {e}")
+        print()
+
+    print(f"总计: {passed}/{len(tests)} 项测试通过")
+    return 0 if passed == len(tests) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -198,8 +198,6 @@ class GitHubTrendingDashboard {
         aiBtn.disabled = true;
 
         try {
-            this.showLoading();
-            
             // 从后端获取配置
             const configResponse = await fetch('/api/config/ai');
             if (!configResponse.ok) {
@@ -218,8 +216,15 @@ class GitHubTrendingDashboard {
                 endpoint: config.endpoint || ''
             });
             
-            const response = await fetch(`/api/projects/refresh-ai?${params}`, { method: 'POST' });
-            const result = await response.json();
+            let result;
+            if (window.EventSource) {
+                // 流式刷新：每个项目增强完成时立即更新卡片
+                result = await this.streamAIRefresh(aiBtn);
+            } else {
+                this.showLoading();
+                const response = await fetch(`/api/projects/refresh-ai?${params}`, { method: 'POST' });
+                result = await response.json();
+            }
             
             if (result.success) {
                 await this.loadProjects();
@@ -239,6 +244,40 @@ class GitHubTrendingDashboard {
         }
     }
 
+    // 通过 SSE 进行 AI 增强刷新，返回 done 事件的数据（同 /api/projects/refresh-ai 的响应）
+    // 使用后端保存的 AI 配置，API Key 不出现在 URL 中
+    streamAIRefresh(aiBtn) {
+        return new Promise((resolve, reject) => {
+            const source = new EventSource('/api/projects/refresh-ai/stream');
+            let count = 0;
+
+            source.addEventListener('project', (event) => {
+                const data = JSON.parse(event.data);
+                count += 1;
+                aiBtn.innerHTML = `<span class="loading-spinner-small"></span> AI 分析中 (${count})...`;
+
+                const project = this.projects.find(p => p.fullName === data.full_name);
+                if (project) {
+                    project.description = data.description || project.description;
+                    project.category = data.category || project.category;
+                    project.usageSteps = data.usage_steps || project.usageSteps;
+                    this.renderProjects();
+                }
+            });
+
+            source.addEventListener('done', (event) => {
+                source.close();
+                resolve(JSON.parse(event.data));
+            });
+
+            // 服务端的 error 事件带 detail；连接中断时没有 data
+            source.addEventListener('error', (event) => {
+                source.close();
+                reject(new Error(event.data ? JSON.parse(event.data).detail : 'AI 刷新连接中断'));
+            });
+        });
+    }
+
     showApiConfigModal() {
         const modal = document.getElementById('api-config-modal');
         if (!modal) return;
@@ -12,7 +12,8 @@ class HistoryManager {
 
     async loadHistory() {
         try {
-            const response = await fetch('/api/history/');
+            // 只拉取每周的物化统计，不下载全部项目详情
+            const response = await fetch('/api/history/stats');
             if (response.ok) {
                 const data = await response.json();
                 this.historyData = data.history || [];
@@ -61,7 +62,8 @@ class HistoryManager {
             section.className = 'history-section';
             section.style.animationDelay = `${index * 0.15}s`;
             
-            const projects = record.projects || [];
+            const stats = record.stats || {};
+            const projects = stats.top_projects || record.projects || [];
             // 兼容 total_projects 和 totalProjects
             const totalProjects = record.total_projects || record.totalProjects || projects.length;
             const displayDate = record.week || record.date || record.displayDate;
@@ -86,11 +88,11 @@ class HistoryManager {
                             <div class="stat-label">收录项目</div>
                         </div>
                         <div class="stat-card">
-                            <div class="stat-value">${this.formatNumber(projects.reduce((sum, p) => sum + (p.stars || 0), 0))}</div>
+                            <div class="stat-value">${this.formatNumber(stats.total_stars ?? projects.reduce((sum, p) => sum + (p.stars || 0), 0))}</div>
                             <div class="stat-label">总 Stars</div>
                         </div>
                         <div class="stat-card">
-                            <div class="stat-value">${this.getTopLanguage(projects)}</div>
+                            <div class="stat-value">${this.getTopLanguage(projects, stats.language_distribution)}</div>
                             <div class="stat-label">热门语言</div>
                         </div>
                     </div>
@@ -132,12 +134,14 @@ class HistoryManager {
         });
     }
 
-    getTopLanguage(projects) {
-        const langs = {};
-        projects.forEach(p => {
-            const lang = p.language || 'Other';
-            langs[lang] = (langs[lang] || 0) + 1;
-        });
+    getTopLanguage(projects, distribution) {
+        const langs = distribution ? { ...distribution } : {};
+        if (!distribution) {
+            projects.forEach(p => {
+                const lang = p.language || 'Other';
+                langs[lang] = (langs[lang] || 0) + 1;
+            });
+        }
         return Object.keys(langs).sort((a, b) => langs[b] - langs[a])[0] || '-';
     }
 